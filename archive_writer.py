@@ -0,0 +1,243 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+import pyarrow.parquet as pq
+
+# Arsip hasil do_get (save_copy) di storage/<tenant>/Downloads, ditulis di background.
+# Response ke client gak pernah nunggu disk: job arsip cuma diantrikan (antrian terbatas),
+# kalau antrian penuh job-nya dibuang + dicatat (lebih baik arsip kelewat daripada request lambat).
+# - Cache miss: batch yang di-stream ke client ikut diantrikan satu-satu (tanpa copy) dan
+#   ditulis incremental pakai ParquetWriter. Isi arsip = persis data yang dikirim,
+#   gak ada query kedua yang bisa lihat isi DB yang sudah berubah.
+# - Cache hit : Arrow Table dari result cache ditulis pakai pyarrow
+# File ditulis ke .part dulu, baru di-rename kalau sukses.
+
+ARCHIVE_COMPRESSION = "zstd"
+
+# Batas total byte batch stream yang belum ketulis (semua arsip stream digabung)
+ARCHIVE_MAX_PENDING_BYTES = 256 << 20
+
+
+class StreamArchive:
+    """
+    Arsip satu response stream. Dipanggil dari generator stream:
+    put(batch) tiap batch, lalu close() kalau stream selesai atau abort() kalau putus.
+    Batch yang gak muat di antrian bikin arsip ini dibatalkan (stream jalan terus).
+    """
+
+    def __init__(self, archiver, schema, save_path):
+        self._archiver = archiver
+        self.schema = schema
+        self.save_path = save_path
+        self.dropped = False
+        # Dipakai thread penulis saja
+        self.parquet_writer = None
+        self.failed = False
+        self.started = None
+
+    def put(self, batch):
+        if self.dropped:
+            return
+        if not self._archiver._submit_batch(self, batch):
+            self.dropped = True
+
+    def close(self):
+        self._archiver._control("stream_close", self)
+
+    def abort(self):
+        self._archiver._control("stream_abort", self)
+
+
+class ArchiveWriter:
+    """
+    Antrian job arsip + satu thread penulis.
+    Gagal nulis / job dibuang kelihatan di `summary()` (dipakai action server_stats).
+    """
+
+    _STOP = object()
+
+    def __init__(self, max_pending=16, compression=ARCHIVE_COMPRESSION, max_pending_bytes=ARCHIVE_MAX_PENDING_BYTES):
+        self.compression = compression
+        self.max_pending = max_pending
+        self.max_pending_bytes = max_pending_bytes
+        # Antrian gak dibatasi Queue: batas job & byte dicek sendiri di _submit,
+        # jadi pesan close/abort stream selalu bisa masuk tanpa nunggu
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending_jobs = 0
+        self._pending_bytes = 0
+        self.stats = {"queued": 0, "written": 0, "failed": 0, "dropped": 0}
+        self.last_error = None
+        self._thread = threading.Thread(target=self._run, name="archive-writer", daemon=True)
+        self._thread.start()
+
+    def open_stream(self, schema, save_path):
+        # Arsip response yang di-stream (cache miss); None kalau antrian job penuh
+        with self._lock:
+            if self._pending_jobs >= self.max_pending:
+                self.stats["dropped"] += 1
+                logging.warning(f"⚠️ Antrian arsip penuh, arsip {os.path.basename(save_path)} dilewati")
+                return None
+            self._pending_jobs += 1
+            self.stats["queued"] += 1
+        return StreamArchive(self, schema, save_path)
+
+    def submit_table(self, table, save_path):
+        with self._lock:
+            if self._pending_jobs >= self.max_pending:
+                self.stats["dropped"] += 1
+                logging.warning(f"⚠️ Antrian arsip penuh, arsip {os.path.basename(save_path)} dilewati")
+                return False
+            self._pending_jobs += 1
+            self.stats["queued"] += 1
+        self._queue.put(("table", table, save_path))
+        return True
+
+    def _submit_batch(self, stream, batch):
+        with self._lock:
+            if self._pending_bytes + batch.nbytes > self.max_pending_bytes:
+                logging.warning(f"⚠️ Penulis arsip ketinggalan, arsip {os.path.basename(stream.save_path)} dilewati")
+                return False
+            self._pending_bytes += batch.nbytes
+        self._queue.put(("stream_batch", stream, batch))
+        return True
+
+    def _control(self, kind, stream):
+        self._queue.put((kind, stream))
+
+    def summary(self):
+        with self._lock:
+            return dict(self.stats, pending=self._pending_jobs, pending_bytes=self._pending_bytes,
+                        last_error=self.last_error)
+
+    def shutdown(self, flush=True, timeout=60):
+        # flush=True: job yang sudah antri diselesaikan dulu sebelum thread berhenti.
+        # flush=False: job table dibuang, arsip stream yang belum selesai dibatalkan.
+        if not flush:
+            while True:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job[0] == "table":
+                    self._finish_job()
+                elif job[0] == "stream_batch":
+                    self._release_bytes(job[2])
+                    job[1].dropped = True
+                else:
+                    self._abort_stream(job[1])
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+
+    def _finish_job(self):
+        with self._lock:
+            self._pending_jobs -= 1
+
+    def _release_bytes(self, batch):
+        with self._lock:
+            self._pending_bytes -= batch.nbytes
+
+    def _record_failure(self, save_path, error):
+        with self._lock:
+            self.stats["failed"] += 1
+            self.last_error = f"{os.path.basename(save_path)}: {error}"
+        logging.error(f"❌ Gagal menulis arsip {os.path.basename(save_path)}: {error}")
+
+    def _record_written(self, save_path, started):
+        with self._lock:
+            self.stats["written"] += 1
+        logging.info(f"💾 Arsip tersimpan (background): {os.path.basename(save_path)} "
+                     f"({time.monotonic() - started:.2f}s)")
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is self._STOP:
+                return
+            kind = job[0]
+            if kind == "table":
+                self._write_table(job[1], job[2])
+            elif kind == "stream_batch":
+                try:
+                    self._write_stream_batch(job[1], job[2])
+                finally:
+                    self._release_bytes(job[2])
+            elif kind == "stream_close":
+                self._close_stream(job[1])
+            else:
+                self._abort_stream(job[1])
+
+    def _write_table(self, table, save_path):
+        part_path = save_path + ".part"
+        started = time.monotonic()
+        try:
+            pq.write_table(table, part_path, compression=self.compression)
+            os.replace(part_path, save_path)
+            self._record_written(save_path, started)
+        except Exception as e:
+            self._record_failure(save_path, e)
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        finally:
+            self._finish_job()
+
+    def _open_stream_writer(self, stream):
+        if stream.parquet_writer is None:
+            stream.parquet_writer = pq.ParquetWriter(
+                stream.save_path + ".part", stream.schema, compression=self.compression
+            )
+        return stream.parquet_writer
+
+    def _write_stream_batch(self, stream, batch):
+        if stream.failed or stream.dropped:
+            return
+        if stream.started is None:
+            stream.started = time.monotonic()
+        try:
+            self._open_stream_writer(stream).write_batch(batch)
+        except Exception as e:
+            stream.failed = True
+            self._record_failure(stream.save_path, e)
+            self._discard_stream_file(stream)
+
+    def _close_stream(self, stream):
+        try:
+            if stream.failed:
+                return
+            if stream.dropped:
+                # Batch ada yang gak ikut ketulis: arsip bolong lebih buruk daripada gak ada
+                with self._lock:
+                    self.stats["dropped"] += 1
+                self._discard_stream_file(stream)
+                return
+            if stream.started is None:
+                stream.started = time.monotonic()
+            try:
+                self._open_stream_writer(stream).close()
+                os.replace(stream.save_path + ".part", stream.save_path)
+                self._record_written(stream.save_path, stream.started)
+            except Exception as e:
+                self._record_failure(stream.save_path, e)
+                self._discard_stream_file(stream)
+        finally:
+            self._finish_job()
+
+    def _abort_stream(self, stream):
+        # Stream putus / dibatalkan: file .part dibuang, gak dihitung gagal
+        stream.failed = True
+        self._discard_stream_file(stream)
+        self._finish_job()
+
+    def _discard_stream_file(self, stream):
+        if stream.parquet_writer is not None:
+            try:
+                stream.parquet_writer.close()
+            except Exception:
+                pass
+            stream.parquet_writer = None
+        part_path = stream.save_path + ".part"
+        if os.path.exists(part_path):
+            os.remove(part_path)
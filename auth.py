@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+
+import pyarrow.flight as flight
+
+# Autentikasi server: login sekali -> dapat session token (umurnya pendek).
+# Request berikutnya cukup kirim header "authorization: Bearer <token>",
+# dicek middleware ke registry di memory (cuma lookup dict, tanpa baca file / hashing).
+# users.json baru dibaca ulang kalau file-nya berubah (mtime/size beda).
+# Client lama (kirim client_id + password di tiket) tetap dilayani.
+
+AUTH_HEADER = "authorization"
+TOKEN_PREFIX = "Bearer "
+MIDDLEWARE_KEY = "auth"
+
+
+def hash_password(plain_password):
+    # Fitur Keamanan: Ubah password teks biasa jadi kode acak (SHA-256)
+    # Biar kalau database bocor, password asli gak ketahuan
+    return hashlib.sha256(str(plain_password).strip().encode()).hexdigest()
+
+
+class CredentialRegistry:
+    """
+    Isi users.json di memory. Perubahan file dicek paling sering tiap
+    `check_interval` detik (stat doang), dan file cuma di-load ulang kalau berubah.
+    """
+
+    def __init__(self, user_db_path="users.json", check_interval=2.0):
+        self.user_db_path = user_db_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._users = {}
+        self._signature = None
+        self._checked_at = 0.0
+        self.stats = {"reloads": 0}
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            try:
+                stat = os.stat(self.user_db_path)
+            except FileNotFoundError:
+                if self._signature is not None:
+                    logging.error("❌ Database users.json tidak ditemukan!")
+                self._users, self._signature = {}, None
+                return
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if signature == self._signature:
+                return
+            try:
+                with open(self.user_db_path, "r") as f:
+                    users = json.load(f)
+            except (OSError, ValueError) as e:
+                # File lagi ditulis / rusak: pakai isi lama, coba lagi di pengecekan berikutnya
+                logging.error(f"⚠️ Gagal baca users.json, pakai data lama: {e}")
+                return
+            self._users, self._signature = users, signature
+            self.stats["reloads"] += 1
+            logging.info(f"🔐 Registry user dimuat ulang: {len(users)} client")
+
+    def get(self, client_id):
+        self._refresh()
+        return self._users.get(client_id)
+
+    def verify(self, client_id, password):
+        # Cek Client ID terdaftar & hash password cocok. Balikin data user atau None.
+        user_data = self.get(client_id)
+        if user_data is None:
+            logging.warning(f"🔐 Akses Ditolak: Client_ID '{client_id}' tidak terdaftar.")
+            return None
+        if hash_password(password) != user_data.get('password'):
+            logging.warning(f"🔐 Akses Ditolak: Password salah untuk Client_ID: {client_id}")
+            return None
+        return user_data
+
+
+class SessionStore:
+    """
+    Session token di memory: token -> (client_id, expires_at, password hash waktu login).
+    Token otomatis gak berlaku kalau kadaluarsa, user dihapus, atau password-nya diganti.
+    """
+
+    def __init__(self, registry, ttl_seconds=900):
+        self.registry = registry
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def issue(self, client_id, user_data):
+        token = secrets.token_urlsafe(32)
+        now = time.time()
+        with self._lock:
+            # Sekalian buang session yang sudah kadaluarsa
+            for stale in [t for t, s in self._sessions.items() if s[1] <= now]:
+                del self._sessions[stale]
+            self._sessions[token] = (client_id, now + self.ttl_seconds, user_data.get('password'))
+        return token
+
+    def resolve(self, token):
+        # Balikin (client_id, user_data) atau None
+        session = self._sessions.get(token)
+        if session is None:
+            return None
+        client_id, expires_at, password_hash = session
+        if expires_at <= time.time():
+            self.revoke(token)
+            return None
+        user_data = self.registry.get(client_id)
+        if user_data is None or user_data.get('password') != password_hash:
+            self.revoke(token)
+            return None
+        return client_id, user_data
+
+    def revoke(self, token):
+        with self._lock:
+            self._sessions.pop(token, None)
+
+    def active(self):
+        return len(self._sessions)
+
+
+class AuthMiddleware(flight.ServerMiddleware):
+    # Identitas hasil resolve token, diambil handler lewat context.get_middleware("auth")
+
+    def __init__(self, token, client_id, user_data):
+        self.token = token
+        self.client_id = client_id
+        self.user_data = user_data
+
+
+class AuthMiddlewareFactory(flight.ServerMiddlewareFactory):
+    """
+    Dipanggil di awal tiap call. Tanpa header authorization = mode lama
+    (handler cek password sendiri). Token salah/kadaluarsa langsung ditolak
+    dengan FlightUnauthenticatedError (client tinggal login ulang).
+    """
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+
+    def start_call(self, info, headers):
+        values = headers.get(AUTH_HEADER)
+        if not values:
+            return None
+        value = values[0]
+        if not value.startswith(TOKEN_PREFIX):
+            raise flight.FlightUnauthenticatedError("Format header authorization tidak dikenal")
+        token = value[len(TOKEN_PREFIX):]
+        session = self.sessions.resolve(token)
+        if session is None:
+            raise flight.FlightUnauthenticatedError("Session token tidak valid atau kadaluarsa")
+        return AuthMiddleware(token, *session)
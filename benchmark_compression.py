@@ -0,0 +1,107 @@
+import argparse
+import io
+import os
+import statistics
+import tempfile
+import time
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from benchmark_transform import make_corporate_raw
+
+# BENCHMARK: kompresi buffer Arrow IPC (yang lewat jaringan di do_put / do_get)
+# Bandingkan ukuran di "kabel" vs waktu CPU encode/decode per codec.
+# Cara pakai (dari root project):
+#   python benchmark_compression.py                         # data sintetis corporate
+#   python benchmark_compression.py --csv data/payroll.csv  # arah upload (CSV -> string semua)
+#   python benchmark_compression.py --duckdb storage/<tenant>/Clean/<file>.duckdb --table corporate.fct_corporate
+#   python benchmark_compression.py --codecs none,lz4,zstd,zstd:9 --bandwidth-mbps 50
+
+
+def load_csv(path):
+    # Sama persis dengan PayrollClient.upload_csv: semua kolom string
+    with open(path, "rb") as f:
+        return pa.Table.from_pandas(pd.read_csv(io.BytesIO(f.read()), dtype=str))
+
+
+def load_duckdb(path, table):
+    # Arah download: isi tabel fact yang dikirim do_get
+    with duckdb.connect(path, read_only=True) as con:
+        return con.execute(f"SELECT * FROM {table}").fetch_arrow_table()
+
+
+def make_write_options(spec):
+    # "none" | "lz4" | "zstd" | "zstd:<level>"
+    if spec == "none":
+        return pa.ipc.IpcWriteOptions()
+    name, _, level = spec.partition(":")
+    codec = pa.Codec(name, compression_level=int(level)) if level else name
+    return pa.ipc.IpcWriteOptions(compression=codec)
+
+
+def ipc_roundtrip(table, options, batch_rows):
+    sink = pa.BufferOutputStream()
+    start = time.perf_counter()
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        for batch in table.to_batches(max_chunksize=batch_rows):
+            writer.write_batch(batch)
+    buf = sink.getvalue()
+    encode = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pa.ipc.open_stream(buf).read_all()
+    decode = time.perf_counter() - start
+    return buf.size, encode, decode
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trade-off ukuran vs CPU kompresi Arrow IPC.")
+    parser.add_argument("--csv", help="File CSV upload yang mau diukur")
+    parser.add_argument("--duckdb", help="File Clean .duckdb (arah download)")
+    parser.add_argument("--table", help="Tabel di file --duckdb, contoh corporate.fct_corporate")
+    parser.add_argument("--rows", type=int, default=200_000, help="Jumlah baris data sintetis corporate")
+    parser.add_argument("--codecs", default="none,lz4,zstd")
+    parser.add_argument("--batch-rows", type=int, default=50_000, help="Ukuran batch (sama dengan client)")
+    parser.add_argument("--bandwidth-mbps", type=float, default=100.0, help="Asumsi bandwidth buat estimasi waktu total")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.duckdb and not args.table:
+        parser.error("--table wajib diisi kalau pakai --duckdb")
+
+    if args.csv:
+        label, table = os.path.basename(args.csv), load_csv(args.csv)
+    elif args.duckdb:
+        label, table = f"{os.path.basename(args.duckdb)}:{args.table}", load_duckdb(args.duckdb, args.table)
+    else:
+        with tempfile.TemporaryDirectory(prefix="bench_compression_") as work_dir:
+            raw_file = os.path.join(work_dir, "corporate.parquet")
+            make_corporate_raw(raw_file, args.rows)
+            label, table = f"synthetic corporate ({args.rows:,} rows)", pq.read_table(raw_file)
+
+    print(f"📊 Data: {label} | Rows: {table.num_rows:,} | In-memory: {table.nbytes / 1e6:,.1f} MB")
+    print(f"🌐 Asumsi bandwidth: {args.bandwidth_mbps:g} Mbps | Runs: {args.runs}\n")
+
+    bytes_per_second = args.bandwidth_mbps * 1e6 / 8
+    header = f"{'codec':<10}{'wire MB':>10}{'ratio':>8}{'encode s':>10}{'decode s':>10}{'est. total s':>14}"
+    print(header)
+    print("-" * len(header))
+    baseline = None
+    for spec in args.codecs.split(","):
+        spec = spec.strip()
+        options = make_write_options(spec)
+        results = [ipc_roundtrip(table, options, args.batch_rows) for _ in range(args.runs)]
+        size = results[0][0]
+        encode = statistics.median(r[1] for r in results)
+        decode = statistics.median(r[2] for r in results)
+        baseline = baseline or size
+        # Estimasi satu transfer: encode di pengirim + kirim lewat jaringan + decode di penerima
+        total = encode + size / bytes_per_second + decode
+        print(f"{spec:<10}{size / 1e6:>10.2f}{baseline / size:>7.1f}x{encode:>10.3f}{decode:>10.3f}{total:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
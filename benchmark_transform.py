@@ -0,0 +1,107 @@
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import transform_engine
+
+# BENCHMARK: SQLMesh plan per upload vs compiled fast path
+# Cara pakai (dari root project):
+#   python benchmark_transform.py --rows 100000 --runs 5
+#   python benchmark_transform.py --industry hospital --raw-file storage/<tenant>/Raw/<file>.parquet
+
+
+def make_corporate_raw(path, rows):
+    # Data sintetis mirip payroll LA (semua kolom string, persis seperti Raw Zone)
+    rng = random.Random(42)
+    departments = ["Police (LAPD)", "Fire (LAFD)", "Water And Power (DWP)", "Airports (LAWA)"]
+    titles = ["Police Officer II", "Firefighter III", "Electrical Mechanic", "Senior Clerk Typist"]
+    table = pa.table({
+        "Row ID": [f"{i}-2013" for i in range(rows)],
+        "Year": ["2013"] * rows,
+        "Department Title": [rng.choice(departments) for _ in range(rows)],
+        "Job Class Title": [rng.choice(titles) for _ in range(rows)],
+        "Employment Type": ["Full Time"] * rows,
+        "Base Pay": [f"${rng.randint(30000, 150000):,}.00" for _ in range(rows)],
+        "Overtime Pay": [f"${rng.randint(0, 40000):,}.00" for _ in range(rows)],
+        "Longevity Bonus Pay": [None if i % 3 else "$1,200.00" for i in range(rows)],
+        "Average Benefit Cost": [f"${rng.randint(5000, 15000):,}.00" for _ in range(rows)],
+    })
+    pq.write_table(table, path)
+
+
+def timed_runs(label, runs, fn):
+    durations = []
+    for i in range(runs):
+        start = time.perf_counter()
+        fn(i)
+        durations.append(time.perf_counter() - start)
+        print(f"  {label} run {i + 1}: {durations[-1]:.3f}s")
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bandingkan mode transform 'plan' vs 'compiled'.")
+    parser.add_argument("--industry", default="corporate", choices=["corporate", "education", "hospital"])
+    parser.add_argument("--raw-file", help="Raw Parquet yang mau dipakai (wajib untuk selain corporate)")
+    parser.add_argument("--rows", type=int, default=100_000, help="Jumlah baris data sintetis corporate")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    if not args.raw_file and args.industry != "corporate":
+        parser.error("--raw-file wajib diisi untuk industri selain corporate")
+
+    work_dir = tempfile.mkdtemp(prefix="bench_transform_")
+    try:
+        raw_file = args.raw_file
+        if not raw_file:
+            raw_file = os.path.join(work_dir, f"corporate_bench_{args.rows}.parquet")
+            make_corporate_raw(raw_file, args.rows)
+        raw_file = os.path.abspath(raw_file).replace("\\", "/")
+        rows = pq.read_metadata(raw_file).num_rows
+        print(f"📊 Industry: {args.industry} | Rows: {rows:,} | Runs: {args.runs}")
+
+        def db_path(mode, i):
+            return os.path.join(work_dir, f"{mode}_{i}.duckdb").replace("\\", "/")
+
+        print("\n⏳ Mode PLAN (Context + plan baru per upload)")
+        plan_times = timed_runs(
+            "plan", args.runs,
+            lambda i: transform_engine.run_plan_transform(args.industry, raw_file, db_path("plan", i)),
+        )
+
+        print("\n⚡ Mode COMPILED (render sekali, eksekusi SQL langsung)")
+        from sqlmesh.core.context import Context
+
+        start = time.perf_counter()
+        cache = transform_engine.CompiledModelCache(Context(paths="."))
+        cache.get(args.industry)
+        warmup = time.perf_counter() - start
+        print(f"  one-time load + render: {warmup:.3f}s")
+        compiled_times = timed_runs(
+            "compiled", args.runs,
+            lambda i: transform_engine.run_compiled_models(
+                db_path("compiled", i), cache.get(args.industry), raw_file
+            ),
+        )
+
+        print("\n" + "=" * 52)
+        print(f"{'mode':<10}{'min':>10}{'median':>10}{'mean':>10}{'rows/s':>12}")
+        for label, times in (("plan", plan_times), ("compiled", compiled_times)):
+            median = statistics.median(times)
+            print(f"{label:<10}{min(times):>10.3f}{median:>10.3f}{statistics.mean(times):>10.3f}{rows / median:>12,.0f}")
+        speedup = statistics.median(plan_times) / statistics.median(compiled_times)
+        print("=" * 52)
+        print(f"🚀 Compiled {speedup:.1f}x lebih cepat (median per upload)")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 #include <iostream>
+#include <future>
 #include <memory>
+#include <string>
+#include <vector>
 #include <arrow/api.h>
 #include <arrow/flight/api.h>
 #include <arrow/filesystem/api.h>
@@ -7,9 +10,36 @@
 // Namespace biar gak ngetik panjang-panjang
 namespace flight = arrow::flight;
 
-int main() {
-    // 1. Inisialisasi Koneksi ke Server Python (Localhost:8815)
-    std::string host = "grpc://0.0.0.0:8815";
+// Escape string buat ditaruh di JSON (kita gak pakai library JSON tambahan)
+std::string json_escape(const std::string& value) {
+    std::string out;
+    for (char c : value) {
+        if (c == '"' || c == '\\') out += '\\';
+        out += c;
+    }
+    return out;
+}
+
+// Ambil satu partisi (satu endpoint) jadi Table. Dipanggil paralel, satu thread per endpoint.
+arrow::Result<std::shared_ptr<arrow::Table>> fetch_endpoint(flight::FlightClient* client,
+                                                            const flight::FlightEndpoint& endpoint) {
+    ARROW_ASSIGN_OR_RAISE(auto reader, client->DoGet(endpoint.ticket));
+    return reader->ToTable();
+}
+
+int main(int argc, char** argv) {
+    // Pemakaian: client_app <client_id> <password> <target_file.duckdb> [partisi] [host]
+    if (argc < 4) {
+        std::cerr << "Usage: " << argv[0] << " <client_id> <password> <target_file> [partitions] [host]" << std::endl;
+        return -1;
+    }
+    std::string client_id = argv[1];
+    std::string password = argv[2];
+    std::string target_file = argv[3];
+    int partitions = argc > 4 ? std::stoi(argv[4]) : 4;
+
+    // 1. Inisialisasi Koneksi ke Server Python (default Localhost:9999)
+    std::string host = argc > 5 ? argv[5] : "grpc://localhost:9999";
     std::cout << "Connecting to " << host << "..." << std::endl;
 
     // Location object
@@ -29,28 +59,45 @@ int main() {
     }
     client = std::move(*client_result);
 
-    // 2. Siapkan Tiket (JSON Command)
-    // Di C++, JSON hanyalah string biasa kalau kita tidak pakai library JSON tambahan
-    std::string json_command = "{\"action\": \"get_all\"}"; 
-    flight::Ticket ticket{json_command};
+    // 2. Siapkan Descriptor (JSON Command): dataset + jumlah partisi yang diminta
+    std::string json_command = "{\"client_id\": \"" + json_escape(client_id) +
+                               "\", \"password\": \"" + json_escape(password) +
+                               "\", \"target_file\": \"" + json_escape(target_file) +
+                               "\", \"partitions\": " + std::to_string(partitions) + "}";
+    flight::FlightDescriptor descriptor = flight::FlightDescriptor::Command(json_command);
 
-    // 3. Request Data (DoGet)
-    std::unique_ptr<flight::FlightStreamReader> reader;
-    auto result = client->DoGet(ticket);
-    if (!result.ok()) {
-        std::cerr << "Request failed: " << result.status().ToString() << std::endl;
+    // 3. GetFlightInfo: skema, total baris, dan satu endpoint per partisi
+    auto info_result = client->GetFlightInfo(descriptor);
+    if (!info_result.ok()) {
+        std::cerr << "GetFlightInfo failed: " << info_result.status().ToString() << std::endl;
         return -1;
     }
-    reader = std::move(*result);
+    std::unique_ptr<flight::FlightInfo> info = std::move(*info_result);
+    std::cout << "Dataset: " << info->total_records() << " rows, ~" << info->total_bytes()
+              << " bytes, " << info->endpoints().size() << " endpoint(s)" << std::endl;
 
-    // 4. Baca Stream Data
-    std::shared_ptr<arrow::Table> table;
-    arrow::Status status = reader->ReadAll(&table); // Baca semua ke memori
+    // 4. Baca semua partisi bareng-bareng (DoGet per endpoint di thread sendiri)
+    std::vector<std::future<arrow::Result<std::shared_ptr<arrow::Table>>>> futures;
+    for (const auto& endpoint : info->endpoints()) {
+        futures.push_back(std::async(std::launch::async, fetch_endpoint, client.get(), std::cref(endpoint)));
+    }
+    std::vector<std::shared_ptr<arrow::Table>> tables;
+    for (auto& future : futures) {
+        auto table_result = future.get();
+        if (!table_result.ok()) {
+            std::cerr << "Error reading stream: " << table_result.status().ToString() << std::endl;
+            return -1;
+        }
+        tables.push_back(*table_result);
+    }
 
-    if (!status.ok()) {
-        std::cerr << "Error reading stream: " << status.ToString() << std::endl;
+    // Gabung semua partisi jadi satu Table
+    auto concat_result = arrow::ConcatenateTables(tables);
+    if (!concat_result.ok()) {
+        std::cerr << "Error merging partitions: " << concat_result.status().ToString() << std::endl;
         return -1;
     }
+    std::shared_ptr<arrow::Table> table = *concat_result;
 
     // 5. Tampilkan Hasil (Bukti Sukses)
     std::cout << "------------------------------------------------" << std::endl;
@@ -58,10 +105,10 @@ int main() {
     std::cout << "Total Rows: " << table->num_rows() << std::endl;
     std::cout << "Total Columns: " << table->num_columns() << std::endl;
     std::cout << "------------------------------------------------" << std::endl;
-    
+
     // Print skema kolom untuk memastikan kita terima 'job_title'
     std::cout << "Schema:" << std::endl;
     std::cout << table->schema()->ToString() << std::endl;
 
     return 0;
-}
\ No newline at end of file
+}
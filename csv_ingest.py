@@ -0,0 +1,111 @@
+import io
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+# Upload format "csv": client ngirim byte CSV mentah (tanpa parsing sama sekali),
+# dibungkus batch Arrow satu kolom binary ("chunk"). Server yang parsing pakai
+# CSV reader Arrow (per blok, multithread).
+#
+# Aturan parsing-nya dipakai bareng jalur upload "arrow" (blok CSV di-parse client,
+# PayrollClient._open_csv_stream import raw_header_names + raw_convert_options dari sini):
+# header dibaca parser Arrow, semua kolom string, string kosong / NA jadi null. Dua jalur upload = skema Raw Zone yang sama persis,
+# tipe data aslinya baru ditentukan CAST di model staging.
+
+UPLOAD_FORMATS = ("arrow", "csv")
+RAW_CHUNK_FIELD = "chunk"
+RAW_CHUNK_SCHEMA = pa.schema([(RAW_CHUNK_FIELD, pa.binary())])
+# Ukuran blok parsing CSV di server (default Arrow cuma 1 MiB)
+CSV_BLOCK_SIZE = 4 << 20
+
+
+class _ChunkStream(io.RawIOBase):
+    """
+    File-like read-only di atas iterator batch byte (kolom 'chunk').
+    Dipakai sebagai sumber open_csv, jadi file-nya gak perlu ditulis ke disk dulu.
+    """
+
+    def __init__(self, batches):
+        self._chunks = (
+            value.as_buffer()
+            for batch in batches
+            for value in batch.column(RAW_CHUNK_FIELD)
+            if value.is_valid
+        )
+        self._pending = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def _fill(self):
+        # Ambil chunk berikutnya kalau buffer lokal sudah habis
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return False
+            self._pending = memoryview(chunk)
+        return True
+
+    def readinto(self, target):
+        # Isi target sampai penuh (lintas chunk): tiap read() dianggap satu blok
+        # sama parser Arrow, jadi hasil parsing gak tergantung ukuran chunk upload
+        filled = 0
+        while filled < len(target) and self._fill():
+            size = min(len(target) - filled, len(self._pending))
+            target[filled:filled + size] = self._pending[:size]
+            self._pending = self._pending[size:]
+            filled += size
+        return filled
+
+    def peek_line(self):
+        # Intip baris pertama (header) tanpa "memakan" datanya
+        collected = []
+        while True:
+            if not self._fill():
+                break
+            data = bytes(self._pending)
+            self._pending = memoryview(b"")
+            collected.append(data)
+            if b"\n" in data:
+                break
+        head = b"".join(collected)
+        self._pending = memoryview(head)
+        return head.split(b"\n", 1)[0]
+
+
+def raw_column_types(column_names):
+    # Tipe kolom Raw Zone (sama dengan jalur "arrow" di client): semua string
+    return {name: pa.string() for name in column_names}
+
+
+def raw_header_names(header):
+    # Nama kolom dibaca pakai parser Arrow juga (biar aturan quote-nya sama).
+    # Akhir baris dibuang (CRLF dari file Windows gak ikut ke nama kolom).
+    return pa_csv.read_csv(io.BytesIO(header.rstrip(b"\r\n") + b"\n")).column_names
+
+
+def raw_convert_options(column_names):
+    return pa_csv.ConvertOptions(
+        column_types=raw_column_types(column_names),
+        strings_can_be_null=True,
+    )
+
+
+def parse_csv_chunks(batches, block_size=CSV_BLOCK_SIZE):
+    """
+    Parsing stream byte CSV jadi (schema, generator RecordBatch).
+    Semua kolom dipaksa string, string kosong / NA jadi null (lihat raw_convert_options).
+    """
+    stream = _ChunkStream(batches)
+    header = stream.peek_line()
+    if not header.strip():
+        raise ValueError("File CSV kosong atau format tidak valid")
+
+    column_names = raw_header_names(header)
+    reader = pa_csv.open_csv(
+        stream,
+        read_options=pa_csv.ReadOptions(block_size=block_size, use_threads=True),
+        convert_options=raw_convert_options(column_names),
+    )
+    batches = (batch for batch in reader if batch.num_rows > 0)
+    return reader.schema, batches
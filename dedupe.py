@@ -0,0 +1,121 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+# Dedupe upload berbasis isi (content-addressed).
+# Tiap stream upload di-hash per batch sambil datanya ditulis ke Raw Zone.
+# Kalau fingerprint + versi model sama dengan yang terakhir membangun DB Clean
+# tersebut (dan file DB-nya masih ada), transform dilewati.
+#
+# Upload resumable (spool) bisa dibaca dua kali: fingerprint dihitung sebelum
+# Raw Zone ditulis, jadi upload identik gak nulis apa-apa. Stream do_put biasa
+# cuma bisa dibaca sekali: file .part tetap ditulis penuh lalu dibuang.
+#
+# Cuma berlaku di handoff "file": di handoff "arrow" stream client langsung
+# dibaca DuckDB sambil transform jalan, jadi fingerprint baru lengkap setelah
+# transform-nya selesai (gak ada yang bisa di-skip). Mode itu cuma nge-forget
+# entry DB yang dibangun ulang biar index gak basi.
+
+INDEX_FILENAME = "ingest_index.json"
+
+
+class StreamFingerprint:
+    """
+    Hash SHA-256 dari skema + isi logis tiap batch (serialisasi IPC per batch).
+    Batch hasil slice ikut benar: yang di-hash cuma nilai di rentang offset/length-nya,
+    bukan seluruh buffer induk. Hasilnya tetap tergantung pembagian batch
+    (file sama + ukuran blok sama = batch sama).
+    """
+
+    def __init__(self, schema):
+        self._hash = hashlib.sha256(schema.serialize())
+
+    def update(self, batch):
+        self._hash.update(batch.num_rows.to_bytes(8, "little"))
+        self._hash.update(batch.serialize())
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+def fingerprint_batches(schema, batches):
+    # Fingerprint tanpa nulis apa-apa (buat sumber yang bisa dibaca ulang, mis. spool upload)
+    fingerprint = StreamFingerprint(schema)
+    for batch in batches:
+        fingerprint.update(batch)
+    return fingerprint.hexdigest()
+
+
+class UploadIndex:
+    """
+    Index per tenant: storage/<client>/ingest_index.json
+    Isinya per file Clean: fingerprint upload terakhir, versi model, file Raw, waktu.
+    Disimpan di luar folder Clean biar gak ikut ke-list sebagai file database.
+    """
+
+    def __init__(self, storage_root="storage"):
+        self.storage_root = storage_root
+        self._lock = threading.Lock()
+        self._tenants = {}
+
+    def _path(self, client_id):
+        return os.path.join(self.storage_root, client_id, INDEX_FILENAME)
+
+    def _load(self, client_id):
+        entries = self._tenants.get(client_id)
+        if entries is None:
+            try:
+                with open(self._path(client_id), "r") as f:
+                    entries = json.load(f)
+            except FileNotFoundError:
+                entries = {}
+            except (OSError, ValueError) as e:
+                logging.warning(f"⚠️ Index dedupe {client_id} rusak, mulai dari kosong: {e}")
+                entries = {}
+            self._tenants[client_id] = entries
+        return entries
+
+    def _save(self, client_id, entries):
+        # Tulis ke file sementara lalu rename (atomic), biar index gak pernah setengah jadi
+        path = self._path(client_id)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def lookup(self, client_id, clean_db_path, fingerprint, model_version):
+        # Balikin entry kalau upload ini identik dengan yang terakhir membangun DB tersebut
+        clean_file = os.path.basename(clean_db_path)
+        with self._lock:
+            entry = self._load(client_id).get(clean_file)
+        if (
+            entry
+            and entry["fingerprint"] == fingerprint
+            and entry["model_version"] == model_version
+            and os.path.exists(clean_db_path)
+        ):
+            return entry
+        return None
+
+    def record(self, client_id, clean_db_path, fingerprint, model_version, raw_file_path):
+        clean_file = os.path.basename(clean_db_path)
+        with self._lock:
+            entries = self._load(client_id)
+            entries[clean_file] = {
+                "fingerprint": fingerprint,
+                "model_version": model_version,
+                "raw_file": os.path.basename(raw_file_path),
+                "ingested_at": time.time(),
+            }
+            self._save(client_id, entries)
+
+    def forget(self, client_id, clean_db_path):
+        # Dipanggil sebelum DB dibangun ulang: selama proses, isinya belum tentu cocok lagi
+        clean_file = os.path.basename(clean_db_path)
+        with self._lock:
+            entries = self._load(client_id)
+            if entries.pop(clean_file, None) is not None:
+                self._save(client_id, entries)
@@ -0,0 +1,259 @@
+import collections
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+# Antrian job ingestion (asynchronous).
+# do_put cukup nerima data sampai aman tersimpan di Raw Zone, lalu bikin job
+# dan langsung balik ke client. Transformasinya dijalankan scheduler ini di
+# background dengan antrian terbatas (bounded).
+# Kalau `journal_dir` diisi, tiap job juga dicatat ke disk (satu file JSON per job),
+# jadi job yang belum selesai waktu server mati dijalankan lagi pas server start.
+
+# Tahapan job: queued -> transforming -> done / failed
+JOB_STAGES = ("queued", "transforming", "done", "failed")
+ACTIVE_STAGES = ("queued", "transforming")
+
+
+class QueueFullError(Exception):
+    pass
+
+
+# Field job yang disimpan di journal
+_RECORD_FIELDS = (
+    "job_id", "client_id", "industry_type", "filename", "raw_file_path", "clean_db_path",
+    "stage", "error", "warning", "rows", "fingerprint", "received_at", "queued_at", "started_at", "finished_at",
+)
+
+
+class IngestJob:
+    def __init__(self, client_id, industry_type, filename, raw_file_path, clean_db_path, received_at=None):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.client_id = client_id
+        self.industry_type = industry_type
+        self.filename = filename
+        self.raw_file_path = raw_file_path
+        self.clean_db_path = clean_db_path
+        self.stage = "queued"
+        self.error = None
+        # Job sukses tapi ada langkah sampingan yang gagal (mis. publish dataset)
+        self.warning = None
+        self.rows = None
+        self.fingerprint = None
+        # Timeline job (epoch detik)
+        self.received_at = received_at or time.time()
+        self.queued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_record(self):
+        return {field: getattr(self, field) for field in _RECORD_FIELDS}
+
+    @classmethod
+    def from_record(cls, record):
+        job = cls(
+            record["client_id"], record["industry_type"], record["filename"],
+            record["raw_file_path"], record["clean_db_path"], received_at=record.get("received_at"),
+        )
+        for field in _RECORD_FIELDS:
+            if field in record:
+                setattr(job, field, record[field])
+        return job
+
+    def to_dict(self, queue_position=None):
+        def _duration(start, end):
+            return round(end - start, 3) if start and end else None
+
+        return {
+            "job_id": self.job_id,
+            "client_id": self.client_id,
+            "filename": self.filename,
+            "clean_file": self.clean_db_path.rsplit("/", 1)[-1],
+            "stage": self.stage,
+            "error": self.error,
+            "warning": self.warning,
+            "rows": self.rows,
+            "queue_position": queue_position,
+            "received_at": self.received_at,
+            "queued_at": self.queued_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "upload_seconds": _duration(self.received_at, self.queued_at),
+            "wait_seconds": _duration(self.queued_at, self.started_at or time.time()),
+            "transform_seconds": _duration(self.started_at, self.finished_at),
+        }
+
+
+class IngestJobScheduler:
+    """
+    Scheduler job transformasi.
+    - Antrian FIFO dengan batas `max_queue` (kalau penuh, upload baru ditolak).
+    - `dispatchers` thread yang ngambil job dan menjalankan `run_job(job)`.
+    - Riwayat job yang sudah selesai disimpan terbatas (`history_size`).
+    - `journal_dir` (opsional): job dicatat ke disk; job queued/transforming dari
+      run sebelumnya di-enqueue ulang waktu scheduler dibuat.
+    """
+
+    def __init__(self, run_job, dispatchers=1, max_queue=32, history_size=500, journal_dir=None):
+        self.run_job = run_job
+        self.max_queue = max_queue
+        self.journal_dir = journal_dir
+        self._cond = threading.Condition()
+        self._pending = collections.deque()
+        self._jobs = collections.OrderedDict()
+        self._history_size = history_size
+        self._running = 0
+        self._stopped = False
+        if journal_dir:
+            os.makedirs(journal_dir, exist_ok=True)
+            self._recover()
+        self._threads = [
+            threading.Thread(target=self._dispatch_loop, name=f"ingest-dispatcher-{i}", daemon=True)
+            for i in range(dispatchers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, job):
+        with self._cond:
+            if len(self._pending) >= self.max_queue:
+                raise QueueFullError(
+                    f"Antrian ingestion penuh ({self.max_queue} job). Coba lagi beberapa saat lagi."
+                )
+            self._persist(job)
+            self._pending.append(job)
+            self._jobs[job.job_id] = job
+            self._trim_history()
+            self._cond.notify()
+            return len(self._pending)
+
+    def get(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return job.to_dict(self._position(job))
+
+    def list_jobs(self, client_id=None):
+        with self._cond:
+            return [
+                job.to_dict(self._position(job))
+                for job in reversed(self._jobs.values())
+                if client_id is None or job.client_id == client_id
+            ]
+
+    def stats(self):
+        with self._cond:
+            return {"queue_depth": len(self._pending), "running": self._running, "max_queue": self.max_queue}
+
+    def shutdown(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def _position(self, job):
+        # Posisi 1 = job berikutnya yang akan diproses
+        if job.stage != "queued":
+            return None
+        try:
+            return self._pending.index(job) + 1
+        except ValueError:
+            return None
+
+    def _trim_history(self):
+        # Buang job lama yang sudah selesai kalau riwayat kepanjangan.
+        # Job yang masih aktif dilewati (bukan berhenti), jadi satu job lama
+        # yang lagi jalan gak bikin riwayatnya numpuk tanpa batas.
+        excess = len(self._jobs) - self._history_size
+        for job_id, job in list(self._jobs.items()):
+            if excess <= 0:
+                break
+            if job.stage in ACTIVE_STAGES:
+                continue
+            del self._jobs[job_id]
+            self._unpersist(job)
+            excess -= 1
+
+    def _journal_path(self, job):
+        return os.path.join(self.journal_dir, f"{job.job_id}.json")
+
+    def _persist(self, job):
+        # Tulis ke file sementara + fsync, lalu rename: journal gak pernah setengah jadi
+        if not self.journal_dir:
+            return
+        path = self._journal_path(job)
+        with open(path + ".tmp", "w") as f:
+            json.dump(job.to_record(), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    def _unpersist(self, job):
+        if not self.journal_dir:
+            return
+        try:
+            os.remove(self._journal_path(job))
+        except FileNotFoundError:
+            pass
+
+    def _recover(self):
+        # Baca journal run sebelumnya: riwayat dipulihkan, job yang belum selesai diantri lagi
+        jobs = []
+        for name in os.listdir(self.journal_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.journal_dir, name), "r") as f:
+                    jobs.append(IngestJob.from_record(json.load(f)))
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"⚠️ Journal job {name} rusak, dilewati: {e}")
+        for job in sorted(jobs, key=lambda job: job.queued_at or 0):
+            self._jobs[job.job_id] = job
+            if job.stage not in ACTIVE_STAGES:
+                continue
+            if not os.path.exists(job.raw_file_path):
+                job.stage = "failed"
+                job.error = "File Raw hilang sebelum job sempat diproses"
+                job.finished_at = time.time()
+            else:
+                # Job yang kepotong di tengah transform diulang dari awal (transform-nya idempotent)
+                job.stage = "queued"
+                job.started_at = None
+                self._pending.append(job)
+            self._persist(job)
+        if self._pending:
+            logging.info(f"📬 {len(self._pending)} job dari run sebelumnya diantri ulang")
+        self._trim_history()
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                job = self._pending.popleft()
+                job.stage = "transforming"
+                job.started_at = time.time()
+                self._persist(job)
+                self._running += 1
+
+            stage, error = "done", None
+            try:
+                self.run_job(job)
+            except Exception as e:
+                stage, error = "failed", str(e)
+                logging.error(f"❌ Job {job.job_id} gagal: {e}")
+            finally:
+                with self._cond:
+                    # Status akhir diset di bawah lock: trim gak bisa buang job
+                    # di antara "selesai" dan "dicatat ke journal"
+                    job.stage, job.error = stage, error
+                    job.finished_at = time.time()
+                    if self._jobs.get(job.job_id) is job:
+                        self._persist(job)
+                    self._running -= 1
+                    self._trim_history()
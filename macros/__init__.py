@@ -0,0 +1,81 @@
+import os
+import re
+import unicodedata
+
+import duckdb
+import pyarrow.parquet as pq
+from sqlglot import exp, parse_one
+from sqlmesh import macro
+
+# Nama relasi yang dipakai kalau @client_raw_path kosong (mode Arrow handoff).
+# Server yang nge-register stream Arrow hasil upload dengan nama ini ke koneksi DuckDB.
+RAW_RELATION = "raw_upload"
+RAW_RELATION_NORMALIZED = "raw_upload_normalized"
+
+# Keyword DuckDB yang bikin nama kolom dikasih prefix '_' waktu normalize_names=True
+# (contoh: "Year" -> "_year"). Kita ambil langsung dari DuckDB biar hasilnya sama persis.
+_DUCKDB_KEYWORDS = {
+    row[0]
+    for row in duckdb.sql(
+        "SELECT keyword_name FROM duckdb_keywords() "
+        "WHERE keyword_category IN ('reserved', 'unreserved', 'type_function')"
+    ).fetchall()
+}
+
+
+def normalize_column_name(name, seen=None):
+    """
+    Tiru perilaku read_csv(normalize_names=True) punya DuckDB:
+    ' Total Discharges ' -> 'total_discharges', 'Year' -> '_year'.
+    Kalau `seen` dikasih, nama dobel otomatis dikasih suffix _1, _2, dst.
+    """
+    ascii_name = unicodedata.normalize("NFKD", str(name))
+    ascii_name = re.sub(r"[^0-9A-Za-z_\s]", "", ascii_name)
+    cleaned = "_".join(ascii_name.split()).lower() or "_"
+
+    if cleaned in _DUCKDB_KEYWORDS or cleaned[0].isdigit():
+        cleaned = f"_{cleaned}"
+
+    if seen is not None:
+        candidate, suffix = cleaned, 1
+        while candidate in seen:
+            candidate = f"{cleaned}_{suffix}"
+            suffix += 1
+        seen.add(candidate)
+        cleaned = candidate
+    return cleaned
+
+
+@macro()
+def raw_payroll(evaluator, path: str, normalize_names: bool = False):
+    """
+    Sumber data mentah untuk semua model staging.
+
+    - File .csv (format lama)  -> read_csv all_varchar seperti sebelumnya.
+    - File .parquet (Raw Zone) -> read_parquet; kolomnya sudah string semua dari server.
+      Kalau normalize_names=True, nama kolom dinormalisasi pakai skema di footer Parquet.
+    - Path kosong              -> relasi Arrow yang di-register server (tanpa file sama sekali).
+    """
+    path = str(path or "")
+    if not path:
+        return exp.to_table(RAW_RELATION_NORMALIZED if normalize_names else RAW_RELATION)
+
+    literal = exp.Literal.string(path)
+
+    if path.lower().endswith(".csv"):
+        options = "header=True, auto_detect=True, quote='\"', all_varchar=True"
+        if normalize_names:
+            options += ", normalize_names=True"
+        return parse_one(f"read_csv({literal.sql()}, {options})", read="duckdb")
+
+    source = parse_one(f"read_parquet({literal.sql()})", read="duckdb")
+    if not normalize_names or not os.path.exists(path):
+        return source
+
+    # Baca skema dari footer aja (murah), lalu alias-kan satu per satu
+    seen = set()
+    projections = [
+        exp.alias_(exp.column(name, quoted=True), normalize_column_name(name, seen), quoted=True)
+        for name in pq.read_schema(path).names
+    ]
+    return exp.select(*projections).from_(source).subquery("raw_payroll")
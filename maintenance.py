@@ -0,0 +1,164 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import duckdb
+from sqlglot import exp
+
+# Maintenance file DuckDB tenant (WAL checkpoint & compaction) di background.
+# Dulu tiap upload sukses: gc.collect() + sleep(0.5) + CHECKPOINT + VACUUM,
+# semuanya sementara client masih nunggu. Sekarang upload cuma nandain DB-nya
+# "dirty", dan scheduler ini yang ngerjain belakangan, sekaligus banyak DB,
+# pas server lagi sepi.
+
+
+class MaintenanceScheduler:
+    """
+    Scheduler maintenance DB.
+    - `mark_dirty(path)`: dipanggil setelah transform sukses.
+    - `begin_request()` / `end_request()` (atau `busy()`): dipanggil di tiap request
+      upload/query, biar maintenance nunggu server sepi.
+    - Kalau server sibuk terus, DB yang sudah dirty lebih dari `max_delay` detik
+      tetap dikerjakan (maintenance gak boleh ketunda selamanya).
+    - Tiap DB dikerjakan di bawah `db_locks` yang sama dengan transform.
+    - `before_write(path)` (opsional) dipanggil sebelum DB dibuka buat ditulis,
+      misal buat nutup koneksi query read-only ke DB itu.
+    """
+
+    def __init__(self, db_locks, idle_seconds=2.0, max_delay=300.0, poll_interval=1.0,
+                 compact_free_ratio=0.5, compact_min_blocks=16, before_write=None):
+        self.db_locks = db_locks
+        self.before_write = before_write
+        self.idle_seconds = idle_seconds
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.compact_free_ratio = compact_free_ratio
+        self.compact_min_blocks = compact_min_blocks
+        self._cond = threading.Condition()
+        self._dirty = {}  # path -> waktu pertama kali dirty
+        self._active = 0
+        self._last_activity = time.monotonic()
+        self._stopped = False
+        self.stats = {"checkpoints": 0, "compactions": 0, "skipped": 0, "errors": 0}
+        self._thread = threading.Thread(target=self._loop, name="db-maintenance", daemon=True)
+        self._thread.start()
+
+    def mark_dirty(self, db_path):
+        with self._cond:
+            self._dirty.setdefault(db_path, time.monotonic())
+            self._cond.notify()
+
+    def discard(self, db_path):
+        # DB dihapus (misal upload gagal): gak usah di-maintenance lagi
+        with self._cond:
+            self._dirty.pop(db_path, None)
+
+    def begin_request(self):
+        with self._cond:
+            self._active += 1
+
+    def end_request(self):
+        with self._cond:
+            self._active -= 1
+            self._last_activity = time.monotonic()
+            self._cond.notify()
+
+    @contextmanager
+    def busy(self):
+        self.begin_request()
+        try:
+            yield
+        finally:
+            self.end_request()
+
+    def pending(self):
+        with self._cond:
+            return len(self._dirty)
+
+    def shutdown(self, flush=True):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join()
+        if flush:
+            # Server mau mati: kerjakan sisa antrian sekarang juga
+            self._run_batch(self._take_batch(force=True))
+
+    def _take_batch(self, force=False):
+        # Ambil DB yang boleh dikerjakan: semua (kalau sepi) atau yang sudah kelamaan nunggu
+        with self._cond:
+            now = time.monotonic()
+            idle = self._active == 0 and now - self._last_activity >= self.idle_seconds
+            batch = [
+                path for path, since in self._dirty.items()
+                if force or idle or now - since >= self.max_delay
+            ]
+            for path in batch:
+                del self._dirty[path]
+            return batch
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait(self.poll_interval)
+                if self._stopped:
+                    return
+            batch = self._take_batch()
+            if batch:
+                self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        if not batch:
+            return
+        logging.info(f"🧹 Maintenance batch: {len(batch)} DB")
+        for db_path in batch:
+            try:
+                with self.db_locks.hold(db_path):
+                    if self.before_write is not None:
+                        self.before_write(db_path)
+                    self._maintain(db_path)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logging.error(f"⚠️ Maintenance gagal untuk {os.path.basename(db_path)}: {e}")
+
+    def _maintain(self, db_path):
+        if not os.path.exists(db_path):
+            self.stats["skipped"] += 1
+            return
+
+        wal_path = db_path + ".wal"
+        has_wal = os.path.exists(wal_path) and os.path.getsize(wal_path) > 0
+        with duckdb.connect(db_path) as con:
+            if has_wal:
+                # Gabungkan file sementara (.wal) ke file utama (.duckdb)
+                con.execute("CHECKPOINT;")
+                self.stats["checkpoints"] += 1
+                logging.info(f"🧹 WAL merged (checkpoint): {os.path.basename(db_path)}")
+            _, _, _, total_blocks, _, free_blocks = con.execute("PRAGMA database_size").fetchone()[:6]
+
+        # Compaction cuma kalau blok kosongnya banyak (DB histori yang sering di-merge)
+        if total_blocks >= self.compact_min_blocks and free_blocks / total_blocks >= self.compact_free_ratio:
+            self._compact(db_path)
+        elif not has_wal:
+            self.stats["skipped"] += 1
+
+    def _compact(self, db_path):
+        # DuckDB gak bisa nyusutin file di tempat, jadi isi DB disalin ke file baru lalu ditukar
+        compact_path = db_path + ".compact"
+        if os.path.exists(compact_path):
+            os.remove(compact_path)
+        size_before = os.path.getsize(db_path)
+        with duckdb.connect() as con:
+            con.execute(f"ATTACH {exp.Literal.string(db_path).sql()} AS src (READ_ONLY);")
+            con.execute(f"ATTACH {exp.Literal.string(compact_path).sql()} AS dst;")
+            con.execute("COPY FROM DATABASE src TO dst;")
+            con.execute("DETACH dst;")
+            con.execute("DETACH src;")
+        os.replace(compact_path, db_path)
+        self.stats["compactions"] += 1
+        logging.info(
+            f"🗜️ Compacted {os.path.basename(db_path)}: "
+            f"{size_before / 1024:,.0f} KiB -> {os.path.getsize(db_path) / 1024:,.0f} KiB"
+        )
@@ -1,6 +1,9 @@
+-- grain row_id: id baris dari sistem sumber (unik). Di PAYROLL_INGEST_MODE=incremental
+-- baris dengan row_id yang sama ditimpa versi terbaru, sisanya ditambahkan.
 MODEL (
   name corporate.fct_corporate,
-  kind FULL
+  kind FULL,
+  grain row_id
 );
 
 SELECT
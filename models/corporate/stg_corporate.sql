@@ -37,9 +37,6 @@ SELECT
 -- [LOGIC UTAMA]: Kita tidak lagi menulis 'seeds/raw_payroll.csv'.
 -- Kita menggunakan Macro Variable '@client_raw_path' yang disuntikkan oleh server.py.
 -- Ini memungkinkan SATU script SQL ini memproses file berbeda untuk PT yang berbeda.
-FROM read_csv(@client_raw_path, 
-    header=True, 
-    auto_detect=True, 
-    quote='"', 
-    all_varchar=True  -- Ini kuncinya! Paksa baca teks dulu semua biar gak kepotong
-);
\ No newline at end of file
+-- Macro @raw_payroll yang milih cara bacanya: Parquet dari Raw Zone (semua kolom string),
+-- atau read_csv all_varchar kalau file lama masih berupa CSV.
+FROM @raw_payroll(@client_raw_path);
\ No newline at end of file
@@ -1,3 +1,5 @@
+-- Tanpa grain: distrik + sekolah + nama guru belum tentu unik (nama bisa kembar).
+-- Di PAYROLL_INGEST_MODE=incremental baris di-merge per upload (upload ulang = ganti).
 MODEL (
   name education.fct_education,
   kind FULL
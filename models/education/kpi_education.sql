@@ -0,0 +1,19 @@
+-- KPI level tenant (satu baris): angka-angka kartu KPI & "Detail Statistik" dashboard.
+-- Dihitung dari agg_education, jadi murah walaupun fact table-nya besar.
+MODEL (
+  name education.kpi_education,
+  kind FULL
+);
+
+SELECT
+  SUM(total_budget) AS total_budget,
+  CAST(SUM(total_employee) AS BIGINT) AS total_employee,
+  SUM(total_budget) / NULLIF(SUM(total_employee), 0) AS avg_amount,
+
+  -- Statistik antar posisi (budget per job_title)
+  COUNT(*) AS total_positions,
+  MAX(total_budget) AS max_job_budget,
+  MIN(total_budget) AS min_job_budget,
+  MEDIAN(total_budget) AS median_job_budget
+
+FROM education.agg_education;
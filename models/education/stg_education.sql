@@ -31,4 +31,4 @@ SELECT
   CURRENT_TIMESTAMP AS processed_at
 
 -- Variable @client_raw_path disuntik server.py
-FROM read_csv(@client_raw_path, header=True, auto_detect=True, quote='"', all_varchar=True);
\ No newline at end of file
+FROM @raw_payroll(@client_raw_path);
\ No newline at end of file
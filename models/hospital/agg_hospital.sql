@@ -0,0 +1,25 @@
+-- Layer agregat: ringkasan per job_title, dibangun ulang tiap transform
+-- (sesudah fct_hospital). Laporan default dashboard tinggal baca tabel kecil ini,
+-- jadi latensinya gak tergantung besar data.
+MODEL (
+  name hospital.agg_hospital,
+  kind FULL
+);
+
+SELECT
+  job_title,
+
+  -- [1] VOLUME & TOTAL BIAYA
+  COUNT(*) AS total_employee,
+  SUM(total_amount) AS total_budget,
+
+  -- [2] DISTRIBUSI BIAYA PER ORANG
+  AVG(total_amount) AS avg_amount,
+  MIN(total_amount) AS min_amount,
+  QUANTILE_CONT(total_amount, 0.25) AS p25_amount,
+  MEDIAN(total_amount) AS median_amount,
+  QUANTILE_CONT(total_amount, 0.75) AS p75_amount,
+  MAX(total_amount) AS max_amount
+
+FROM hospital.fct_hospital
+GROUP BY job_title;
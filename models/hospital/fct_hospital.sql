@@ -1,3 +1,5 @@
+-- Tanpa grain: provider + layanan (DRG) bisa muncul lagi di periode lain.
+-- Di PAYROLL_INGEST_MODE=incremental baris di-merge per upload (upload ulang = ganti).
 MODEL (
   name hospital.fct_hospital,
   kind FULL
@@ -22,9 +22,5 @@ SELECT
   CURRENT_TIMESTAMP AS processed_at
 
 -- JURUS SAKTI: normalize_names=True
-FROM read_csv(@client_raw_path, 
-    header=True, 
-    auto_detect=True, 
-    normalize_names=True, 
-    quote='"', 
-    all_varchar=True);
\ No newline at end of file
+-- (berlaku juga buat Parquet: macro @raw_payroll yang normalisasi nama kolomnya)
+FROM @raw_payroll(@client_raw_path, normalize_names := TRUE);
\ No newline at end of file
@@ -0,0 +1,167 @@
+from sqlglot import exp
+
+# Query spec di tiket do_get (field "query"), contoh:
+# {
+#   "columns": ["job_title", "department", "total_amount"],
+#   "filters": [{"column": "department", "op": "=", "value": "Police"},
+#               {"column": "year", "op": "between", "value": [2012, 2013]}],
+#   "order_by": [{"column": "total_amount", "desc": true}],
+#   "limit": 500,
+#   "offset": 0
+# }
+# Spec divalidasi ke skema fact table (nama kolom + tipe nilai), lalu di-push
+# ke query DuckDB. Nilai filter selalu dikirim sebagai parameter (bukan ditempel ke SQL).
+# Paging: halaman berikutnya = offset + limit, selama jumlah baris == limit.
+# Partition [index, count] (dari endpoint get_flight_info): cuma ambil baris yang
+# hash(unique key) % count == index, jadi beberapa stream bisa dibaca paralel.
+
+SPEC_FIELDS = {"columns", "filters", "order_by", "limit", "offset"}
+COMPARISON_OPS = {"=": "=", "!=": "<>", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+LIST_OPS = {"in": "IN", "not_in": "NOT IN"}
+NULL_OPS = {"is_null": "IS NULL", "not_null": "IS NOT NULL"}
+FILTER_OPS = set(COMPARISON_OPS) | set(LIST_OPS) | set(NULL_OPS) | {"between"}
+MAX_LIST_VALUES = 1000
+
+NUMERIC_TYPES = ("TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "UTINYINT", "USMALLINT",
+                 "UINTEGER", "UBIGINT", "FLOAT", "REAL", "DOUBLE", "DECIMAL")
+
+
+class QuerySpecError(ValueError):
+    pass
+
+
+def table_columns(con, qualified_name):
+    # Kolom tabel/view + tipe DuckDB-nya, sesuai urutan di tabel
+    schema_name, table_name = qualified_name.split(".")
+    rows = con.execute(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = ? AND table_name = ? ORDER BY ordinal_position",
+        [schema_name, table_name],
+    ).fetchall()
+    return dict(rows)
+
+
+def _quote(name):
+    return exp.to_identifier(name, quoted=True).sql(dialect="duckdb")
+
+
+def _check_value(column, data_type, value):
+    # Tipe nilai harus cocok sama tipe kolom (angka ke kolom angka, teks ke kolom teks)
+    if data_type.startswith(NUMERIC_TYPES):
+        ok = isinstance(value, (int, float)) and not isinstance(value, bool)
+    elif data_type == "BOOLEAN":
+        ok = isinstance(value, bool)
+    else:
+        # VARCHAR, DATE, TIMESTAMP, dll: dikirim sebagai string (ISO buat tanggal)
+        ok = isinstance(value, str)
+    if not ok:
+        raise QuerySpecError(f"Nilai {value!r} tidak cocok untuk kolom '{column}' ({data_type})")
+    return value
+
+
+def _column(columns, name):
+    if not isinstance(name, str) or name not in columns:
+        raise QuerySpecError(f"Kolom tidak dikenal: {name!r}")
+    return name
+
+
+def partition_condition(columns, partition, keys=()):
+    # Predikat satu partisi hash; tanpa unique key, hash dihitung dari semua kolom
+    if not isinstance(partition, (list, tuple)) or len(partition) != 2:
+        raise QuerySpecError("'partition' harus berupa [index, count]")
+    index, count = partition
+    if not all(isinstance(v, int) and not isinstance(v, bool) for v in (index, count)) or not 0 <= index < count:
+        raise QuerySpecError("'partition' harus [index, count] dengan 0 <= index < count")
+    keys = [name for name in keys if name in columns] or list(columns)
+    return f"hash({', '.join(_quote(name) for name in keys)}) % {count} = {index}"
+
+
+def build_query(table, columns, spec, default_order=(), tiebreak=(), partition=None):
+    """
+    Rakit (sql, params) dari spec. `columns` = hasil table_columns().
+    `tiebreak` (unique key model) ditambahkan di ORDER BY biar urutan paging stabil,
+    dan jadi kunci hash kalau `partition` diisi.
+    """
+    if not isinstance(spec, dict):
+        raise QuerySpecError("Query spec harus berupa object JSON")
+    unknown = set(spec) - SPEC_FIELDS
+    if unknown:
+        raise QuerySpecError(f"Field query tidak dikenal: {sorted(unknown)}")
+
+    # [1] PROJECTION
+    selected = spec.get("columns") or list(columns)
+    if not isinstance(selected, list):
+        raise QuerySpecError("'columns' harus berupa list")
+    select_sql = ", ".join(_quote(_column(columns, name)) for name in selected)
+
+    # [2] FILTER (semua digabung pakai AND)
+    conditions, params = [], []
+    filters = spec.get("filters") or []
+    if not isinstance(filters, list):
+        raise QuerySpecError("'filters' harus berupa list")
+    for item in filters:
+        if not isinstance(item, dict):
+            raise QuerySpecError("Tiap filter harus berupa object {column, op, value}")
+        name = _column(columns, item.get("column"))
+        data_type = columns[name]
+        op = item.get("op", "=")
+        value = item.get("value")
+        column_sql = _quote(name)
+        if op in COMPARISON_OPS:
+            conditions.append(f"{column_sql} {COMPARISON_OPS[op]} ?")
+            params.append(_check_value(name, data_type, value))
+        elif op in LIST_OPS:
+            if not isinstance(value, list) or not value or len(value) > MAX_LIST_VALUES:
+                raise QuerySpecError(f"Filter '{op}' butuh list 1-{MAX_LIST_VALUES} nilai")
+            conditions.append(f"{column_sql} {LIST_OPS[op]} ({', '.join('?' for _ in value)})")
+            params.extend(_check_value(name, data_type, v) for v in value)
+        elif op == "between":
+            if not isinstance(value, list) or len(value) != 2:
+                raise QuerySpecError("Filter 'between' butuh list [min, max]")
+            conditions.append(f"{column_sql} BETWEEN ? AND ?")
+            params.extend(_check_value(name, data_type, v) for v in value)
+        elif op in NULL_OPS:
+            conditions.append(f"{column_sql} {NULL_OPS[op]}")
+        else:
+            raise QuerySpecError(f"Operator filter tidak dikenal: {op!r} (pilihan: {sorted(FILTER_OPS)})")
+
+    if partition is not None:
+        conditions.append(partition_condition(columns, partition, tiebreak))
+        if spec.get("limit") is not None or spec.get("offset"):
+            # limit/offset berlaku ke seluruh hasil, gak bisa dipecah per partisi
+            raise QuerySpecError("'limit'/'offset' tidak bisa digabung dengan partition")
+
+    # [3] ORDER BY (+ tiebreak unique key)
+    order_by = spec.get("order_by")
+    if order_by is None:
+        order_by = list(default_order)
+    if not isinstance(order_by, list):
+        raise QuerySpecError("'order_by' harus berupa list")
+    order_terms, ordered = [], set()
+    for item in order_by:
+        name, desc = (item, False) if isinstance(item, str) else (
+            item.get("column") if isinstance(item, dict) else None,
+            bool(item.get("desc")) if isinstance(item, dict) else False,
+        )
+        name = _column(columns, name)
+        order_terms.append(f"{_quote(name)}{' DESC' if desc else ''}")
+        ordered.add(name)
+    order_terms += [_quote(name) for name in tiebreak if name in columns and name not in ordered]
+
+    # [4] LIMIT / OFFSET
+    limit, offset = spec.get("limit"), spec.get("offset", 0)
+    if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool) or limit < 0):
+        raise QuerySpecError("'limit' harus bilangan bulat >= 0")
+    if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+        raise QuerySpecError("'offset' harus bilangan bulat >= 0")
+
+    sql = f"SELECT {select_sql} FROM {table}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if order_terms:
+        sql += " ORDER BY " + ", ".join(order_terms)
+    if limit is not None:
+        sql += f" LIMIT {limit}"
+    if offset:
+        sql += f" OFFSET {offset}"
+    return sql, params
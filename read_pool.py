@@ -0,0 +1,165 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import duckdb
+
+# Pool koneksi DuckDB read-only buat query dashboard (do_get).
+# Satu koneksi dasar per file Clean .duckdb dibiarkan terbuka (katalog & buffer
+# cache tetap hangat), tiap request cuma dapat cursor() dari koneksi itu.
+# Sebelum file DB ditulis (transform, merge, maintenance), koneksinya wajib
+# di-invalidate dulu: DuckDB gak ngebolehin writer selama ada koneksi read-only.
+
+
+class _PoolEntry:
+    __slots__ = ("con", "signature", "last_used", "leases", "retired")
+
+    def __init__(self, con, signature):
+        self.con = con
+        self.signature = signature
+        self.last_used = time.monotonic()
+        self.leases = 0        # Cursor dari koneksi ini yang masih dipakai
+        self.retired = False   # Sudah dicabut dari pool: ditutup pas lease terakhir balik
+
+
+def _file_signature(db_path):
+    # File ditulis ulang / di-compact (os.replace) -> inode, mtime atau size berubah
+    stat = os.stat(db_path)
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class ReadConnectionPool:
+    """
+    Pool LRU koneksi read-only per file DB.
+    - `acquire(path)` -> cursor, wajib dibalikin lewat `release(path, cursor)`.
+    - Koneksi yang nganggur lebih dari `idle_seconds` atau kelebihan `max_open` ditutup.
+    - `invalidate(path)` dipanggil writer (di bawah db_locks): koneksi dicabut dari pool,
+      writer nunggu cursor yang masih jalan selesai (maks `drain_timeout` detik).
+      Koneksi yang masih dipakai GAK PERNAH ditutup paksa: yang nutup `release()` terakhir.
+    """
+
+    def __init__(self, db_locks, max_open=32, idle_seconds=300.0, drain_timeout=30.0):
+        self.db_locks = db_locks
+        self.max_open = max_open
+        self.idle_seconds = idle_seconds
+        self.drain_timeout = drain_timeout
+        self._cond = threading.Condition()
+        self._entries = OrderedDict()  # path -> _PoolEntry (urutan LRU)
+        self._leased = {}              # id(cursor) -> _PoolEntry asal cursor itu
+        self.stats = {"hits": 0, "opens": 0, "evictions": 0, "invalidations": 0}
+
+    def acquire(self, db_path):
+        signature = _file_signature(db_path)  # File gak ada -> FileNotFoundError
+        with self._cond:
+            self._sweep_locked()
+            entry = self._entries.get(db_path)
+            if entry is not None and entry.signature == signature:
+                self.stats["hits"] += 1
+                return self._lease_locked(db_path, entry)
+            if entry is not None:
+                # File berubah di luar server: koneksi lama dipensiunkan, buka ulang
+                self._retire_locked(db_path)
+
+        # Buka koneksi baru di bawah lock DB: kalau lagi ada writer, tunggu dia selesai
+        with self.db_locks.hold(db_path):
+            con = duckdb.connect(database=db_path, read_only=True)
+            signature = _file_signature(db_path)
+        with self._cond:
+            entry = self._entries.get(db_path)
+            if entry is None or entry.signature != signature:
+                if entry is not None:
+                    self._retire_locked(db_path)
+                entry = _PoolEntry(con, signature)
+                self._entries[db_path] = entry
+                self.stats["opens"] += 1
+                logging.info(f"🔌 Pool: koneksi read-only dibuka: {os.path.basename(db_path)}")
+            else:
+                # Thread lain sudah buka duluan (instance DuckDB-nya sama), pakai yang ada
+                con.close()
+            cursor = self._lease_locked(db_path, entry)
+            self._evict_locked()
+            return cursor
+
+    def release(self, db_path, cursor):
+        try:
+            cursor.close()
+        finally:
+            with self._cond:
+                entry = self._leased.pop(id(cursor))
+                entry.leases -= 1
+                if entry.leases <= 0:
+                    if entry.retired:
+                        # Lease terakhir dari koneksi yang sudah dipensiunkan: baru sekarang ditutup
+                        entry.con.close()
+                    self._cond.notify_all()
+
+    def invalidate(self, db_path):
+        # Dipanggil writer SEBELUM file DB ditulis (sudah pegang db_locks untuk path ini)
+        with self._cond:
+            if self._retire_locked(db_path):
+                self.stats["invalidations"] += 1
+
+    def close_all(self):
+        with self._cond:
+            for db_path in list(self._entries):
+                self._retire_locked(db_path, wait=False)
+
+    def open_connections(self):
+        with self._cond:
+            return len(self._entries)
+
+    def _lease_locked(self, db_path, entry):
+        self._entries.move_to_end(db_path)
+        entry.last_used = time.monotonic()
+        cursor = entry.con.cursor()
+        entry.leases += 1
+        self._leased[id(cursor)] = entry
+        return cursor
+
+    def _retire_locked(self, db_path, wait=True):
+        # Request baru gak bisa dapat cursor lagi (entry langsung dicabut).
+        # Koneksi dasar cuma ditutup kalau gak ada cursor yang masih jalan;
+        # kalau masih ada, yang nutup release() terakhir.
+        # (Nutup koneksi dasar selagi cursor-nya masih stream bikin DuckDB crash/macet.)
+        entry = self._entries.pop(db_path, None)
+        if entry is None:
+            return False
+        entry.retired = True
+        if wait:
+            # Writer nunggu reader selesai dulu, biar lock file-nya sudah lepas pas dia nulis
+            deadline = time.monotonic() + self.drain_timeout
+            while entry.leases > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logging.warning(
+                        f"⚠️ Pool: query {os.path.basename(db_path)} belum selesai, "
+                        "koneksi ditutup setelah query itu selesai"
+                    )
+                    break
+                self._cond.wait(remaining)
+        if entry.leases == 0:
+            entry.con.close()
+        return True
+
+    def _close_locked(self, db_path):
+        entry = self._entries.pop(db_path)
+        entry.con.close()
+
+    def _sweep_locked(self):
+        # Tutup koneksi yang kelamaan nganggur (dan gak lagi dipakai)
+        now = time.monotonic()
+        for db_path, entry in list(self._entries.items()):
+            if now - entry.last_used >= self.idle_seconds and not entry.leases:
+                self._close_locked(db_path)
+                self.stats["evictions"] += 1
+
+    def _evict_locked(self):
+        # Kelebihan kuota: buang yang paling lama gak dipakai (yang masih dipakai dilewati)
+        for db_path in list(self._entries):
+            if len(self._entries) <= self.max_open:
+                break
+            if not self._entries[db_path].leases:
+                self._close_locked(db_path)
+                self.stats["evictions"] += 1
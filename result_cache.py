@@ -0,0 +1,77 @@
+import json
+import threading
+from collections import OrderedDict
+
+# Cache hasil query dashboard (do_get) di memory server, disimpan sebagai Arrow Table
+# (cache hit langsung di-stream balik tanpa konversi apa pun).
+# Key: tenant + file DB + versi DB + action + parameter query.
+# Versi DB naik tiap kali DB itu ditulis ulang (upload / merge), jadi entry lama
+# otomatis gak kepakai lagi dan langsung dibuang.
+
+
+class ResultCache:
+    """
+    LRU dibatasi total ukuran (`max_bytes`, dihitung dari Table.nbytes).
+    Hasil yang lebih gede dari `max_entry_bytes` gak di-cache (biar satu export
+    full gak ngusir semua laporan kecil).
+    """
+
+    def __init__(self, max_bytes=256 << 20, max_entry_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes if max_entry_bytes is not None else max_bytes // 4
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> pa.Table (urutan LRU)
+        self._versions = {}            # db_path -> versi (naik tiap invalidate)
+        self._size = 0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def key(self, client_id, db_path, action, params=None):
+        with self._lock:
+            version = self._versions.get(db_path, 0)
+        return (client_id, db_path, version, action, json.dumps(params or {}, sort_keys=True))
+
+    def get(self, key):
+        with self._lock:
+            table = self._entries.get(key)
+            if table is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return table
+
+    def put(self, key, table):
+        size = table.nbytes
+        if not self.enabled or size > self.max_entry_bytes:
+            return False
+        with self._lock:
+            # Query-nya mulai sebelum DB ditulis ulang: hasilnya sudah basi, jangan disimpan
+            if key[2] != self._versions.get(key[1], 0):
+                return False
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old.nbytes
+            self._entries[key] = table
+            self._size += size
+            self.stats["stores"] += 1
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.nbytes
+                self.stats["evictions"] += 1
+        return True
+
+    def invalidate(self, db_path):
+        # Dipanggil sebelum DB ditulis ulang: naikin versi + buang semua entry DB itu
+        with self._lock:
+            self._versions[db_path] = self._versions.get(db_path, 0) + 1
+            for key in [k for k in self._entries if k[1] == db_path]:
+                self._size -= self._entries.pop(key).nbytes
+            self.stats["invalidations"] += 1
+
+    def summary(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), bytes=self._size, max_bytes=self.max_bytes)
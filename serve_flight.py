@@ -1,256 +1,682 @@
 import pyarrow.flight as flight
 import pyarrow as pa
-import duckdb
+import pyarrow.parquet as pq
+import hashlib
 import json
 import logging
 import time
 import os
 import pandas as pd
-import gc
-import hashlib
+import tempfile
 import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 from sqlmesh.core.context import Context
 
+import archive_writer
+import auth
+import csv_ingest
+import dedupe
+import ingest_jobs
+import maintenance
+import query_spec
+import read_pool
+import result_cache
+import tenant_dataset
+import transform_engine
+import upload_spool
+import upload_validation
+
 # Setup biar kita bisa lihat aktivitas server di terminal (monitoring)
 logging.basicConfig(
     level=logging.INFO, 
     format='%(asctime)s - [SERVER] - %(message)s'
 )
 
+# Kompresi file Parquet di Raw Zone. Snappy dipilih karena paling ringan di CPU,
+# jadi penulisan Raw bisa jalan secepat disk.
+RAW_PARQUET_COMPRESSION = "snappy"
+
+# Mode serah-terima data upload ke model staging:
+# - "file"  : tulis Raw Parquet dulu, lalu SQLMesh plan baca file itu (default)
+# - "arrow" : stream Arrow langsung di-scan DuckDB, Raw Parquet ditulis di background
+HANDOFF_MODES = ("file", "arrow")
+
+# Mesin transformasi untuk handoff "file":
+# - "plan"     : SQLMesh Context + plan baru per upload (default, paling lengkap)
+# - "compiled" : SQL model di-render sekali & di-cache, lalu langsung dieksekusi
+#                ke DuckDB tenant (tanpa load project / plan / state per upload)
+TRANSFORM_MODES = ("plan", "compiled")
+# replace = tiap file upload jadi .duckdb sendiri (dibangun ulang penuh)
+# incremental = upload delta di-merge ke DB histori tenant per industri
+INGEST_MODES = ("replace", "incremental")
+# Journal job ingestion async (satu file JSON per job), di luar folder tenant
+JOB_JOURNAL_DIR = os.path.join("storage", ".jobs")
+# Codec kompresi buffer Arrow IPC yang didukung, urut dari yang paling diprioritaskan.
+# Kolom payroll (job_title, department, ...) isinya berulang-ulang, jadi kompresinya bagus.
+IPC_COMPRESSION_CODECS = ("zstd", "lz4")
+# Jumlah baris per batch waktu hasil query di-stream ke client (do_get).
+# Memory server cuma kepake beberapa batch, bukan seluruh hasil query.
+STREAM_BATCH_ROWS = 65_536
+# get_flight_info: target baris per partisi (endpoint) dan sampel buat perkiraan ukuran
+PARTITION_ROWS = 250_000
+PARTITION_SAMPLE_ROWS = 1_000
+# Export file (action export_full): format yang didukung & ukuran potongan byte per batch
+EXPORT_FORMATS = ("parquet", "csv")
+EXPORT_CHUNK_BYTES = 4 << 20
+# Action get_insights: jumlah posisi teratas default & batas atasnya
+INSIGHTS_TOP_N = 10
+INSIGHTS_MAX_TOP_N = 100
+
+class _ReleasingStream:
+    """
+    Iterator batch buat GeneratorStream yang pegang resource request (lease koneksi,
+    counter maintenance, file export sementara). Resource dilepas tepat sekali:
+    begitu stream habis / error, waktu close(), atau waktu objeknya dibuang Flight.
+    `finally` di generator aja gak cukup: kalau client putus sebelum batch pertama,
+    generator gak pernah jalan dan finally-nya gak pernah dieksekusi.
+    """
+
+    def __init__(self, batches, release):
+        self._batches = batches
+        self._release = release
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._batches)
+        except BaseException:
+            # StopIteration (stream selesai) atau error: lepas sekarang, jangan nunggu GC
+            self.close()
+            raise
+
+    def close(self):
+        release, self._release = self._release, None
+        if release is None:
+            return
+        try:
+            self._batches.close()
+        finally:
+            release()
+
+    def __del__(self):
+        self.close()
+
+
 class BusinessSolutionServer(flight.FlightServerBase):
     
-    def __init__(self, location):
-        # Inisialisasi server Arrow Flight standar
-        super(BusinessSolutionServer, self).__init__(location)
+    def __init__(self, location, handoff_mode="file", transform_mode="plan", transform_workers=None,
+                 async_ingest=False, max_queued_jobs=32, ingest_mode="replace",
+                 ipc_compression=IPC_COMPRESSION_CODECS, session_ttl=900,
+                 stream_batch_rows=STREAM_BATCH_ROWS, pool_max_open=32, pool_idle_seconds=300.0,
+                 result_cache_bytes=256 << 20, partition_rows=PARTITION_ROWS, max_partitions=None,
+                 archive_queue_size=16, storage_layout="per_upload"):
+        # Registry user (users.json di memory) + session token hasil login
+        self.credentials = auth.CredentialRegistry("users.json")
+        self.sessions = auth.SessionStore(self.credentials, ttl_seconds=session_ttl)
+
+        # Inisialisasi server Arrow Flight standar, plus middleware yang nge-resolve token
+        super(BusinessSolutionServer, self).__init__(
+            location,
+            middleware={auth.MIDDLEWARE_KEY: auth.AuthMiddlewareFactory(self.sessions)},
+        )
+
+        if handoff_mode not in HANDOFF_MODES:
+            raise ValueError(f"handoff_mode harus salah satu dari {HANDOFF_MODES}")
+        self.handoff_mode = handoff_mode
+        if transform_mode not in TRANSFORM_MODES:
+            raise ValueError(f"transform_mode harus salah satu dari {TRANSFORM_MODES}")
+        self.transform_mode = transform_mode
+        if async_ingest and handoff_mode == "arrow":
+            # Mode arrow butuh stream client tetap terbuka selama transform, jadi gak bisa async
+            raise ValueError("async_ingest hanya bisa dipakai dengan handoff_mode='file'")
+        self.async_ingest = async_ingest
+        if ingest_mode not in INGEST_MODES:
+            raise ValueError(f"ingest_mode harus salah satu dari {INGEST_MODES}")
+        if ingest_mode == "incremental" and transform_mode == "plan" and handoff_mode == "file":
+            # Merge delta cuma ada di eksekusi langsung (compiled / arrow), bukan di SQLMesh plan
+            raise ValueError("ingest_mode='incremental' butuh transform_mode='compiled' atau handoff_mode='arrow'")
+        self.ingest_mode = ingest_mode
+        if storage_layout not in tenant_dataset.STORAGE_LAYOUTS:
+            raise ValueError(f"storage_layout harus salah satu dari {tenant_dataset.STORAGE_LAYOUTS}")
+        self.storage_layout = storage_layout
+        # Codec yang ditawarkan ke client (cuma yang memang ada di build pyarrow ini)
+        self.ipc_compression = [
+            codec for codec in ipc_compression
+            if codec in IPC_COMPRESSION_CODECS and pa.Codec.is_available(codec)
+        ]
+        self.stream_batch_rows = stream_batch_rows
+        # Read besar dipecah jadi beberapa endpoint (maks satu per core)
+        self.partition_rows = partition_rows
+        self.max_partitions = max_partitions or os.cpu_count() or 1
         
         # Info logging bahwa server mulai start
         logging.info("🔧 Initializing SQLMesh Engine (Multi-Tenant Mode)...")
         
         # Load engine SQLMesh (otak pemrosesan data) dari folder saat ini
         self.mesh_context = Context(paths=".")
+        # Cache SQL hasil render model (dipakai mode compiled & arrow)
+        self.model_cache = transform_engine.CompiledModelCache(self.mesh_context)
+        # Index fingerprint upload per tenant (buat skip upload yang identik)
+        self.upload_index = dedupe.UploadIndex()
+        # Spool batch upload resumable (storage/<client>/Uploads/<upload_id>/)
+        self.upload_spool = upload_spool.UploadSpool()
+        self.upload_spool.purge_stale()
         
-        # Lokasi file database user (JSON)
-        self.user_db_path = "users.json"
-        
-        # KUNCI PENTING: Lock ini biar kalau ada banyak user upload barengan,
-        # prosesnya antri satu-satu (biar SQLMesh gak crash/race condition)
-        self.upload_lock = threading.Lock()
-        logging.info("🔒 Thread-safe upload lock initialized")
-
-    def _hash_password(self, plain_password):
-        # Fitur Keamanan: Ubah password teks biasa jadi kode acak (SHA-256)
-        # Biar kalau database bocor, password asli gak ketahuan
-        return hashlib.sha256(str(plain_password).strip().encode()).hexdigest()
-
-    def _verify_credentials(self, client_id, password):
-        # Cek apakah file database user ada?
-        if not os.path.exists(self.user_db_path):
-            logging.error("❌ Database users.json tidak ditemukan!")
-            return False
+        # KUNCI PENTING: Lock per file DuckDB output. Upload ke DB yang sama antri
+        # satu-satu (biar SQLMesh gak crash/race condition), tapi tenant lain
+        # (DB beda) gak perlu ikut nunggu.
+        self.db_locks = transform_engine.KeyedLocks()
+        logging.info("🔒 Per-database upload locks initialized")
 
-        # Baca data user dari file JSON
-        with open(self.user_db_path, "r") as f:
-            users = json.load(f)
+        # Koneksi read-only per DB buat query dashboard (katalog & cache tetap hangat).
+        # Tiap writer wajib invalidate dulu sebelum nulis ke file DB-nya.
+        self.read_pool = read_pool.ReadConnectionPool(
+            self.db_locks, max_open=pool_max_open, idle_seconds=pool_idle_seconds
+        )
 
-        # Cek 1: Apakah Username/Client ID terdaftar?
-        if client_id not in users:
-            logging.warning(f"🔐 Akses Ditolak: Client_ID '{client_id}' tidak terdaftar.")
-            return False
+        # Cache hasil laporan (Arrow Table), versinya ikut naik tiap DB ditulis ulang
+        self.result_cache = result_cache.ResultCache(max_bytes=result_cache_bytes)
 
-        # Ambil password hash yang tersimpan di DB
-        stored_hash = users[client_id].get('password')
-        # Hash password yang diinput user sekarang
-        input_hash = self._hash_password(password)
-        
-        # Cek 2: Bandingkan hash input vs hash tersimpan (harus sama persis)
-        if input_hash != stored_hash:
-            logging.warning(f"🔐 Akses Ditolak: Password salah untuk Client_ID: {client_id}")
-            return False
+        # Arsip save_copy (Parquet) ditulis thread background dengan antrian terbatas
+        self.archiver = archive_writer.ArchiveWriter(max_pending=archive_queue_size)
+
+        # Checkpoint WAL & compaction DB jalan di background pas server sepi,
+        # bukan lagi di jalur upload (client gak perlu nunggu)
+        self.maintenance = maintenance.MaintenanceScheduler(
+            self.db_locks, before_write=self.read_pool.invalidate
+        )
+
+        # Worker pool buat SQLMesh plan. Pakai 'spawn' (bukan fork) karena server
+        # gRPC sudah punya banyak thread; fork dari proses multi-thread rawan deadlock.
+        self.transform_workers = transform_workers or os.cpu_count() or 1
+        self.transform_pool = ProcessPoolExecutor(
+            max_workers=self.transform_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=transform_engine.init_worker,
+        )
+        logging.info(f"🧵 Transform worker pool: {self.transform_workers} process(es)")
 
-        # Cek 3: Pastikan user punya folder penyimpanan sendiri (Tenant Isolation)
+        # Scheduler job ingestion (mode async): upload langsung dapat job id,
+        # transform jalan di background dengan antrian terbatas.
+        self.job_scheduler = None
+        if self.async_ingest:
+            self.job_scheduler = ingest_jobs.IngestJobScheduler(
+                self._run_ingest_job,
+                dispatchers=self.transform_workers,
+                max_queue=max_queued_jobs,
+                journal_dir=JOB_JOURNAL_DIR,  # Job yang belum selesai diulang setelah restart
+            )
+            logging.info(f"📬 Async ingestion ON (max {max_queued_jobs} queued jobs)")
+        logging.info(
+            f"🔀 Handoff mode: {self.handoff_mode.upper()} | Transform mode: {self.transform_mode.upper()} "
+            f"| Ingest mode: {self.ingest_mode.upper()}"
+        )
+        logging.info(f"🗜️ IPC compression: {', '.join(self.ipc_compression) or 'OFF'}")
+
+    def _tenant_ready(self, client_id):
+        # Pastikan user punya folder penyimpanan sendiri (Tenant Isolation)
         tenant_path = os.path.join("storage", client_id)
         if not os.path.exists(tenant_path):
             logging.error(f"⚠️ Infrastruktur folder untuk {client_id} belum ada!")
             return False
-            
-        logging.info(f"✅ Login Berhasil: {client_id}")
         return True
 
-    # Fungsi utama untuk menangani UPLOAD data (Put)
-    def do_put(self, context, descriptor, reader, writer):
-        temp_context = None 
-        clean_db_path = None # Variable penampung path DB (buat jaga-jaga kalau perlu dihapus)
-        
+    def _authorize(self, context, client_id, password):
+        """
+        Balikin (client_id, user_data). user_data None = akses ditolak.
+        - Ada session token (sudah di-resolve middleware): cuma lookup dict.
+        - Mode lama (password di tiket): cek hash ke registry + folder tenant.
+        """
+        session = context.get_middleware(auth.MIDDLEWARE_KEY)
+        if session is not None:
+            if client_id and client_id != session.client_id:
+                logging.warning(f"🔐 Akses Ditolak: token {session.client_id} dipakai untuk '{client_id}'")
+                return client_id, None
+            return session.client_id, session.user_data
+
+        if not client_id or not password:
+            return client_id, None
+        user_data = self.credentials.verify(client_id, password)
+        if user_data is None or not self._tenant_ready(client_id):
+            return client_id, None
+        return client_id, user_data
+
+    def _action_auth(self, context, info):
+        # Versi _authorize buat do_action: balikin (client_id, user_data, pesan error)
+        session = context.get_middleware(auth.MIDDLEWARE_KEY)
+        if session is None and (not info.get('client_id') or not info.get('password')):
+            return info.get('client_id'), None, "Kredensial tidak lengkap"
+        client_id, user_data = self._authorize(context, info.get('client_id'), info.get('password'))
+        if user_data is None:
+            return client_id, None, "Invalid credentials"
+        return client_id, user_data, None
+
+    def _write_raw_parquet(self, schema, batches, raw_file_path):
+        # Tulis ke file sementara dulu, baru di-rename kalau stream sudah lengkap.
+        # Jadi kalau koneksi putus di tengah jalan, Raw Zone gak ketinggalan file setengah jadi.
+        # Sambil nulis, isi tiap batch di-hash (fingerprint buat dedupe).
+        # File .part dikembalikan ke pemanggil: di-rename atau dibuang (kalau duplikat).
+        part_path = raw_file_path + ".part"
+        total_rows = 0
+        fingerprint = dedupe.StreamFingerprint(schema)
         try:
-            # STEP 1: PARSING & AUTHENTICATION
-            # Baca metadata yang dikirim client (ID, Pass, Nama File)
-            metadata = json.loads(descriptor.path[0].decode('utf-8'))
-            client_id = metadata.get('client_id')
-            password = metadata.get('password')
-            target_file = metadata.get('filename')
-            
-            # Buka DB user lagi buat ambil info detail user
-            with open(self.user_db_path, "r") as f:
-                users = json.load(f)
-            
-            user_data = users.get(client_id)
-            
-            # Verifikasi password lagi sebelum proses lanjut
-            if not user_data or self._hash_password(password) != user_data.get('password'):
-                raise flight.FlightServerError("❌ AUTHENTICATION_FAILED")
+            with pq.ParquetWriter(part_path, schema, compression=RAW_PARQUET_COMPRESSION) as raw_writer:
+                for batch in batches:
+                    raw_writer.write_batch(batch)
+                    fingerprint.update(batch)
+                    total_rows += batch.num_rows
+        except Exception:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        return part_path, total_rows, fingerprint.hexdigest()
 
-            # Ambil jenis industri user (corporate/education/hospital)
-            industry_type = user_data.get('industry_type', 'corporate').lower()
-            
-            # ================================================================
-            # [VALIDASI NAMA FILE] - Security Check
-            # ================================================================
-            # Ubah nama file jadi huruf kecil semua biar gak masalah huruf besar/kecil
-            filename_check = target_file.lower()
-            
-            logging.info(f"🔍 Validasi Nama File: User='{industry_type}' vs File='{target_file}'")
-            
-            # Cek: Apakah nama file mengandung kata jenis industri user?
-            if industry_type not in filename_check:
-                error_msg = (
-                    f"❌ REJECTED! User tipe '{industry_type}' hanya boleh upload file "
-                    f"yang mengandung kata '{industry_type}' di namanya."
+    def _run_arrow_handoff(self, schema, batches, client_id, industry_type, raw_file_path, clean_db_path, upload=None):
+        # Batch dari client langsung di-scan DuckDB (tanpa file perantara).
+        # Salinan Raw Zone tetap dibuat, tapi oleh thread background.
+        raw_writer = transform_engine.RawZoneWriter(
+            raw_file_path, schema, compression=RAW_PARQUET_COMPRESSION
+        )
+
+        def tee_batches():
+            for batch in batches:
+                raw_writer.put(batch)
+                yield batch
+
+        try:
+            logging.info(f"⏳ Waiting for DB lock... (Client: {client_id})")
+            with self.db_locks.hold(clean_db_path):
+                logging.info(f"🔒 LOCK ACQUIRED: {client_id}")
+                self._before_db_write(clean_db_path)
+                # Handoff arrow gak bisa dedupe (lihat dedupe.py), tapi DB ini dibangun
+                # ulang: entry dedupe lama gak berlaku lagi
+                self.upload_index.forget(client_id, clean_db_path)
+                compiled = self.model_cache.get(industry_type)
+                relation = transform_engine.raw_relation_for(compiled)
+                source = transform_engine.arrow_source_reader(schema, tee_batches(), relation)
+                logging.info(f"🎯 Arrow Handoff for: {[model.name for model in compiled]}")
+                summary = transform_engine.run_compiled_models(
+                    clean_db_path, compiled, source, relation,
+                    incremental=self.ingest_mode == "incremental", upload=upload,
                 )
-                logging.error(error_msg)
-                # Kalau gak ada, TOLAK dan STOP proses disini.
-                raise flight.FlightServerError(error_msg)
-                
-            logging.info("✅ Validasi Nama File: OK")
-            # ================================================================
-
-            # STEP 2: PATH CONSTRUCTION (Siapkan lokasi file)
-            # Bersihkan ekstensi file (.csv) dari nama
-            base_filename = os.path.splitext(target_file)[0]
-            # Bikin nama file database output yang unik
-            clean_db_name = f"{client_id}_{industry_type}_{base_filename}.duckdb"
-            
-            # Tentukan path lengkap folder Raw (File Mentah)
-            raw_file_path = os.path.abspath(
-                os.path.join("storage", client_id, "Raw", target_file)
-            ).replace("\\", "/")
+                publish_error = self._publish_dataset(client_id, industry_type, clean_db_path, raw_file_path, summary)
+                logging.info(f"🔓 LOCK RELEASED: {client_id}")
+        except Exception:
+            raw_writer.abort()
+            self._cleanup_failed_db(clean_db_path)
+            raise
+        # Sukses: Raw Zone diselesaikan di background, client gak perlu nunggu
+        raw_writer.close()
+        return publish_error
+
+    def _run_transform(self, client_id, industry_type, raw_file_path, clean_db_path, fingerprint=None, upload=None):
+        # STEP 4: SQLMESH TRANSFORMATION EXECUTION
+        logging.info(f"⏳ Waiting for DB lock... (Client: {client_id})")
+        
+        # Antri per file DB output saja. Plan-nya sendiri jalan di worker process,
+        # path Raw & DB dikirim sebagai argumen (bukan lewat os.environ).
+        with self.db_locks.hold(clean_db_path):
+            logging.info(f"🔒 LOCK ACQUIRED: {client_id}")
+            self._before_db_write(clean_db_path)
+            # DB mau dibangun ulang: entry dedupe lama gak berlaku lagi
+            self.upload_index.forget(client_id, clean_db_path)
+            model_version = self.model_cache.model_version(industry_type)
             
-            # Tentukan path lengkap folder Clean (Hasil Olahan)
-            clean_db_path = os.path.abspath(
-                os.path.join("storage", client_id, "Clean", clean_db_name)
-            ).replace("\\", "/")
-
-            # STEP 3: SAVE RAW CSV
-            # Pastikan folder Raw ada, kalau belum ada, buat dulu
-            os.makedirs(os.path.dirname(raw_file_path), exist_ok=True)
+            if self.transform_mode == "compiled":
+                # Fast path: SQL sudah di-render & di-cache, worker tinggal eksekusi
+                future = self.transform_pool.submit(
+                    transform_engine.run_compiled_models,
+                    clean_db_path,
+                    self.model_cache.get(industry_type),
+                    raw_file_path,
+                    incremental=self.ingest_mode == "incremental",
+                    upload=upload,
+                )
+            else:
+                future = self.transform_pool.submit(
+                    transform_engine.run_plan_transform,
+                    industry_type,
+                    raw_file_path,
+                    clean_db_path,
+                )
+            try:
+                summary = future.result()
+            except Exception:
+                # [SAFETY FEATURE] HAPUS FILE CORRUPT
+                self._cleanup_failed_db(clean_db_path)
+                raise
+            if fingerprint:
+                self.upload_index.record(client_id, clean_db_path, fingerprint, model_version, raw_file_path)
+            publish_error = self._publish_dataset(client_id, industry_type, clean_db_path, raw_file_path, summary)
             
-            # Baca data stream dari client dan ubah jadi Pandas DataFrame
-            inp_table = reader.read_all()
-            df = inp_table.to_pandas()
-            # Simpan file asli ke folder Raw (Backup data mentah)
-            df.to_csv(raw_file_path, index=False)
+            # STEP 5: WAL FILE CLEANUP -> diserahkan ke maintenance scheduler (background)
+            self.maintenance.mark_dirty(clean_db_path)
             
-            logging.info(f"💾 File Raw Tersimpan: {target_file}")
+            logging.info(f"🔓 LOCK RELEASED: {client_id}")
+            # Kunci dilepas, upload lain ke DB ini boleh masuk
+        
+        logging.info(f"✅ SUCCESS: {industry_type.upper()} Data Processed & Cleaned.")
+        return publish_error
 
-            # STEP 4: SQLMESH TRANSFORMATION EXECUTION
-            logging.info(f"⏳ Waiting for SQLMesh lock... (Client: {client_id})")
-            
-            # Mulai mode Antrian (Thread Safe). Hanya 1 proses SQLMesh jalan di satu waktu.
-            with self.upload_lock:
-                logging.info(f"🔒 LOCK ACQUIRED: {client_id}")
-                
-                # Masukkan path file raw dan db output ke variable lingkungan
-                # Biar SQLMesh tau file mana yang harus diproses
-                os.environ["SQLMESH__VARIABLES__CLIENT_RAW_PATH"] = raw_file_path
-                os.environ["SQLMESH__GATEWAYS__LOCAL__CONNECTION__DATABASE"] = clean_db_path
-                
-                # Tentukan model SQL mana yang mau dijalankan (sesuai industri user)
-                target_models = [
-                    f"{industry_type}.stg_{industry_type}", # Staging
-                    f"{industry_type}.fct_{industry_type}" # Fact Table
-                ]
-                
-                logging.info(f"🎯 SQLMesh Planning for: {target_models}")
-                
-                # Inisialisasi context sementara dan jalankan Plan
-                temp_context = Context(paths=".")
-                temp_context.plan(
-                    select_models=target_models,
-                    auto_apply=True,       # Langsung eksekusi tanpa tanya
-                    no_prompts=True,       # Jangan munculin prompt di terminal
-                    include_unmodified=True # Proses ulang walaupun model gak berubah
+    def _storage_etag(self, client_id):
+        # ETag storage tenant dari stat file Raw/Clean/Dataset (nama, mtime, ukuran), tanpa baca isi.
+        # Berubah tiap ada upload, DB ditulis ulang / di-compact, atau dataset dipublish.
+        digest = hashlib.sha256()
+        base_dir = os.path.join("storage", client_id)
+        for zone in ("Raw", "Clean", "Dataset"):
+            zone_dir = os.path.join(base_dir, zone)
+            if not os.path.isdir(zone_dir):
+                continue
+            for entry in sorted(os.scandir(zone_dir), key=lambda e: e.name):
+                stat = entry.stat()
+                digest.update(f"{zone}/{entry.name}:{stat.st_mtime_ns}:{stat.st_size};".encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    def _publish_dataset(self, client_id, industry_type, clean_db_path, raw_file_path, summary=None):
+        """
+        Layout "dataset": fact table upload ini disalin ke dataset Parquet tenant (+ manifest).
+        Dipanggil di bawah lock DB upload. Mode incremental: cuma partisi upload baru
+        (+ upload lama yang barisnya tergeser merge, dari summary transform) yang ditulis ulang.
+        Gagal publish gak bikin upload gagal (DB upload tetap ada), tapi pesannya
+        dibalikin biar bisa dilaporkan ke client / job.
+        """
+        if self.storage_layout != "dataset":
+            return None
+        uploads = None
+        if self.ingest_mode == "incremental" and isinstance(summary, dict):
+            uploads = summary["uploads"]
+        directory = tenant_dataset.dataset_dir(client_id)
+        try:
+            with self.db_locks.hold(directory):
+                tenant_dataset.publish(
+                    clean_db_path, f"{industry_type}.fct_{industry_type}", directory, raw_file_path, uploads=uploads
                 )
+                self.result_cache.invalidate(directory)
+        except Exception as e:
+            logging.error(f"❌ Gagal publish ke dataset tenant {client_id}: {e}")
+            return f"Gagal publish ke dataset tenant: {e}"
+        return None
+
+    def _before_db_write(self, clean_db_path):
+        # Dipanggil di bawah db lock sebelum isi DB berubah: koneksi query (read-only)
+        # ke DB ini ditutup dulu, dan hasil laporan yang ke-cache gak berlaku lagi
+        self.read_pool.invalidate(clean_db_path)
+        self.result_cache.invalidate(clean_db_path)
+
+    def _cleanup_failed_db(self, clean_db_path):
+        # Kalau proses gagal di tengah jalan, file .duckdb biasanya rusak.
+        # Kita hapus biar gak menuh-menuhin storage dan gak bikin error kedepannya.
+        if self.ingest_mode == "incremental":
+            # DB histori berisi upload-upload sebelumnya, JANGAN dihapus.
+            # Transaksi merge yang gagal sudah di-rollback oleh transform_engine.
+            return
+        if clean_db_path and os.path.exists(clean_db_path):
+            try:
+                self.maintenance.discard(clean_db_path)
+                logging.warning(f"🧹 Membersihkan file corrupt/gagal: {clean_db_path}")
+                os.remove(clean_db_path) # Hapus file .duckdb
                 
-                logging.info(f"🔓 LOCK RELEASED: {client_id}")
-                # Kunci dilepas, user lain boleh masuk
-            
-            # STEP 5: WAL FILE CLEANUP (Pembersihan File Sampah)
-            # Hapus context SQLMesh dari memori
-            del temp_context
-            temp_context = None
-            gc.collect() # Panggil tukang sampah (Garbage Collector) RAM
-            time.sleep(0.5) # Istirahat bentar biar OS melepas file lock
-            
-            # Proses Checkpointing: Gabungkan file sementara (.wal) ke file utama (.duckdb)
-            logging.info("🧹 Merging WAL file (Checkpointing)...")
-            with duckdb.connect(clean_db_path) as con:
-                con.execute("CHECKPOINT;") # Simpan permanen
-                con.execute("VACUUM;")     # Padatkan ukuran file
+                # Hapus juga file .wal (Write Ahead Log) jika tertinggal
+                wal_path = clean_db_path + ".wal"
+                if os.path.exists(wal_path):
+                    os.remove(wal_path)
+            except Exception as cleanup_err:
+                logging.error(f"⚠️ Gagal cleanup file: {cleanup_err}")
+
+    def _run_ingest_job(self, job):
+        # Dipanggil scheduler (thread background) untuk job async
+        with self.maintenance.busy():
+            job.warning = self._run_transform(
+                job.client_id, job.industry_type, job.raw_file_path, job.clean_db_path,
+                fingerprint=job.fingerprint, upload=tenant_dataset.upload_name(job.filename),
+            )
+
+    def _negotiate_write_options(self, accepted_codecs):
+        # Pilih codec pertama (urutan prioritas server) yang juga didukung client.
+        # Client lama yang gak ngirim daftar codec tetap dapat stream tanpa kompresi.
+        for codec in self.ipc_compression:
+            if codec in (accepted_codecs or []):
+                return pa.ipc.IpcWriteOptions(compression=codec)
+        return None
+
+    def _filename_error(self, industry_type, target_file):
+        # Ubah nama file jadi huruf kecil semua biar gak masalah huruf besar/kecil
+        logging.info(f"🔍 Validasi Nama File: User='{industry_type}' vs File='{target_file}'")
+        # Cek: Apakah nama file mengandung kata jenis industri user?
+        if industry_type not in str(target_file or "").lower():
+            return (
+                f"❌ REJECTED! User tipe '{industry_type}' hanya boleh upload file "
+                f"yang mengandung kata '{industry_type}' di namanya."
+            )
+        return None
+
+    def _resolve_upload(self, client_id, user_data, target_file):
+        # STEP 1: AUTHENTICATION (sudah dicek _authorize, tinggal pastikan hasilnya)
+        if not user_data:
+            raise flight.FlightServerError("❌ AUTHENTICATION_FAILED")
+
+        # Ambil jenis industri user (corporate/education/hospital)
+        industry_type = user_data.get('industry_type', 'corporate').lower()
+        
+        # ================================================================
+        # [VALIDASI NAMA FILE] - Security Check
+        # ================================================================
+        error_msg = self._filename_error(industry_type, target_file)
+        if error_msg:
+            logging.error(error_msg)
+            # Kalau gak ada, TOLAK dan STOP proses disini.
+            raise flight.FlightServerError(error_msg)
             
+        logging.info("✅ Validasi Nama File: OK")
+        # ================================================================
+
+        # STEP 2: PATH CONSTRUCTION (Siapkan lokasi file)
+        # Bersihkan ekstensi file (.csv) dari nama
+        base_filename = os.path.splitext(target_file)[0]
+        # Bikin nama file database output yang unik
+        clean_db_name = f"{client_id}_{industry_type}_{base_filename}.duckdb"
+        if self.ingest_mode == "incremental":
+            # Semua delta satu industri masuk ke satu DB histori tenant
+            clean_db_name = f"{client_id}_{industry_type}_history.duckdb"
+        
+        # Tentukan path lengkap folder Raw (File Mentah)
+        # Raw Zone sekarang disimpan sebagai Parquet (bukan CSV lagi)
+        raw_file_path = os.path.abspath(
+            os.path.join("storage", client_id, "Raw", f"{base_filename}.parquet")
+        ).replace("\\", "/")
+        
+        # Tentukan path lengkap folder Clean (Hasil Olahan)
+        clean_db_path = os.path.abspath(
+            os.path.join("storage", client_id, "Clean", clean_db_name)
+        ).replace("\\", "/")
+
+        # Pastikan folder Raw ada, kalau belum ada, buat dulu
+        os.makedirs(os.path.dirname(raw_file_path), exist_ok=True)
+        return industry_type, raw_file_path, clean_db_path
+
+    def _duplicate_reply(self, client_id, industry_type, clean_db_path, fingerprint):
+        # DEDUPE: isi file & versi model sama persis dengan yang terakhir
+        # membangun DB ini? Gak usah transform ulang.
+        duplicate = self.upload_index.lookup(
+            client_id, clean_db_path, fingerprint, self.model_cache.model_version(industry_type)
+        )
+        if not duplicate:
+            return None
+        clean_db_name = os.path.basename(clean_db_path)
+        logging.info(f"♻️ Upload identik ({fingerprint[:12]}), transform dilewati: {clean_db_name}")
+        return {
+            "success": True,
+            "deduplicated": True,
+            "fingerprint": fingerprint,
+            "clean_file": clean_db_name,
+            "ingested_at": duplicate["ingested_at"],
+        }
+
+    def _ingest(self, client_id, industry_type, target_file, schema, batches,
+                raw_file_path, clean_db_path, received_at, fingerprint=None):
+        """
+        STEP 3-5 untuk satu upload. Balikin dict info buat client
+        (dedupe / job async / hasil sync).
+        `fingerprint` = sudah dihitung duluan (sumber yang bisa dibaca ulang):
+        dedupe dicek sebelum Raw Zone ditulis sama sekali.
+        """
+        clean_db_name = os.path.basename(clean_db_path)
+        # Nama upload (kolom `upload` di DB histori & partisi dataset) dari nama file asli
+        upload = tenant_dataset.upload_name(target_file)
+
+        if self.handoff_mode == "arrow":
+            # STEP 3+4 (ARROW HANDOFF): stream upload langsung masuk ke model staging
+            publish_error = self._run_arrow_handoff(
+                schema, batches, client_id, industry_type, raw_file_path, clean_db_path, upload=upload
+            )
+            # STEP 5: WAL FILE CLEANUP (mode arrow) -> background
+            self.maintenance.mark_dirty(clean_db_path)
             logging.info(f"✅ SUCCESS: {industry_type.upper()} Data Processed & Cleaned.")
+            return self._with_warning({"success": True, "clean_file": clean_db_name}, publish_error)
+
+        if fingerprint is not None:
+            duplicate_reply = self._duplicate_reply(client_id, industry_type, clean_db_path, fingerprint)
+            if duplicate_reply:
+                return duplicate_reply
+
+        # STEP 3: SAVE RAW PARQUET (Streaming per batch)
+        # Tulis batch demi batch langsung dari stream client ke Parquet.
+        # Gak ada read_all() / to_pandas() lagi, jadi RAM cuma kepake sebesar 1 batch.
+        part_path, total_rows, written_fingerprint = self._write_raw_parquet(schema, batches, raw_file_path)
+
+        if fingerprint is None:
+            # Stream sekali baca: fingerprint baru ada setelah .part selesai ditulis
+            fingerprint = written_fingerprint
+            duplicate_reply = self._duplicate_reply(client_id, industry_type, clean_db_path, fingerprint)
+            if duplicate_reply:
+                os.remove(part_path)  # Raw Zone lama isinya sudah identik, gak ditimpa
+                return duplicate_reply
+
+        if self.async_ingest:
+            # Data sudah aman di Raw Zone: bikin job, balikin job id, selesai.
+            # Transform (STEP 4 & 5) dijalankan scheduler di background.
+            job = ingest_jobs.IngestJob(
+                client_id, industry_type, target_file, raw_file_path, clean_db_path,
+                received_at=received_at,
+            )
+            # File Raw per job (<nama>.<job_id>.parquet): dua upload nama sama yang
+            # sama-sama masih antri gak saling timpa sebelum job pertama jalan
+            job.raw_file_path = f"{os.path.splitext(raw_file_path)[0]}.{job.job_id}.parquet"
+            os.replace(part_path, job.raw_file_path)
+            logging.info(f"💾 File Raw Tersimpan: {os.path.basename(job.raw_file_path)} ({total_rows:,} rows)")
+            job.rows = total_rows
+            job.fingerprint = fingerprint
+            try:
+                position = self.job_scheduler.submit(job)
+            except ingest_jobs.QueueFullError as queue_err:
+                os.remove(job.raw_file_path)
+                raise flight.FlightServerError(f"⏳ {queue_err}")
+            logging.info(f"📬 Job {job.job_id} queued (posisi {position}) untuk {client_id}")
+            return dict(job.to_dict(position), success=True)
+
+        os.replace(part_path, raw_file_path)
+        logging.info(f"💾 File Raw Tersimpan: {os.path.basename(raw_file_path)} ({total_rows:,} rows)")
+
+        publish_error = self._run_transform(
+            client_id, industry_type, raw_file_path, clean_db_path, fingerprint=fingerprint, upload=upload
+        )
+        return self._with_warning({"success": True, "clean_file": clean_db_name, "rows": total_rows}, publish_error)
+
+    @staticmethod
+    def _with_warning(reply, warning):
+        # Upload sukses tapi ada langkah sampingan yang gagal (mis. publish dataset)
+        if warning:
+            reply["warning"] = warning
+        return reply
+
+    # Fungsi utama untuk menangani UPLOAD data (Put)
+    def do_put(self, context, descriptor, reader, writer):
+        self.maintenance.begin_request()
+        
+        try:
+            # Baca metadata yang dikirim client (ID, Pass, Nama File)
+            metadata = json.loads(descriptor.path[0].decode('utf-8'))
+            client_id, user_data = self._authorize(context, metadata.get('client_id'), metadata.get('password'))
+            target_file = metadata.get('filename')
+            upload_id = metadata.get('upload_id')
+            # "arrow" = client sudah parsing CSV; "csv" = byte CSV mentah, server yang parsing
+            upload_format = metadata.get('format', 'arrow')
+            if upload_format not in csv_ingest.UPLOAD_FORMATS:
+                raise flight.FlightServerError(f"Format upload tidak dikenal: {upload_format}")
+            received_at = time.time()
+
+            # STEP 1 & 2: Auth, validasi nama file, dan path Raw/Clean
+            industry_type, raw_file_path, clean_db_path = self._resolve_upload(client_id, user_data, target_file)
+
+            if upload_id:
+                # UPLOAD RESUMABLE: batch (+ seq di app_metadata) cuma disimpan ke spool.
+                # Transform baru jalan pas client kirim action 'commit_upload'.
+                def seq_batches():
+                    for chunk in reader:
+                        if chunk.data is None:
+                            continue
+                        if chunk.app_metadata is None:
+                            raise flight.FlightServerError("Batch tanpa seq (app_metadata) ditolak")
+                        seq = json.loads(chunk.app_metadata.to_pybytes().decode('utf-8'))["seq"]
+                        yield seq, chunk.data
+
+                next_seq = self.upload_spool.receive(
+                    client_id, upload_id, target_file, seq_batches(), upload_format=upload_format
+                )
+                logging.info(f"📦 Upload {upload_id} ({client_id}): {next_seq} batch tersimpan")
+                writer.write(pa.py_buffer(json.dumps({
+                    "upload_id": upload_id, "next_seq": next_seq, "committed_seq": next_seq - 1,
+                }).encode('utf-8')))
+                return
+
+            schema = reader.schema
+            batches = (
+                chunk.data for chunk in reader
+                if chunk.data is not None and chunk.data.num_rows > 0
+            )
+            if upload_format == "csv":
+                # Parsing CSV di server (multithread, per blok), batch hasilnya langsung di-stream
+                schema, batches = csv_ingest.parse_csv_chunks(batches)
+            reply = self._ingest(
+                client_id, industry_type, target_file, schema, batches,
+                raw_file_path, clean_db_path, received_at,
+            )
+            if reply.get("deduplicated") or reply.get("job_id") or reply.get("warning"):
+                writer.write(pa.py_buffer(json.dumps(reply).encode('utf-8')))
 
         except Exception as e:
             # Kalau ada error apa saja...
+            # (file DB yang gagal dibangun sudah dibersihkan di _run_transform / _run_arrow_handoff)
             logging.error(f"❌ Error do_put: {e}")
-            
-            # [SAFETY FEATURE] HAPUS FILE CORRUPT
-            # Kalau proses gagal di tengah jalan, file .duckdb biasanya rusak.
-            # Kita hapus biar gak menuh-menuhin storage dan gak bikin error kedepannya.
-            if clean_db_path and os.path.exists(clean_db_path):
-                try:
-                    if temp_context: del temp_context
-                    gc.collect()
-                    logging.warning(f"🧹 Membersihkan file corrupt/gagal: {clean_db_path}")
-                    os.remove(clean_db_path) # Hapus file .duckdb
-                    
-                    # Hapus juga file .wal (Write Ahead Log) jika tertinggal
-                    wal_path = clean_db_path + ".wal"
-                    if os.path.exists(wal_path):
-                        os.remove(wal_path)
-                except Exception as cleanup_err:
-                    logging.error(f"⚠️ Gagal cleanup file: {cleanup_err}")
 
             # Lempar error ke client biar user tau kalau gagal
             raise flight.FlightServerError(str(e))
             
         finally:
-            # Pastikan memori selalu dibersihkan walau sukses atau gagal
-            if temp_context is not None:
-                del temp_context
-            gc.collect()
+            # Request selesai (sukses atau gagal): maintenance boleh jalan kalau server sepi
+            self.maintenance.end_request()
 
     # Fungsi utama untuk menangani DOWNLOAD/QUERY data (Get)
 
     def do_get(self, context, ticket):
+        self.maintenance.begin_request()
+        streaming = False
         try:
             # Parse perintah dari client (JSON)
             command = json.loads(ticket.ticket.decode('utf-8'))
-            client_id = command.get('client_id')
-            password = command.get('password')
             action = command.get('action')
             target_file = command.get('target_file')
             should_save = command.get('save_copy', True)
+            write_options = self._negotiate_write_options(command.get('accept_compression'))
 
-            # Validasi input dasar
+            # Auth Check (session token atau client_id + password)
+            client_id, user_data = self._authorize(context, command.get('client_id'), command.get('password'))
             if not client_id: raise flight.FlightServerError("Client ID Missing!")
-            if not os.path.exists(self.user_db_path): raise flight.FlightServerError("User DB Missing!")
-            
-            # Auth Check
-            with open(self.user_db_path, "r") as f:
-                users = json.load(f)
-            
-            user_data = users.get(client_id)
-            if not user_data or self._hash_password(password) != user_data.get('password'):
+            if not user_data:
                 raise flight.FlightServerError("❌ AUTHENTICATION_FAILED")
 
             industry_type = user_data.get('industry_type', 'corporate').lower()
@@ -270,38 +696,112 @@ class BusinessSolutionServer(flight.FlightServerBase):
 
             # Validasi: Harus pilih file sebelum query
             if not target_file: raise flight.FlightServerError("Pilih file dulu!")
-            db_path = os.path.join(clean_dir, target_file).replace("\\", "/")
-            con = None
+            # db_path = file DB upload, atau folder dataset tenant kalau target-nya "@dataset"
+            uploads = command.get('uploads') if target_file == tenant_dataset.DATASET_TARGET else None
+            db_path = self._reader_path(client_id, target_file)
+
+            # Query spec (projection/filter/order/paging) & partition cuma berlaku buat get_full_clean/export
+            spec = command.get('query') if action in ('get_full_clean', 'export_full') else None
+            partition = command.get('partition') if action == 'get_full_clean' else None
+            if partition is not None:
+                # Satu partisi dari get_flight_info: arsip per partisi gak ada gunanya
+                should_save = False
+
+            # Fitur Arsip: Simpan hasil query jadi Parquet (zstd) di folder Downloads.
+            # Ditulis archive writer di background, response gak nunggu disk.
+            save_path = None
+            if should_save:
+                file_base_name = target_file.replace(".duckdb", "").lstrip("@")
+                # Nama file beda tergantung jenis report
+                if action == 'get_full_clean' and spec:
+                    report_name = f"{file_base_name}_query_export.parquet"
+                elif action == 'get_full_clean':
+                    report_name = f"{file_base_name}_full_export.parquet"
+                elif action == 'get_kpis':
+                    report_name = f"{file_base_name}_kpis.parquet"
+                elif action == 'get_insights':
+                    report_name = f"{file_base_name}_insights.parquet"
+                else:
+                    report_name = f"{file_base_name}_summary.parquet"
+                save_path = os.path.join(download_dir, report_name)
+
+            # Aksi 5: Export Full (file Parquet/CSV dibikin server, dikirim per potongan byte)
+            if action == 'export_full':
+                schema, chunks = self._export_file(
+                    db_path, industry_type, target_file, uploads, spec, command.get('export_format', 'parquet')
+                )
+                streaming = True
+                return flight.GeneratorStream(schema, chunks, options=write_options)
+
+            # Aksi 6: Insights (KPI + top-N posisi + statistik) dalam satu response Arrow kecil
+            if action == 'get_insights':
+                top_n = self._insights_top_n(command.get('top_n'))
+                cache_key = self.result_cache.key(client_id, db_path, action, {'top_n': top_n, 'uploads': uploads})
+                insights = self.result_cache.get(cache_key) if self.result_cache.enabled else None
+                if insights is None:
+                    insights = self._build_insights(db_path, industry_type, uploads, top_n)
+                    self.result_cache.put(cache_key, insights)
+                else:
+                    logging.info(f"⚡ Cache hit: {action} {target_file} ({insights.num_rows} rows)")
+                if save_path:
+                    self.archiver.submit_table(insights, save_path)
+                return flight.RecordBatchStream(insights, options=write_options)
+
+            # Cache hit: Arrow Table langsung dikirim, DB gak disentuh sama sekali
+            cache_params = {'query': spec, 'partition': partition, 'uploads': uploads}
+            cache_key = self.result_cache.key(client_id, db_path, action, cache_params if any(cache_params.values()) else None)
+            cached_table = self.result_cache.get(cache_key) if self.result_cache.enabled else None
+            if cached_table is not None:
+                logging.info(f"⚡ Cache hit: {action} {target_file} ({cached_table.num_rows} rows)")
+                if save_path:
+                    self.archiver.submit_table(cached_table, save_path)
+                return flight.RecordBatchStream(cached_table, options=write_options)
+
+            con = release = None
             try:
-                # Pola Koneksi Adaptif
-                try:
-                    logging.info(f"🔌 Connecting to DB (RW): {target_file}")
-                    con = duckdb.connect(database=db_path, read_only=False)
-                except Exception as rw_err:
-                    logging.warning(f"⚠️ RW Fail, Retrying RO... ({rw_err})")
-                    con = duckdb.connect(database=db_path, read_only=True)
+                # Ambil cursor dari pool koneksi read-only (query gak pernah nulis ke DB)
+                logging.info(f"🔌 Connecting to DB (RO pool): {target_file}")
+                con, release = self._open_reader(db_path, industry_type, uploads)
                 
                 # Tentukan tabel target berdasarkan jenis industri user
                 target_table = f"{industry_type}.fct_{industry_type}"
-                money_col = "total_amount"
                 logging.info(f"🔍 Querying table: {target_table}")
 
                 # Aksi 2: Get Full Clean (Ambil semua data bersih TANPA AGGREGATION)
-                if action == 'get_full_clean':
+                query_params = None
+                if action == 'get_full_clean' and (spec or partition is not None):
+                    # Spec divalidasi ke skema fact table, lalu di-push ke query DuckDB
+                    columns = query_spec.table_columns(con, target_table)
+                    query, query_params = query_spec.build_query(
+                        target_table,
+                        columns,
+                        spec or {},
+                        default_order=["job_title"],
+                        tiebreak=self._fact_unique_key(industry_type, target_file, columns),
+                        partition=partition,
+                    )
+                    logging.info(f"📤 Query Mode: {target_file} - {json.dumps(spec)} partition={partition}")
+                elif action == 'get_full_clean':
                     query = f"SELECT * FROM {target_table} ORDER BY job_title"
                     logging.info(f"📤 Full Export Mode: {target_file} - Fetching all rows...")
                 # Aksi 3: Get Budget Report (Ambil ringkasan/agregasi)
                 elif action == 'get_budget_report':
-                    query = f"SELECT job_title, COUNT(*) as total_employee, SUM({money_col}) as total_budget FROM {target_table} GROUP BY 1 ORDER BY total_budget DESC"
+                    query = f"{self._budget_query(con, industry_type)} ORDER BY total_budget DESC"
+                # Aksi 4: Get KPIs (satu baris angka ringkasan tenant)
+                elif action == 'get_kpis':
+                    query = self._kpi_query(con, industry_type)
                 else:
                     raise flight.FlightServerError(f"Unknown action: {action}")
                 
-                # Jalankan query dan ubah hasil jadi Arrow Table
+                # Jalankan query, hasilnya dibaca per batch (belum ada data yang ditarik di sini)
                 logging.info(f"Executing query: {query}")
-                arrow_table = con.execute(query).fetch_arrow_table()
-                logging.info(f"✅ Query successful: {arrow_table.num_rows} rows returned")
+                batch_reader = con.execute(query, query_params).fetch_record_batch(self.stream_batch_rows)
                 
+            except query_spec.QuerySpecError as spec_err:
+                release()
+                raise flight.FlightServerError(f"❌ Query spec tidak valid: {spec_err}")
             except Exception as db_err:
+                if release: release()
                 error_str = str(db_err)
                 logging.error(f"Database error: {error_str}")
                 
@@ -310,29 +810,367 @@ class BusinessSolutionServer(flight.FlightServerBase):
                     raise flight.FlightServerError(f"❌ Gagal Query! Pastikan Tabel '{target_table}' ada.. Detail: {error_str}")
                 else:
                     raise flight.FlightServerError(f"❌ Database Error: {error_str}")
-            finally:
-                if con: con.close()
 
-            # Fitur Arsip: Simpan hasil query jadi CSV di folder Downloads
-            if should_save:
-                file_base_name = target_file.replace(".duckdb", "")
-                # Nama file beda tergantung jenis report
-                if action == 'get_full_clean':
-                    report_name = f"{file_base_name}_full_export.csv"
-                else:
-                    report_name = f"{file_base_name}_summary.csv"
-                df_save = arrow_table.to_pandas()
-                if not df_save.empty: 
-                    df_save.to_csv(os.path.join(download_dir, report_name), index=False)
-                    logging.info(f"💾 Export file saved: {report_name}")
-            
-            # Kirim data balik ke client
-            return flight.RecordBatchStream(arrow_table)
+            # Kirim data balik ke client, batch demi batch.
+            # Koneksi DB & status request dilepas stream-nya (selesai, putus, atau dibuang).
+            if write_options is not None:
+                logging.info(f"🗜️ Response dikompres: {write_options.compression}")
+            streaming = True
+            return flight.GeneratorStream(
+                batch_reader.schema,
+                self._stream_query(release, batch_reader, cache_key, save_path),
+                options=write_options,
+            )
 
         except Exception as e:
             logging.error(f"❌ Error Server: {e}")
             raise flight.FlightServerError(str(e))
-        
+        finally:
+            # Kalau stream sudah dibuat, end_request dipanggil stream-nya
+            if not streaming:
+                self.maintenance.end_request()
+
+    def _insights_top_n(self, top_n):
+        if top_n is None:
+            return INSIGHTS_TOP_N
+        if isinstance(top_n, bool) or not isinstance(top_n, int) or not 1 <= top_n <= INSIGHTS_MAX_TOP_N:
+            raise flight.FlightServerError(f"top_n harus angka 1..{INSIGHTS_MAX_TOP_N}")
+        return top_n
+
+    def _budget_query(self, con, industry_type):
+        # Ringkasan per job_title: dari layer agregat kalau ada, fallback agregasi fact table
+        agg_table = f"{industry_type}.agg_{industry_type}"
+        if self._has_table(con, agg_table):
+            # Layer agregat sudah dibangun waktu transform: tinggal lookup tabel kecil
+            return f"SELECT job_title, total_employee, total_budget FROM {agg_table}"
+        # DB lama (dibangun sebelum ada model agg): agregasi langsung dari fact table
+        return (
+            "SELECT job_title, COUNT(*) as total_employee, SUM(total_amount) as total_budget "
+            f"FROM {industry_type}.fct_{industry_type} GROUP BY 1"
+        )
+
+    def _kpi_query(self, con, industry_type):
+        # Satu baris KPI tenant: model kpi kalau ada, fallback hitung dari ringkasan per job_title
+        kpi_table = f"{industry_type}.kpi_{industry_type}"
+        if self._has_table(con, kpi_table):
+            return f"SELECT * FROM {kpi_table}"
+        return (
+            "SELECT SUM(total_budget) AS total_budget, CAST(SUM(total_employee) AS BIGINT) AS total_employee, "
+            "SUM(total_budget) / NULLIF(SUM(total_employee), 0) AS avg_amount, "
+            "COUNT(*) AS total_positions, MAX(total_budget) AS max_job_budget, "
+            "MIN(total_budget) AS min_job_budget, MEDIAN(total_budget) AS median_job_budget "
+            f"FROM ({self._budget_query(con, industry_type)})"
+        )
+
+    def _build_insights(self, db_path, industry_type, uploads, top_n):
+        """
+        Semua angka tab Financial Insights dihitung DuckDB dalam satu koneksi:
+        top-N posisi (baris tabel) + KPI/statistik (JSON di metadata skema "kpis").
+        Hasilnya cuma top_n baris, jadi dashboard gak perlu pandas buat render.
+        """
+        con, release = self._open_reader(db_path, industry_type, uploads)
+        try:
+            budget_query = self._budget_query(con, industry_type)
+            kpi_rows = con.execute(self._kpi_query(con, industry_type)).fetch_arrow_table().to_pylist()
+            top_table = con.execute(
+                "SELECT job_title, CAST(total_employee AS BIGINT) AS total_employee, "
+                f"CAST(total_budget AS DOUBLE) AS total_budget FROM ({budget_query}) "
+                "WHERE job_title IS NOT NULL AND total_budget IS NOT NULL "
+                "ORDER BY total_budget DESC, job_title LIMIT ?",
+                [top_n],
+            ).fetch_arrow_table()
+        except Exception as db_err:
+            error_str = str(db_err)
+            logging.error(f"Database error: {error_str}")
+            if "Catalog Error" in error_str or "Binder Error" in error_str or "not found" in error_str.lower():
+                raise flight.FlightServerError(f"❌ Gagal Query! Pastikan Tabel '{industry_type}.fct_{industry_type}' ada.. Detail: {error_str}")
+            raise flight.FlightServerError(f"❌ Database Error: {error_str}")
+        finally:
+            release()
+
+        # DECIMAL/HUGEINT dari DuckDB dijadiin angka JSON biasa
+        kpis = {
+            name: (value if value is None or isinstance(value, (int, float)) else float(value))
+            for name, value in (kpi_rows[0] if kpi_rows else {}).items()
+        }
+        logging.info(f"📊 Insights: top {top_table.num_rows} posisi, KPI {sorted(kpis)}")
+        return top_table.replace_schema_metadata({"kpis": json.dumps(kpis)})
+
+    def _export_file(self, db_path, industry_type, target_file, uploads, spec, export_format):
+        """
+        Tulis hasil query full (plus spec kalau ada) ke file sementara pakai DuckDB COPY,
+        lalu kirim isinya per potongan (skema satu kolom binary, sama kayak upload "csv").
+        Client tinggal nulis byte ke disk, gak ada Table/DataFrame/CSV di memory-nya.
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise flight.FlightServerError(f"Format export harus salah satu dari {EXPORT_FORMATS}")
+        target_table = f"{industry_type}.fct_{industry_type}"
+        fd, export_path = tempfile.mkstemp(prefix="payroll_export_", suffix=f".{export_format}")
+        os.close(fd)
+        copy_options = "FORMAT PARQUET, COMPRESSION ZSTD" if export_format == "parquet" else "FORMAT CSV, HEADER"
+
+        con, release = self._open_reader(db_path, industry_type, uploads)
+        try:
+            columns = query_spec.table_columns(con, target_table)
+            query, params = query_spec.build_query(
+                target_table,
+                columns,
+                spec or {},
+                default_order=["job_title"],
+                tiebreak=self._fact_unique_key(industry_type, target_file, columns),
+            )
+            quoted_path = export_path.replace("'", "''")
+            total_rows = con.execute(f"COPY ({query}) TO '{quoted_path}' ({copy_options})", params).fetchone()[0]
+            total_columns = len(con.execute(f"SELECT * FROM ({query}) LIMIT 0", params).description)
+        except query_spec.QuerySpecError as spec_err:
+            os.remove(export_path)
+            raise flight.FlightServerError(f"❌ Query spec tidak valid: {spec_err}")
+        except Exception:
+            os.remove(export_path)
+            raise
+        finally:
+            release()
+
+        file_size = os.path.getsize(export_path)
+        logging.info(f"📦 Export {export_format}: {target_file} ({total_rows:,} rows, {file_size:,} bytes)")
+        schema = csv_ingest.RAW_CHUNK_SCHEMA.with_metadata({
+            "format": export_format,
+            "rows": str(total_rows),
+            "columns": str(total_columns),
+            "bytes": str(file_size),
+        })
+        return schema, self._stream_file_chunks(export_path, schema)
+
+    def _stream_file_chunks(self, export_path, schema):
+        # File export dikirim per EXPORT_CHUNK_BYTES, lalu dihapus (sukses, stream putus,
+        # atau stream dibuang sebelum sempat dibaca)
+        def chunks():
+            with open(export_path, "rb") as f:
+                while True:
+                    chunk = f.read(EXPORT_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    yield pa.record_batch([pa.array([chunk], pa.binary())], schema=schema)
+
+        def release():
+            try:
+                os.remove(export_path)
+            finally:
+                self.maintenance.end_request()
+
+        return _ReleasingStream(chunks(), release)
+
+    def _reader_path(self, client_id, target_file):
+        # Path yang dibaca query: file DB satu upload, atau folder dataset tenant ("@dataset")
+        if target_file == tenant_dataset.DATASET_TARGET:
+            db_path = tenant_dataset.dataset_dir(client_id)
+            if not os.path.exists(os.path.join(db_path, tenant_dataset.MANIFEST_FILE)):
+                raise flight.FlightServerError("❌ Dataset tenant belum ada (layout storage 'dataset' belum aktif?)")
+            return db_path
+        db_path = os.path.join("storage", client_id, "Clean", target_file)
+        db_path = os.path.abspath(db_path).replace("\\", "/")
+        if not os.path.exists(db_path): raise flight.FlightServerError(f"❌ File {target_file} tidak ditemukan")
+        return db_path
+
+    def _open_reader(self, db_path, industry_type, uploads=None):
+        # Balikin (koneksi, fungsi release). DB upload -> cursor dari pool read-only,
+        # dataset tenant -> koneksi in-memory dengan view fact table di atas file Parquet
+        if os.path.isdir(db_path):
+            con = tenant_dataset.connect(db_path, industry_type, uploads)
+            return con, con.close
+        con = self.read_pool.acquire(db_path)
+        return con, lambda: self.read_pool.release(db_path, con)
+
+    def _fact_unique_key(self, industry_type, target_file=None, columns=()):
+        # Kunci baris fact table: tiebreak ORDER BY (paging offset/limit stabil) & kunci hash partisi.
+        # Model tanpa grain: semua kolom (`columns`), baris yang kembar persis isinya sama,
+        # jadi urutan halamannya tetap deterministik. Buat dataset "semua kolom" sudah termasuk
+        # kolom upload; kolom upload doang gak cukup (satu upload = satu partisi hash).
+        # Di dataset gabungan grain yang sama bisa muncul di beberapa upload: tambah kolom upload.
+        grain = self._fact_grain(industry_type)
+        if not grain:
+            return tuple(columns)
+        if target_file == tenant_dataset.DATASET_TARGET:
+            return grain + (tenant_dataset.PARTITION_COLUMN,)
+        return grain
+
+    def _fact_grain(self, industry_type):
+        # Grain model fact (dari cache model), () kalau model-nya gak punya grain
+        try:
+            compiled = self.model_cache.get(industry_type)
+        except Exception as e:
+            logging.warning(f"⚠️ Gagal ambil unique key fct_{industry_type}: {e}")
+            return ()
+        for model in compiled:
+            if model.unique_key:
+                return tuple(key.strip('"') for key in model.unique_key)
+        return ()
+
+    def _has_table(self, con, qualified_name):
+        # Cek tabel/view ada di DB (buat fallback DB lama yang belum punya layer agregat)
+        schema_name, table_name = qualified_name.split(".")
+        return con.execute(
+            "SELECT 1 FROM information_schema.tables WHERE table_schema = ? AND table_name = ?",
+            [schema_name, table_name],
+        ).fetchone() is not None
+
+    def _stream_query(self, release, batch_reader, cache_key=None, save_path=None):
+        # Iterator buat GeneratorStream. Lease koneksi & end_request dilepas _ReleasingStream,
+        # jadi tetap jalan walau stream dibuang sebelum batch pertama.
+        def end():
+            try:
+                release()
+            finally:
+                self.maintenance.end_request()
+
+        return _ReleasingStream(self._query_batches(batch_reader, cache_key, save_path), end)
+
+    def _query_batches(self, batch_reader, cache_key=None, save_path=None):
+        # Batch dari DuckDB langsung diteruskan ke client.
+        # Gak ada to_pandas / read_all, dan gak ada I/O arsip di jalur ini: batch cuma
+        # diantrikan ke archive writer (arsip = persis yang dikirim, dibuang kalau stream putus).
+        # Hasil yang cukup kecil dikumpulin buat result cache (berhenti kalau kegedean).
+        total_rows = 0
+        cache_batches = [] if cache_key is not None and self.result_cache.enabled else None
+        cache_bytes = 0
+        archive = self.archiver.open_stream(batch_reader.schema, save_path) if save_path else None
+        try:
+            for batch in batch_reader:
+                if cache_batches is not None:
+                    cache_bytes += batch.nbytes
+                    if cache_bytes > self.result_cache.max_entry_bytes:
+                        cache_batches = None  # Kegedean buat di-cache
+                    else:
+                        cache_batches.append(batch)
+                if archive is not None:
+                    archive.put(batch)
+                total_rows += batch.num_rows
+                yield batch
+            if archive is not None:
+                archive.close()
+                archive = None
+            if cache_batches is not None:
+                self.result_cache.put(cache_key, pa.Table.from_batches(cache_batches, schema=batch_reader.schema))
+            logging.info(f"✅ Query successful: {total_rows} rows streamed")
+        finally:
+            if archive is not None:
+                archive.abort()
+
+
+    # Discovery dataset (skema, jumlah baris, endpoint per partisi) sebelum do_get
+
+    def get_flight_info(self, context, descriptor):
+        self.maintenance.begin_request()
+        try:
+            # Descriptor CMD = JSON {target_file, query?, partitions?, client_id?, password?}
+            # Descriptor PATH = [target_file]
+            if descriptor.descriptor_type == flight.DescriptorType.CMD:
+                command = json.loads(descriptor.command.decode('utf-8'))
+            else:
+                command = {"target_file": descriptor.path[0].decode('utf-8')} if descriptor.path else {}
+
+            client_id, user_data = self._authorize(context, command.get('client_id'), command.get('password'))
+            if not client_id: raise flight.FlightServerError("Client ID Missing!")
+            if not user_data:
+                raise flight.FlightServerError("❌ AUTHENTICATION_FAILED")
+            if not command.get('target_file'): raise flight.FlightServerError("Pilih file dulu!")
+            return self._flight_info(context, client_id, user_data, command, descriptor)
+
+        except flight.FlightError:
+            raise
+        except Exception as e:
+            logging.error(f"❌ Error get_flight_info: {e}")
+            raise flight.FlightServerError(str(e))
+        finally:
+            self.maintenance.end_request()
+
+    def list_flights(self, context, criteria):
+        # Daftar dataset (file Clean .duckdb + "@dataset") milik tenant. Mode lama: kredensial
+        # dikirim sebagai JSON di criteria.
+        self.maintenance.begin_request()
+        try:
+            command = json.loads(criteria.decode('utf-8')) if criteria else {}
+            client_id, user_data = self._authorize(context, command.get('client_id'), command.get('password'))
+            if not client_id or not user_data:
+                raise flight.FlightServerError("❌ AUTHENTICATION_FAILED")
+
+            clean_dir = os.path.join("storage", client_id, "Clean")
+            files = sorted(f for f in os.listdir(clean_dir) if f.endswith('.duckdb')) if os.path.exists(clean_dir) else []
+            # Layout "dataset": dataset gabungan tenant ikut didaftar kalau sudah ada partisinya
+            if self.storage_layout == "dataset" and tenant_dataset.read_manifest(tenant_dataset.dataset_dir(client_id))["uploads"]:
+                files.append(tenant_dataset.DATASET_TARGET)
+            infos = []
+            for target_file in files:
+                dataset = {"target_file": target_file}
+                descriptor = flight.FlightDescriptor.for_command(json.dumps(dataset).encode('utf-8'))
+                try:
+                    infos.append(self._flight_info(context, client_id, user_data, dict(command, **dataset), descriptor))
+                except Exception as e:
+                    # Satu DB rusak / belum lengkap jangan bikin seluruh daftar gagal
+                    logging.warning(f"⚠️ list_flights: {target_file} dilewati ({e})")
+            return infos
+        finally:
+            self.maintenance.end_request()
+
+    def _flight_info(self, context, client_id, user_data, command, descriptor):
+        industry_type = user_data.get('industry_type', 'corporate').lower()
+        target_file = command['target_file']
+        uploads = command.get('uploads') if target_file == tenant_dataset.DATASET_TARGET else None
+        db_path = self._reader_path(client_id, target_file)
+
+        target_table = f"{industry_type}.fct_{industry_type}"
+        spec = command.get('query') or {}
+        con, release = self._open_reader(db_path, industry_type, uploads)
+        try:
+            columns = query_spec.table_columns(con, target_table)
+            if not columns:
+                raise flight.FlightServerError(f"❌ Tabel '{target_table}' tidak ada di {target_file}")
+            # Tanpa ORDER BY: cuma buat skema, hitung baris, dan perkiraan ukuran
+            query, params = query_spec.build_query(target_table, columns, spec)
+            schema = con.execute(f"SELECT * FROM ({query}) LIMIT 0", params).fetch_arrow_table().schema
+            total_rows = con.execute(f"SELECT COUNT(*) FROM ({query})", params).fetchone()[0]
+            sample = con.execute(f"SELECT * FROM ({query}) LIMIT {PARTITION_SAMPLE_ROWS}", params).fetch_arrow_table()
+        except query_spec.QuerySpecError as spec_err:
+            raise flight.FlightServerError(f"❌ Query spec tidak valid: {spec_err}")
+        finally:
+            release()
+        # Ukuran Arrow (tanpa kompresi) diperkirakan dari sampel baris
+        total_bytes = sample.nbytes * total_rows // sample.num_rows if sample.num_rows else 0
+
+        # Jumlah partisi: permintaan client, atau otomatis dari jumlah baris.
+        # limit/offset berlaku ke seluruh hasil, jadi cuma bisa satu endpoint.
+        requested = command.get('partitions')
+        if spec.get('limit') is not None or spec.get('offset'):
+            partitions = 1
+        elif requested:
+            partitions = max(1, min(int(requested), self.max_partitions))
+        else:
+            partitions = max(1, min(-(-total_rows // self.partition_rows), self.max_partitions))
+
+        # Tiket tiap endpoint = tiket get_full_clean biasa + [index, count].
+        # Pakai session token: tiket gak perlu bawa password.
+        base_ticket = {
+            "client_id": client_id,
+            "action": "get_full_clean",
+            "target_file": target_file,
+            "save_copy": False,
+        }
+        if context.get_middleware(auth.MIDDLEWARE_KEY) is None:
+            base_ticket["password"] = command.get('password')
+        if command.get('query'):
+            base_ticket["query"] = command['query']
+        if uploads:
+            base_ticket["uploads"] = uploads
+        if command.get('accept_compression'):
+            base_ticket["accept_compression"] = command['accept_compression']
+        endpoints = []
+        for index in range(partitions):
+            ticket = dict(base_ticket, partition=[index, partitions]) if partitions > 1 else base_ticket
+            endpoints.append(flight.FlightEndpoint(json.dumps(ticket).encode('utf-8'), []))
+
+        logging.info(f"🧭 FlightInfo {target_file}: {total_rows} rows, ~{total_bytes} bytes, {partitions} endpoint")
+        return flight.FlightInfo(schema, descriptor, endpoints, total_rows, total_bytes)
+
     # Fungsi Helper untuk aksi-aksi kecil (seperti list files di awal)
     def do_action(self, context, action):
         try:
@@ -340,25 +1178,186 @@ class BusinessSolutionServer(flight.FlightServerBase):
                 # Baca parameter dari client
                 body_bytes = action.body.to_pybytes()
                 info = json.loads(body_bytes.decode('utf-8'))
-                client_id = info.get('client_id')
-                password = info.get('password')
                 
-                # Cek kelengkapan login
-                if not client_id or not password:
-                    yield flight.Result(json.dumps({"error": "Kredensial tidak lengkap", "success": False}).encode('utf-8'))
-                    return
-                # Verifikasi login
-                if not self._verify_credentials(client_id, password):
-                    yield flight.Result(json.dumps({"error": "Invalid credentials", "success": False}).encode('utf-8'))
+                # Verifikasi login (token atau password)
+                client_id, _, auth_error = self._action_auth(context, info)
+                if auth_error:
+                    yield flight.Result(json.dumps({"error": auth_error, "success": False}).encode('utf-8'))
                     return
                 
                 # Cek folder Storage user (Raw dan Clean)
                 base_dir = os.path.join("storage", client_id)
                 raw_files = os.listdir(os.path.join(base_dir, "Raw")) if os.path.exists(os.path.join(base_dir, "Raw")) else []
                 clean_files = os.listdir(os.path.join(base_dir, "Clean")) if os.path.exists(os.path.join(base_dir, "Clean")) else []
+                response = {"success": True, "raw": raw_files, "clean": clean_files}
+
+                # Layout dataset: target gabungan + manifest (apa saja isi tiap upload)
+                manifest = tenant_dataset.read_manifest(tenant_dataset.dataset_dir(client_id))
+                if manifest["uploads"]:
+                    response["dataset"] = dict(manifest, target_file=tenant_dataset.DATASET_TARGET)
                 
                 # Kirim daftar file ke client
-                yield flight.Result(json.dumps({"success": True, "raw": raw_files, "clean": clean_files}).encode('utf-8'))
+                yield flight.Result(json.dumps(response).encode('utf-8'))
+            elif action.type == "storage_etag":
+                # Versi isi storage tenant: client cukup bandingin ini buat tau cache-nya masih valid
+                info = json.loads(action.body.to_pybytes().decode('utf-8'))
+                
+                client_id, _, auth_error = self._action_auth(context, info)
+                if auth_error:
+                    yield flight.Result(json.dumps({"error": auth_error, "success": False}).encode('utf-8'))
+                    return
+                yield flight.Result(json.dumps({"success": True, "etag": self._storage_etag(client_id)}).encode('utf-8'))
+            elif action.type == "get_capabilities":
+                # Info publik (tanpa login): codec kompresi IPC, format upload, session token
+                yield flight.Result(json.dumps({
+                    "success": True,
+                    "compression": self.ipc_compression,
+                    "upload_formats": list(csv_ingest.UPLOAD_FORMATS),
+                    "session_auth": True,
+                    "query_spec": True,
+                    "partitioned_reads": True,
+                    "storage_layout": self.storage_layout,
+                    "storage_etag": True,
+                    "export_formats": list(EXPORT_FORMATS),
+                    "insights": True,
+                    "validate_upload": True,
+                }).encode('utf-8'))
+            elif action.type == "login":
+                # Login sekali (hash password di sini saja), balikin session token
+                info = json.loads(action.body.to_pybytes().decode('utf-8'))
+                client_id = info.get('client_id')
+                password = info.get('password')
+                if not client_id or not password:
+                    yield flight.Result(json.dumps({"error": "Kredensial tidak lengkap", "success": False}).encode('utf-8'))
+                    return
+                user_data = self.credentials.verify(client_id, password)
+                if user_data is None or not self._tenant_ready(client_id):
+                    yield flight.Result(json.dumps({"error": "Invalid credentials", "success": False}).encode('utf-8'))
+                    return
+                token = self.sessions.issue(client_id, user_data)
+                logging.info(f"✅ Login Berhasil: {client_id} (session {self.sessions.ttl_seconds}s)")
+                yield flight.Result(json.dumps({
+                    "success": True,
+                    "client_id": client_id,
+                    "industry_type": user_data.get('industry_type', 'corporate').lower(),
+                    "token": token,
+                    "expires_in": self.sessions.ttl_seconds,
+                }).encode('utf-8'))
+            elif action.type == "logout":
+                # Cabut session token yang dipakai request ini
+                session = context.get_middleware(auth.MIDDLEWARE_KEY)
+                if session is not None:
+                    self.sessions.revoke(session.token)
+                yield flight.Result(json.dumps({"success": True}).encode('utf-8'))
+            elif action.type in ("upload_status", "commit_upload"):
+                # Upload resumable: cek batch yang sudah masuk / finalisasi upload
+                info = json.loads(action.body.to_pybytes().decode('utf-8'))
+                upload_id = info.get('upload_id')
+                
+                client_id, user_data, auth_error = self._action_auth(context, info)
+                if auth_error:
+                    yield flight.Result(json.dumps({"error": auth_error, "success": False}).encode('utf-8'))
+                    return
+                
+                if action.type == "upload_status":
+                    status = self.upload_spool.status(client_id, upload_id)
+                    yield flight.Result(json.dumps(dict(status, success=True)).encode('utf-8'))
+                    return
+                
+                # commit_upload: rakit batch dari spool, lalu jalan pipeline biasa (STEP 1-5)
+                self.maintenance.begin_request()
+                try:
+                    session_dir = self.upload_spool.session_dir(client_id, upload_id)
+                    def open_upload():
+                        session, schema, batches = self.upload_spool.load(
+                            client_id, upload_id, info.get('total_batches')
+                        )
+                        if session.get("format") == "csv":
+                            schema, batches = csv_ingest.parse_csv_chunks(batches)
+                        return session, schema, batches
+
+                    with self.upload_spool.locks.hold(session_dir):
+                        session, schema, batches = open_upload()
+                        target_file = session["filename"]
+                        industry_type, raw_file_path, clean_db_path = self._resolve_upload(
+                            client_id, user_data, target_file
+                        )
+                        logging.info(f"📦 Commit upload {upload_id} ({client_id}): {target_file}")
+                        fingerprint = None
+                        if self.handoff_mode == "file":
+                            # Spool bisa dibaca ulang: fingerprint dulu, upload identik gak nulis Raw Zone
+                            fingerprint = dedupe.fingerprint_batches(schema, batches)
+                            _, schema, batches = open_upload()
+                        reply = self._ingest(
+                            client_id, industry_type, target_file, schema, batches,
+                            raw_file_path, clean_db_path, time.time(), fingerprint=fingerprint,
+                        )
+                    self.upload_spool.discard(client_id, upload_id)
+                finally:
+                    self.maintenance.end_request()
+                yield flight.Result(json.dumps(reply).encode('utf-8'))
+            elif action.type in ("job_status", "list_jobs"):
+                # Status job ingestion async (cuma job milik tenant itu sendiri)
+                info = json.loads(action.body.to_pybytes().decode('utf-8'))
+                
+                client_id, _, auth_error = self._action_auth(context, info)
+                if auth_error:
+                    yield flight.Result(json.dumps({"error": auth_error, "success": False}).encode('utf-8'))
+                    return
+                if self.job_scheduler is None:
+                    yield flight.Result(json.dumps({"error": "Async ingestion tidak aktif di server ini", "success": False}).encode('utf-8'))
+                    return
+                
+                if action.type == "job_status":
+                    job = self.job_scheduler.get(info.get('job_id'))
+                    if job is None or job["client_id"] != client_id:
+                        yield flight.Result(json.dumps({"error": "Job tidak ditemukan", "success": False}).encode('utf-8'))
+                        return
+                    yield flight.Result(json.dumps({"success": True, "job": job}).encode('utf-8'))
+                else:
+                    yield flight.Result(json.dumps({
+                        "success": True,
+                        "jobs": self.job_scheduler.list_jobs(client_id),
+                        "scheduler": self.job_scheduler.stats(),
+                    }).encode('utf-8'))
+            elif action.type == "validate_upload":
+                # Cek header + sampel baris sebelum upload penuh (nama file, kolom, CAST model staging)
+                info = json.loads(action.body.to_pybytes().decode('utf-8'))
+                
+                client_id, user_data, auth_error = self._action_auth(context, info)
+                if auth_error:
+                    yield flight.Result(json.dumps({"error": auth_error, "success": False}).encode('utf-8'))
+                    return
+                industry_type = user_data.get('industry_type', 'corporate').lower()
+                
+                filename_error = self._filename_error(industry_type, info.get('target_file'))
+                if filename_error:
+                    report = {"valid": False, "errors": [filename_error]}
+                else:
+                    try:
+                        report = upload_validation.validate_sample(
+                            self.model_cache.get(industry_type), str(info.get('sample') or "").encode('utf-8')
+                        )
+                    except ValueError as sample_err:
+                        yield flight.Result(json.dumps({"error": str(sample_err), "success": False}).encode('utf-8'))
+                        return
+                logging.info(f"🧪 Validasi upload {client_id}/{info.get('target_file')}: {'OK' if report['valid'] else report['errors']}")
+                yield flight.Result(json.dumps(dict(report, success=True, industry_type=industry_type)).encode('utf-8'))
+            elif action.type == "server_stats":
+                # Statistik cache laporan, pool koneksi & maintenance (buat monitoring)
+                info = json.loads(action.body.to_pybytes().decode('utf-8'))
+                
+                client_id, _, auth_error = self._action_auth(context, info)
+                if auth_error:
+                    yield flight.Result(json.dumps({"error": auth_error, "success": False}).encode('utf-8'))
+                    return
+                yield flight.Result(json.dumps({
+                    "success": True,
+                    "result_cache": self.result_cache.summary(),
+                    "read_pool": dict(self.read_pool.stats, open=self.read_pool.open_connections()),
+                    "maintenance": dict(self.maintenance.stats, pending=self.maintenance.pending()),
+                    "archive": self.archiver.summary(),
+                }).encode('utf-8'))
             else:
                 raise flight.FlightServerError("Action not implemented!")
         except Exception as e:
@@ -367,11 +1366,46 @@ class BusinessSolutionServer(flight.FlightServerBase):
 
 def main():
     # Setup Server di Port 9999 (Listen ke semua IP)
-    server = BusinessSolutionServer("grpc://0.0.0.0:9999")
+    server = BusinessSolutionServer(
+        "grpc://0.0.0.0:9999",
+        handoff_mode=os.environ.get("PAYROLL_HANDOFF_MODE", "file"),
+        transform_mode=os.environ.get("PAYROLL_TRANSFORM_MODE", "plan"),
+        transform_workers=int(os.environ.get("PAYROLL_TRANSFORM_WORKERS", "0")) or None,
+        async_ingest=os.environ.get("PAYROLL_ASYNC_INGEST", "0") == "1",
+        max_queued_jobs=int(os.environ.get("PAYROLL_JOB_QUEUE_SIZE", "32")),
+        ingest_mode=os.environ.get("PAYROLL_INGEST_MODE", "replace"),
+        # "per_upload" (default) atau "dataset": tiap upload juga dipublish ke dataset Parquet tenant
+        storage_layout=os.environ.get("PAYROLL_STORAGE_LAYOUT", "per_upload"),
+        # Contoh: "zstd,lz4" (default), "lz4", atau "none" buat matiin kompresi
+        ipc_compression=os.environ.get("PAYROLL_IPC_COMPRESSION", ",".join(IPC_COMPRESSION_CODECS)).split(","),
+        # Umur session token (detik) sebelum client harus login ulang
+        session_ttl=int(os.environ.get("PAYROLL_SESSION_TTL", "900")),
+        stream_batch_rows=int(os.environ.get("PAYROLL_STREAM_BATCH_ROWS", str(STREAM_BATCH_ROWS))),
+        # Pool koneksi query: jumlah DB yang boleh terbuka & batas nganggur (detik)
+        pool_max_open=int(os.environ.get("PAYROLL_POOL_MAX_OPEN", "32")),
+        pool_idle_seconds=float(os.environ.get("PAYROLL_POOL_IDLE_SECONDS", "300")),
+        # Batas memory result cache laporan (MB), 0 = cache mati
+        result_cache_bytes=int(float(os.environ.get("PAYROLL_RESULT_CACHE_MB", "256")) * (1 << 20)),
+        # get_flight_info: baris per endpoint & batas jumlah endpoint (default: jumlah core)
+        partition_rows=int(os.environ.get("PAYROLL_PARTITION_ROWS", str(PARTITION_ROWS))),
+        max_partitions=int(os.environ.get("PAYROLL_MAX_PARTITIONS", "0")) or None,
+        # Jumlah job arsip save_copy yang boleh antri (lebih dari itu dilewati)
+        archive_queue_size=int(os.environ.get("PAYROLL_ARCHIVE_QUEUE", "16")),
+    )
     logging.info("🚀 Business Server Ready (Filename Check Mode)")
-    logging.info("🔐 Password Hashing: ENABLED (SHA-256)")
+    logging.info("🔐 Password Hashing: ENABLED (SHA-256) | Session Token: ENABLED")
     # Jalankan server (looping forever)
-    server.serve()
+    try:
+        server.serve()
+    finally:
+        if server.job_scheduler is not None:
+            server.job_scheduler.shutdown()
+        server.transform_pool.shutdown(cancel_futures=True)
+        # Arsip yang masih antri diselesaikan dulu (butuh pool koneksi yang masih hidup)
+        server.archiver.shutdown(flush=True)
+        server.read_pool.close_all()
+        # Sisa DB yang belum di-checkpoint dikerjakan sebelum server mati
+        server.maintenance.shutdown(flush=True)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
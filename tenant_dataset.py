@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+import re
+import time
+
+import duckdb
+import pyarrow.parquet as pq
+
+# Layout storage opsional "dataset": selain DB per upload, fact table tiap upload
+# dipublish ke satu dataset Parquet per tenant, dipartisi per upload (hive):
+#
+#   storage/<tenant>/Dataset/upload=<nama_upload>/data.parquet
+#   storage/<tenant>/Dataset/manifest.json   <- apa saja yang disumbang tiap upload
+#
+# Query gabungan (target_file "@dataset") cukup baca dataset ini tanpa buka DB satu-satu.
+# Pilih upload tertentu = cuma file partisi itu yang dibaca (pruning dari manifest).
+
+DATASET_TARGET = "@dataset"
+PARTITION_COLUMN = "upload"
+MANIFEST_FILE = "manifest.json"
+STORAGE_LAYOUTS = ("per_upload", "dataset")
+
+
+def dataset_dir(client_id):
+    return os.path.abspath(os.path.join("storage", client_id, "Dataset")).replace("\\", "/")
+
+
+def upload_name(path):
+    # Nama partisi dari nama file (DB upload / file asli) tanpa ekstensi;
+    # karakter aneh diganti biar aman jadi path hive
+    base = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", base)
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), "r") as f:
+            manifest = json.load(f)
+        if not isinstance(manifest, dict) or not isinstance(manifest.get("uploads"), dict):
+            raise ValueError("field 'uploads' tidak ada")
+        return manifest
+    except FileNotFoundError:
+        return {"uploads": {}}
+    except ValueError as e:
+        # Manifest kepotong / rusak: isinya diabaikan, disusun ulang dari partisi yang ada
+        # di disk (publish berikutnya nulis manifest baru), biar list_files tenant gak ikut rusak
+        logging.warning(f"⚠️ Manifest dataset {directory} rusak, disusun ulang dari partisi: {e}")
+        return _scan_partitions(directory)
+
+
+def _scan_partitions(directory):
+    uploads = {}
+    prefix = f"{PARTITION_COLUMN}="
+    for entry in sorted(os.listdir(directory)):
+        data_path = os.path.join(directory, entry, "data.parquet")
+        if not entry.startswith(prefix) or not os.path.exists(data_path):
+            continue
+        try:
+            metadata = pq.read_metadata(data_path)
+        except (OSError, ValueError) as e:
+            logging.warning(f"⚠️ Partisi {entry} gak kebaca, dilewati: {e}")
+            continue
+        uploads[entry[len(prefix):]] = {
+            "target_file": None,
+            "source_file": None,
+            "rows": metadata.num_rows,
+            "bytes": os.path.getsize(data_path),
+            "columns": metadata.schema.to_arrow_schema().names,
+            "published_at": None,
+        }
+    return {"uploads": uploads}
+
+
+def _write_manifest(directory, manifest):
+    # Tulis ke file sementara dulu, baru di-rename (pembaca gak pernah lihat setengah jadi)
+    path = os.path.join(directory, MANIFEST_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _remove_partition(directory, name):
+    partition_dir = os.path.join(directory, f"{PARTITION_COLUMN}={name}")
+    for leftover in ("data.parquet", "data.parquet.part"):
+        try:
+            os.remove(os.path.join(partition_dir, leftover))
+        except FileNotFoundError:
+            pass
+    try:
+        os.rmdir(partition_dir)
+    except OSError:
+        pass
+
+
+def publish(clean_db_path, fact_table, directory, source_file=None, uploads=None):
+    """
+    Salin fact table ke partisi dataset (ditimpa kalau upload ulang), lalu catat di manifest.
+    Dipanggil di bawah lock DB upload + lock dataset.
+    - uploads None: DB per upload, seluruh fact table = satu partisi (nama DB-nya).
+    - uploads [baru, ...]: DB histori (mode incremental), cuma baris dengan kolom
+      `upload` itu yang disalin, satu partisi per nama. Elemen pertama = upload baru
+      (pemilik source_file), sisanya upload lama yang barisnya ikut tergeser merge.
+      Partisi yang jadi kosong dihapus dari dataset.
+    Balikin daftar partisi yang ditulis.
+    """
+    if uploads is None:
+        targets = [(upload_name(clean_db_path), f"SELECT * FROM {fact_table}")]
+    else:
+        # Kolom `upload` dibuang dari file: nilainya sudah ada di path hive (upload=<nama>)
+        targets = []
+        for name in uploads:
+            quoted_name = name.replace("'", "''")
+            targets.append((name, f"SELECT * EXCLUDE ({PARTITION_COLUMN}) FROM {fact_table} "
+                                  f"WHERE {PARTITION_COLUMN} = '{quoted_name}'"))
+
+    written = {}
+    con = duckdb.connect(database=clean_db_path, read_only=True)
+    try:
+        for name, query in targets:
+            rows = con.execute(f"SELECT COUNT(*) FROM ({query})").fetchone()[0]
+            if rows == 0 and uploads is not None:
+                written[name] = None
+                continue
+            partition_dir = os.path.join(directory, f"{PARTITION_COLUMN}={name}")
+            os.makedirs(partition_dir, exist_ok=True)
+            part_path = os.path.join(partition_dir, "data.parquet.part")
+            quoted_path = part_path.replace("'", "''")
+            con.execute(f"COPY ({query}) TO '{quoted_path}' (FORMAT PARQUET, COMPRESSION ZSTD)")
+            columns = [row[0] for row in con.execute(f"DESCRIBE ({query})").fetchall()]
+            os.replace(part_path, os.path.join(partition_dir, "data.parquet"))
+            written[name] = (rows, columns)
+    finally:
+        con.close()
+
+    manifest = read_manifest(directory)
+    published_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+    for index, (name, result) in enumerate(written.items()):
+        if result is None:
+            _remove_partition(directory, name)
+            manifest["uploads"].pop(name, None)
+            logging.info(f"🗂️ Partisi {PARTITION_COLUMN}={name} kosong setelah merge, dihapus dari dataset")
+            continue
+        rows, columns = result
+        previous = manifest["uploads"].get(name, {})
+        is_new = uploads is None or index == 0
+        manifest["uploads"][name] = {
+            "target_file": os.path.basename(clean_db_path),
+            "source_file": (os.path.basename(source_file) if source_file else None) if is_new
+                           else previous.get("source_file"),
+            "rows": rows,
+            "bytes": os.path.getsize(os.path.join(directory, f"{PARTITION_COLUMN}={name}", "data.parquet")),
+            "columns": columns,
+            "published_at": published_at,
+        }
+        logging.info(f"🗂️ Dataset tenant diperbarui: {PARTITION_COLUMN}={name} ({rows:,} rows)")
+    manifest["updated_at"] = published_at
+    _write_manifest(directory, manifest)
+    return [name for name, result in written.items() if result is not None]
+
+
+def connect(directory, industry_type, uploads=None):
+    """
+    Koneksi DuckDB in-memory dengan view `<industry>.fct_<industry>` di atas dataset,
+    jadi query do_get yang biasa jalan apa adanya. `uploads` = daftar partisi yang
+    mau dibaca (None = semua); cuma file partisi itu yang dibuka.
+    """
+    available = read_manifest(directory)["uploads"]
+    if uploads is None:
+        selected = sorted(available)
+    else:
+        unknown = [name for name in uploads if name not in available]
+        if unknown:
+            raise ValueError(f"Upload tidak ada di dataset: {unknown}")
+        selected = sorted(set(uploads))
+    if not selected:
+        raise FileNotFoundError("Dataset tenant masih kosong")
+
+    files = [os.path.join(directory, f"{PARTITION_COLUMN}={name}", "data.parquet") for name in selected]
+    file_list = ", ".join("'" + path.replace("'", "''") + "'" for path in files)
+    con = duckdb.connect()
+    try:
+        con.execute(f"CREATE SCHEMA {industry_type}")
+        con.execute(
+            f"CREATE VIEW {industry_type}.fct_{industry_type} AS SELECT * FROM "
+            f"read_parquet([{file_list}], hive_partitioning = true, union_by_name = true)"
+        )
+    except Exception:
+        con.close()
+        raise
+    return con
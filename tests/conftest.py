@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Modul server ada di root repo, client dashboard di web_dashboard/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "web_dashboard")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
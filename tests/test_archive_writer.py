@@ -0,0 +1,95 @@
+import os
+
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from archive_writer import ArchiveWriter
+from result_cache import ResultCache
+from serve_flight import BusinessSolutionServer
+
+
+@pytest.fixture
+def archiver():
+    writer = ArchiveWriter(max_pending=4, max_pending_bytes=1 << 20)
+    yield writer
+    writer.shutdown()
+
+
+def batch(rows, start=0):
+    return pa.record_batch([pa.array(range(start, start + rows), pa.int64())], names=["n"])
+
+
+def test_stream_archive_matches_streamed_batches(archiver, tmp_path):
+    path = str(tmp_path / "report.parquet")
+    stream = archiver.open_stream(batch(0).schema, path)
+    for i in range(3):
+        stream.put(batch(100, start=i * 100))
+    stream.close()
+    archiver.shutdown()
+    assert pq.read_table(path).column("n").to_pylist() == list(range(300))
+    assert archiver.summary()["written"] == 1
+
+
+def test_empty_stream_still_writes_schema(archiver, tmp_path):
+    path = str(tmp_path / "empty.parquet")
+    archiver.open_stream(batch(0).schema, path).close()
+    archiver.shutdown()
+    table = pq.read_table(path)
+    assert table.num_rows == 0
+    assert table.column_names == ["n"]
+
+
+def test_aborted_stream_leaves_no_file(archiver, tmp_path):
+    path = str(tmp_path / "cut.parquet")
+    stream = archiver.open_stream(batch(0).schema, path)
+    stream.put(batch(100))
+    stream.abort()
+    archiver.shutdown()
+    assert os.listdir(tmp_path) == []
+    assert archiver.summary()["written"] == 0
+
+
+def test_stream_over_byte_budget_is_dropped_not_partial(tmp_path):
+    archiver = ArchiveWriter(max_pending_bytes=1000)
+    path = str(tmp_path / "big.parquet")
+    stream = archiver.open_stream(batch(0).schema, path)
+    stream.put(batch(100))  # 800 byte
+    stream.put(batch(100))  # Lewat budget: arsip ini dibatalkan
+    stream.close()
+    archiver.shutdown()
+    assert os.listdir(tmp_path) == []
+    summary = archiver.summary()
+    assert (summary["dropped"], summary["pending"], summary["pending_bytes"]) == (1, 0, 0)
+
+
+def test_job_limit_drops_new_archives():
+    archiver = ArchiveWriter(max_pending=1)
+    first = archiver.open_stream(batch(0).schema, "unused.parquet")
+    assert archiver.open_stream(batch(0).schema, "other.parquet") is None
+    assert not archiver.submit_table(pa.table({"n": [1]}), "table.parquet")
+    first.abort()
+    archiver.shutdown()
+    assert archiver.summary()["dropped"] == 2
+
+
+def test_table_archive(archiver, tmp_path):
+    path = str(tmp_path / "cached.parquet")
+    assert archiver.submit_table(pa.table({"n": [1, 2]}), path)
+    archiver.shutdown()
+    assert pq.read_table(path).num_rows == 2
+
+
+def test_do_get_stream_archives_exactly_what_was_sent(archiver, tmp_path):
+    server = BusinessSolutionServer.__new__(BusinessSolutionServer)
+    server.result_cache = ResultCache(max_bytes=0)
+    server.archiver = archiver
+    server.maintenance = type("Maintenance", (), {"end_request": lambda self: None})()
+
+    con = duckdb.connect()
+    reader = con.execute("SELECT range AS n FROM range(2500)").fetch_record_batch(1000)
+    path = str(tmp_path / "full_export.parquet")
+    sent = pa.Table.from_batches(list(server._stream_query(lambda: None, reader, save_path=path)))
+    archiver.shutdown()
+    assert pq.read_table(path).equals(sent)
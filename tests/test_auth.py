@@ -0,0 +1,107 @@
+import json
+
+import pyarrow.flight as flight
+import pytest
+
+import auth
+from auth import AuthMiddlewareFactory, CredentialRegistry, SessionStore, hash_password
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(auth.time, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def users_file(tmp_path):
+    path = tmp_path / "users.json"
+    path.write_text(json.dumps({"tenant": {"password": hash_password("rahasia"), "industry_type": "corporate"}}))
+    return path
+
+
+@pytest.fixture
+def registry(users_file):
+    return CredentialRegistry(str(users_file), check_interval=0)
+
+
+def login(registry, sessions):
+    return sessions.issue("tenant", registry.verify("tenant", "rahasia"))
+
+
+def test_token_valid_until_ttl(registry, clock):
+    sessions = SessionStore(registry, ttl_seconds=60)
+    token = login(registry, sessions)
+
+    clock.now += 59
+    client_id, user_data = sessions.resolve(token)
+    assert client_id == "tenant"
+    assert user_data["industry_type"] == "corporate"
+
+    clock.now += 1
+    assert sessions.resolve(token) is None
+    # Token kadaluarsa sekalian dibuang dari store
+    assert sessions.active() == 0
+
+
+def test_issue_purges_expired_sessions(registry, clock):
+    sessions = SessionStore(registry, ttl_seconds=10)
+    login(registry, sessions)
+    login(registry, sessions)
+    clock.now += 11
+    fresh = login(registry, sessions)
+    assert sessions.active() == 1
+    assert sessions.resolve(fresh)[0] == "tenant"
+
+
+def test_password_change_revokes_token(registry, users_file, clock):
+    sessions = SessionStore(registry, ttl_seconds=60)
+    token = login(registry, sessions)
+    users_file.write_text(json.dumps({"tenant": {"password": hash_password("baru"), "industry_type": "corporate", "note": "ganti password"}}))
+    assert sessions.resolve(token) is None
+
+
+def test_removed_user_revokes_token(registry, users_file, clock):
+    sessions = SessionStore(registry, ttl_seconds=60)
+    token = login(registry, sessions)
+    users_file.write_text("{}")
+    assert sessions.resolve(token) is None
+
+
+def test_unknown_and_revoked_tokens(registry, clock):
+    sessions = SessionStore(registry, ttl_seconds=60)
+    assert sessions.resolve("tidak-ada") is None
+    token = login(registry, sessions)
+    sessions.revoke(token)
+    assert sessions.resolve(token) is None
+
+
+def test_verify_rejects_wrong_password(registry):
+    assert registry.verify("tenant", "salah") is None
+    assert registry.verify("orang_lain", "rahasia") is None
+
+
+def test_middleware_rejects_expired_token(registry, clock):
+    sessions = SessionStore(registry, ttl_seconds=60)
+    factory = AuthMiddlewareFactory(sessions)
+    token = login(registry, sessions)
+
+    middleware = factory.start_call(None, {auth.AUTH_HEADER: [auth.TOKEN_PREFIX + token]})
+    assert middleware.client_id == "tenant"
+    # Tanpa header = mode lama, handler yang cek password
+    assert factory.start_call(None, {}) is None
+
+    clock.now += 61
+    with pytest.raises(flight.FlightUnauthenticatedError):
+        factory.start_call(None, {auth.AUTH_HEADER: [auth.TOKEN_PREFIX + token]})
+    with pytest.raises(flight.FlightUnauthenticatedError):
+        factory.start_call(None, {auth.AUTH_HEADER: ["Basic abc"]})
@@ -0,0 +1,51 @@
+import json
+
+import pyarrow.flight as flight
+
+from backend_client import PayrollClient, ResponseCache
+
+
+class Result:
+    def __init__(self, data):
+        self.body = flight.Result(json.dumps(data).encode("utf-8")).body
+
+
+class FakeServer:
+    # Server minimal: capabilities, storage_etag, list_files, login (password bisa diganti)
+    def __init__(self, session_auth):
+        self.session_auth = session_auth
+        self.password = "lama"
+        self.calls = []
+
+    def do_action(self, action, options=None):
+        self.calls.append(action.type)
+        body = json.loads(action.body.to_pybytes() or b"{}")
+        if action.type == "get_capabilities":
+            return [Result({"session_auth": self.session_auth})]
+        if action.type == "storage_etag":
+            return [Result({"success": True, "etag": "v1"})]
+        if body.get("password", self.password) != self.password:
+            if action.type == "login":
+                return [Result({"success": False, "error": "Invalid credentials"})]
+            return [Result({"error": "Invalid credentials"})]
+        if action.type == "login":
+            return [Result({"success": True, "token": "t", "expires_in": 3600})]
+        if action.type == "list_files":
+            return [Result({"success": True, "raw": [], "clean": ["a.duckdb"]})]
+        raise AssertionError(action.type)
+
+
+def client(session_auth):
+    server = FakeServer(session_auth)
+    return server, PayrollClient(connection=server, response_cache=ResponseCache(ttl_seconds=300))
+
+
+def test_login_never_served_from_response_cache():
+    for session_auth in (True, False):
+        server, payroll = client(session_auth)
+        assert payroll.authenticate("tenant", "lama")
+        assert payroll.get_file_list("tenant", "lama")[0]  # Masuk response cache
+
+        server.password = "baru"  # Password diganti admin
+        assert not payroll.authenticate("tenant", "lama")
+        assert payroll.authenticate("tenant", "baru")
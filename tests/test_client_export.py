@@ -0,0 +1,57 @@
+import io
+
+import pyarrow as pa
+
+from backend_client import RAW_CHUNK_SCHEMA, PayrollClient
+
+
+class FakeReader:
+    def __init__(self, chunks, file_size):
+        self.schema = RAW_CHUNK_SCHEMA.with_metadata({"format": "csv", "rows": "2", "columns": "2",
+                                                      "bytes": str(file_size)})
+        self.chunks = chunks
+        self.cancelled = False
+        self.read = 0
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.read += 1
+            yield type("Chunk", (), {"data": pa.record_batch([pa.array([chunk], pa.binary())], schema=self.schema)})
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class FakeExportClient(PayrollClient):
+    def __init__(self, reader):
+        super().__init__(connection=object())
+        self.reader = reader
+        self.client = self
+        self._capabilities = {"compression": []}
+
+    def do_get(self, ticket, options=None):
+        return self.reader
+
+    def _with_session(self, client_id, password, call):
+        return call(None)
+
+
+def test_export_written_chunk_by_chunk():
+    reader = FakeReader([b"a,b\n", b"1,2\n"], file_size=8)
+    output = io.BytesIO()
+    ok, info = FakeExportClient(reader).export_full_data("tenant", "pw", "a.duckdb", output, "csv", max_bytes=8)
+    assert ok, info
+    assert output.getvalue() == b"a,b\n1,2\n"
+    assert info["bytes"] == 8
+
+
+def test_export_over_limit_cancelled_before_any_chunk():
+    reader = FakeReader([b"x" * 100], file_size=300 << 20)
+    output = io.BytesIO()
+    ok, message = FakeExportClient(reader).export_full_data(
+        "tenant", "pw", "a.duckdb", output, "parquet", max_bytes=200 << 20
+    )
+    assert not ok
+    assert "lewat batas download" in message
+    assert reader.cancelled and reader.read == 0
+    assert output.getvalue() == b""
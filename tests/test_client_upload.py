@@ -0,0 +1,107 @@
+import io
+
+import pyarrow as pa
+import pyarrow.flight as flight
+import pytest
+
+from backend_client import PayrollClient
+
+BLOCK = 256
+
+
+def csv_bytes(rows=200):
+    return b"name,salary\n" + b"".join(f"employee {i},{i * 10}\n".encode() for i in range(rows))
+
+
+class FakeUploadClient(PayrollClient):
+    """
+    Client tanpa server: upload_status / commit_upload dijawab dari memory,
+    batch yang "terkirim" dicatat per percobaan.
+    """
+
+    def __init__(self, formats, stored_seq=0, fail_after=None):
+        super().__init__(connection=object())
+        self._capabilities = {"upload_formats": formats}
+        self.stored_seq = stored_seq  # Batch yang sudah aman di server
+        self.fail_after = fail_after  # Putus setelah sekian batch (sekali saja)
+        self.attempts = []
+        self.committed = None
+
+    def _json_action(self, action_type, client_id, password, action_info=None, raise_network=False):
+        if action_type == "upload_status":
+            return True, {"next_seq": self.stored_seq}
+        if action_type == "commit_upload":
+            self.committed = action_info
+            return True, {"success": True}
+        raise AssertionError(action_type)
+
+    def _with_session(self, client_id, password, call):
+        return call(None)
+
+    def _send_batches(self, descriptor, schema, seq_batches, start_seq, headers=None):
+        sent = []
+        self.attempts.append(sent)
+        for seq, batch in seq_batches:
+            if self.fail_after is not None and len(sent) == self.fail_after:
+                self.fail_after = None
+                raise flight.FlightUnavailableError("koneksi putus")
+            sent.append((seq, batch))
+            self.stored_seq = seq + 1
+        return self.stored_seq
+
+
+def upload(client, data, upload_format):
+    buffer = io.BytesIO(data)
+    buffer.name = "corporate_payroll.csv"
+    return client.upload_csv(buffer, "tenant", "pw", upload_format=upload_format, block_size=BLOCK)
+
+
+def test_arrow_blocks_are_bounded_and_deterministic():
+    client = PayrollClient(connection=object())
+    data = csv_bytes()
+    first = [b for b in client._open_csv_stream(io.BytesIO(data), BLOCK) if b.num_rows]
+    again = [b for b in client._open_csv_stream(io.BytesIO(data), BLOCK) if b.num_rows]
+    # Banyak batch kecil (memory rata), dan batas batch-nya sama tiap dibaca ulang
+    assert len(first) > 5
+    assert [b.num_rows for b in first] == [b.num_rows for b in again]
+    assert sum(b.num_rows for b in first) == 200
+    assert all(field.type == pa.string() for field in first[0].schema)
+
+
+@pytest.mark.parametrize("upload_format", ["arrow", "csv"])
+def test_resume_continues_from_stored_seq(monkeypatch, upload_format):
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+    client = FakeUploadClient(formats=[upload_format], fail_after=3)
+    ok, message = upload(client, csv_bytes(), upload_format)
+    assert ok, message
+
+    first, retry = client.attempts
+    assert [seq for seq, _ in first] == [0, 1, 2]
+    # Percobaan kedua mulai dari batch yang belum tersimpan, gak ada yang dobel/bolong
+    assert retry[0][0] == 3
+    seqs = [seq for seq, _ in first + retry]
+    assert seqs == list(range(len(seqs)))
+    assert client.committed["total_batches"] == len(seqs)
+
+
+def test_resumed_arrow_upload_sends_same_rows_as_single_pass(monkeypatch):
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+    data = csv_bytes()
+    clean = FakeUploadClient(formats=["arrow"])
+    upload(clean, data, "arrow")
+    resumed = FakeUploadClient(formats=["arrow"], fail_after=2)
+    upload(resumed, data, "arrow")
+
+    def rows(attempts):
+        return pa.Table.from_batches([batch for sent in attempts for _, batch in sent]).to_pylist()
+
+    assert rows(resumed.attempts) == rows(clean.attempts)
+
+
+def test_csv_blocks_are_raw_bytes():
+    client = FakeUploadClient(formats=["csv"])
+    data = csv_bytes()
+    upload(client, data, "csv")
+    sent = b"".join(batch.column(0)[0].as_py() for _, batch in client.attempts[0])
+    assert sent == data
+    assert all(len(batch.column(0)[0].as_py()) <= BLOCK for _, batch in client.attempts[0])
@@ -0,0 +1,63 @@
+import io
+
+import pyarrow as pa
+import pytest
+
+import csv_ingest
+from backend_client import PayrollClient
+
+
+def _server_parse(data, block_size=csv_ingest.CSV_BLOCK_SIZE):
+    # Byte CSV dipotong-potong kayak upload format "csv" dari client
+    chunks = [data[i:i + 7] for i in range(0, len(data), 7)]
+    batch = pa.record_batch([pa.array(chunks, pa.binary())], schema=csv_ingest.RAW_CHUNK_SCHEMA)
+    schema, batches = csv_ingest.parse_csv_chunks([batch], block_size=block_size)
+    return pa.Table.from_batches(list(batches), schema=schema)
+
+
+def _client_parse(data, block_size=csv_ingest.CSV_BLOCK_SIZE):
+    # Jalur upload "arrow": blok CSV di-parse client
+    client = PayrollClient.__new__(PayrollClient)
+    reader = client._open_csv_stream(io.BytesIO(data), block_size)
+    return pa.Table.from_batches([b for b in reader if b.num_rows > 0], schema=reader.schema)
+
+
+@pytest.mark.parametrize("data", [
+    b"name,salary,fte\nBudi,1000,0.5\nSiti,,1\n",
+    b"\xef\xbb\xbfname,\"salary, usd\",fte\r\n\"a, b\",1,\r\nc,NA,3.5\r\n",
+    b"name,salary\n001,00042\nNULL,1e3",
+])
+def test_server_and_client_parse_same_raw_schema(data):
+    server = _server_parse(data)
+    client = _client_parse(data)
+    assert server.schema.equals(client.schema, check_metadata=True)
+    assert server.equals(client)
+    assert all(field.type == pa.string() for field in server.schema)
+
+
+def test_leading_zeros_stay_strings():
+    table = _server_parse(b"id,amount\n007,0010\n")
+    assert table.column("id").to_pylist() == ["007"]
+    assert table.column("amount").to_pylist() == ["0010"]
+
+
+def test_empty_values_become_null():
+    table = _server_parse(b"a,b\n,x\nNA,y\n")
+    assert table.column("a").to_pylist() == [None, None]
+
+
+def test_crlf_header_has_clean_column_names():
+    table = _server_parse(b"a,b\r\n1,2\r\n")
+    assert table.column_names == ["a", "b"]
+
+
+def test_empty_file_rejected():
+    with pytest.raises(ValueError):
+        _server_parse(b"\n")
+
+
+def test_small_blocks_keep_all_rows():
+    rows = b"".join(f"{i},name{i}\n".encode() for i in range(500))
+    table = _server_parse(b"id,name\n" + rows, block_size=256)
+    assert table.num_rows == 500
+    assert table.column("id").to_pylist()[-1] == "499"
@@ -0,0 +1,117 @@
+import os
+
+import pyarrow as pa
+
+from dedupe import StreamFingerprint, UploadIndex, fingerprint_batches
+from serve_flight import BusinessSolutionServer
+
+SCHEMA = pa.schema([("name", pa.string()), ("salary", pa.string())])
+
+
+def fingerprint(batches, schema=SCHEMA):
+    return fingerprint_batches(schema, batches)
+
+
+def make_batch(names, salaries):
+    return pa.record_batch([pa.array(names, pa.string()), pa.array(salaries, pa.string())], schema=SCHEMA)
+
+
+def test_same_content_same_fingerprint():
+    first = make_batch(["a", "b"], ["1", None])
+    second = make_batch(["a", "b"], ["1", None])
+    assert fingerprint([first]) == fingerprint([second])
+
+
+def test_different_content_different_fingerprint():
+    assert fingerprint([make_batch(["a"], ["1"])]) != fingerprint([make_batch(["a"], ["2"])])
+    assert fingerprint([make_batch(["a"], ["1"])]) != fingerprint([make_batch(["a"], [None])])
+
+
+def test_sliced_batches_hash_only_their_rows():
+    parent = make_batch(["a", "b", "c", "d"], ["1", "2", "3", "4"])
+    head, tail = parent.slice(0, 2), parent.slice(2, 2)
+    # Slice berbagi buffer induk, tapi isinya beda: fingerprint harus beda
+    assert fingerprint([head]) != fingerprint([tail])
+    # Dan sama dengan batch baru yang isinya identik
+    assert fingerprint([tail]) == fingerprint([make_batch(["c", "d"], ["3", "4"])])
+
+
+def test_schema_is_part_of_fingerprint():
+    other = pa.schema([("nama", pa.string()), ("salary", pa.string())])
+    batch = make_batch(["a"], ["1"])
+    assert fingerprint([batch]) != fingerprint([batch.rename_columns(["nama", "salary"])], schema=other)
+
+
+def test_index_lookup_requires_same_model_version_and_db(tmp_path):
+    index = UploadIndex(storage_root=str(tmp_path))
+    os.makedirs(tmp_path / "tenant")
+    clean_db = tmp_path / "tenant" / "tenant_corporate.duckdb"
+    clean_db.write_bytes(b"")
+
+    index.record("tenant", str(clean_db), "fp1", "v1", "raw.parquet")
+    assert index.lookup("tenant", str(clean_db), "fp1", "v1")["raw_file"] == "raw.parquet"
+    assert index.lookup("tenant", str(clean_db), "fp1", "v2") is None
+    assert index.lookup("tenant", str(clean_db), "fp2", "v1") is None
+
+    # Index ditulis ke disk: instance baru (restart server) tetap kenal
+    assert UploadIndex(storage_root=str(tmp_path)).lookup("tenant", str(clean_db), "fp1", "v1")
+
+    clean_db.unlink()
+    assert index.lookup("tenant", str(clean_db), "fp1", "v1") is None
+
+
+def test_index_forget(tmp_path):
+    index = UploadIndex(storage_root=str(tmp_path))
+    os.makedirs(tmp_path / "tenant")
+    clean_db = tmp_path / "tenant" / "db.duckdb"
+    clean_db.write_bytes(b"")
+    index.record("tenant", str(clean_db), "fp1", "v1", "raw.parquet")
+    index.forget("tenant", str(clean_db))
+    assert index.lookup("tenant", str(clean_db), "fp1", "v1") is None
+
+
+class ModelCache:
+    def model_version(self, industry_type):
+        return "v1"
+
+
+def ingest_server(tmp_path):
+    server = BusinessSolutionServer.__new__(BusinessSolutionServer)
+    server.handoff_mode = "file"
+    server.upload_index = UploadIndex(str(tmp_path))
+    server.model_cache = ModelCache()
+    os.makedirs(tmp_path / "tenant")
+    return server
+
+
+def test_duplicate_with_known_fingerprint_writes_nothing(tmp_path):
+    server = ingest_server(tmp_path)
+    clean_db = tmp_path / "tenant_corporate_jan.duckdb"
+    clean_db.write_bytes(b"db")
+    batches = [make_batch(["a"], ["1"])]
+    known = fingerprint(batches)
+    server.upload_index.record("tenant", str(clean_db), known, "v1", "jan.parquet")
+
+    raw = tmp_path / "Raw" / "jan.parquet"
+    consumed = []
+    reply = server._ingest("tenant", "corporate", "jan.csv", SCHEMA, (consumed.append(b) or b for b in batches),
+                           str(raw), str(clean_db), 0, fingerprint=known)
+    assert reply["deduplicated"]
+    # Sumber gak dibaca lagi, Raw Zone gak disentuh (gak ada .part sama sekali)
+    assert consumed == []
+    assert not (tmp_path / "Raw").exists()
+
+
+def test_duplicate_stream_leaves_raw_file_untouched(tmp_path):
+    server = ingest_server(tmp_path)
+    clean_db = tmp_path / "tenant_corporate_jan.duckdb"
+    clean_db.write_bytes(b"db")
+    batches = [make_batch(["a"], ["1"])]
+    server.upload_index.record("tenant", str(clean_db), fingerprint(batches), "v1", "jan.parquet")
+    raw = tmp_path / "jan.parquet"
+    raw.write_bytes(b"raw lama")
+
+    reply = server._ingest("tenant", "corporate", "jan.csv", SCHEMA, iter(batches), str(raw), str(clean_db), 0)
+    assert reply["deduplicated"]
+    assert raw.read_bytes() == b"raw lama"
+    assert not os.path.exists(str(raw) + ".part")
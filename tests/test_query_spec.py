@@ -0,0 +1,170 @@
+import duckdb
+import pytest
+
+import query_spec
+from query_spec import QuerySpecError, build_query, partition_condition
+from serve_flight import BusinessSolutionServer
+from transform_engine import CompiledModel
+
+TABLE = "corporate.fct_corporate"
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    con.execute("CREATE SCHEMA corporate")
+    con.execute(
+        f"CREATE TABLE {TABLE} (row_id BIGINT, job_title VARCHAR, department VARCHAR, "
+        "total_amount DOUBLE, is_active BOOLEAN)"
+    )
+    con.execute(
+        f"INSERT INTO {TABLE} VALUES "
+        "(1, 'Officer', 'Police', 100.0, true), "
+        "(2, 'Clerk', 'Finance', 50.0, false), "
+        "(3, 'Chief', 'Police', 300.0, true)"
+    )
+    yield con
+    con.close()
+
+
+@pytest.fixture
+def columns(con):
+    return query_spec.table_columns(con, TABLE)
+
+
+def run(con, columns, spec, **kwargs):
+    sql, params = build_query(TABLE, columns, spec, **kwargs)
+    return con.execute(sql, params).fetchall()
+
+
+def test_filter_value_is_bound_not_inlined(con, columns):
+    payload = "Police' OR '1'='1"
+    sql, params = build_query(TABLE, columns, {"filters": [{"column": "department", "value": payload}]})
+    assert payload not in sql
+    assert params == [payload]
+    assert con.execute(sql, params).fetchall() == []
+
+
+def test_injection_in_column_name_rejected(columns):
+    with pytest.raises(QuerySpecError):
+        build_query(TABLE, columns, {"columns": ["job_title; DROP TABLE corporate.fct_corporate"]})
+    with pytest.raises(QuerySpecError):
+        build_query(TABLE, columns, {"order_by": [{"column": '"row_id" --'}]})
+
+
+@pytest.mark.parametrize("spec", [
+    {"columns": ["salary"]},
+    {"columns": [1]},
+    {"filters": [{"column": "missing", "value": 1}]},
+    {"order_by": ["missing"]},
+    {"order_by": [{"desc": True}]},
+])
+def test_unknown_column_rejected(columns, spec):
+    with pytest.raises(QuerySpecError, match="Kolom tidak dikenal"):
+        build_query(TABLE, columns, spec)
+
+
+@pytest.mark.parametrize("spec", [
+    {"select": "*"},
+    {"filters": [{"column": "department", "op": "LIKE", "value": "%"}]},
+    {"filters": [{"column": "total_amount", "value": "100"}]},
+    {"filters": [{"column": "total_amount", "value": True}]},
+    {"filters": [{"column": "department", "op": "in", "value": []}]},
+    {"filters": [{"column": "total_amount", "op": "between", "value": [1]}]},
+    {"limit": "10"},
+    {"limit": -1},
+    {"offset": True},
+    "SELECT 1",
+])
+def test_invalid_spec_rejected(columns, spec):
+    with pytest.raises(QuerySpecError):
+        build_query(TABLE, columns, spec)
+
+
+def test_filters_projection_order_and_paging(con, columns):
+    spec = {
+        "columns": ["row_id", "total_amount"],
+        "filters": [
+            {"column": "department", "op": "in", "value": ["Police", "Finance"]},
+            {"column": "total_amount", "op": "between", "value": [60, 1000]},
+        ],
+        "order_by": [{"column": "total_amount", "desc": True}],
+        "limit": 1,
+        "offset": 1,
+    }
+    assert run(con, columns, spec) == [(1, 100.0)]
+
+
+def test_tiebreak_appended_once(columns):
+    sql, _ = build_query(TABLE, columns, {"order_by": ["row_id"]}, default_order=["job_title"], tiebreak=["row_id"])
+    assert sql.endswith('ORDER BY "row_id"')
+    sql, _ = build_query(TABLE, columns, {}, default_order=["job_title"], tiebreak=["row_id"])
+    assert sql.endswith('ORDER BY "job_title", "row_id"')
+
+
+def test_partitions_cover_every_row_once(con, columns):
+    seen = []
+    for index in range(3):
+        seen += [row[0] for row in run(con, columns, {"columns": ["row_id"]}, tiebreak=["row_id"], partition=[index, 3])]
+    assert sorted(seen) == [1, 2, 3]
+
+
+@pytest.mark.parametrize("partition", [[3, 3], [-1, 2], [0, 0], [0], "0,2", [True, 2], [0.5, 2]])
+def test_invalid_partition_rejected(columns, partition):
+    with pytest.raises(QuerySpecError):
+        partition_condition(columns, partition)
+
+
+def test_partition_hash_ignores_unknown_keys(columns):
+    assert partition_condition(columns, [0, 2], keys=["row_id"]) == 'hash("row_id") % 2 = 0'
+    # Key yang gak ada di tabel dibuang; kalau habis, hash pakai semua kolom
+    assert partition_condition(columns, [1, 2], keys=["nope"]).startswith('hash("row_id", "job_title"')
+
+
+def test_partition_with_limit_rejected(columns):
+    with pytest.raises(QuerySpecError):
+        build_query(TABLE, columns, {"limit": 10}, partition=[0, 2])
+
+
+class ModelCache:
+    def __init__(self, grain):
+        self.grain = grain
+
+    def get(self, industry_type):
+        return [CompiledModel(f"{industry_type}.fct_{industry_type}", "SELECT 1", self.grain)]
+
+
+def fact_key(grain, target_file, columns):
+    server = BusinessSolutionServer.__new__(BusinessSolutionServer)
+    server.model_cache = ModelCache(grain)
+    return server._fact_unique_key("education", target_file, columns)
+
+
+def test_fact_without_grain_orders_by_all_columns(con, columns):
+    # Model tanpa grain (education/hospital): job_title kembar, tanpa tiebreak halaman bisa tumpang tindih
+    con.execute(f"INSERT INTO {TABLE} VALUES (4, 'Officer', 'Fire', 80.0, true), (5, 'Officer', 'Parks', 90.0, NULL)")
+    tiebreak = fact_key((), "education.duckdb", columns)
+    assert tiebreak == tuple(columns)
+    pages = [
+        run(con, columns, {"columns": ["row_id"], "limit": 1, "offset": offset},
+            default_order=["job_title"], tiebreak=tiebreak)
+        for offset in range(5)
+    ]
+    assert sorted(row for page in pages for row in page) == [(1,), (2,), (3,), (4,), (5,)]
+    assert fact_key(("row_id",), "corporate.duckdb", columns) == ("row_id",)
+
+
+def test_dataset_without_grain_hashes_on_all_columns(con, columns):
+    # Dataset satu upload: kalau hash cuma dari kolom upload, semua baris jatuh ke satu endpoint
+    con.execute(f"ALTER TABLE {TABLE} ADD COLUMN upload VARCHAR DEFAULT 'jan'")
+    con.execute(f"INSERT INTO {TABLE} SELECT range + 10, 'Clerk', 'Finance', range, true, 'jan' FROM range(200)")
+    columns = query_spec.table_columns(con, TABLE)
+    key = fact_key((), "@dataset", columns)
+    assert key == tuple(columns)
+    sizes = [
+        len(run(con, columns, {"columns": ["row_id"]}, tiebreak=key, partition=[index, 4]))
+        for index in range(4)
+    ]
+    assert sum(sizes) == 203
+    assert all(sizes)
+    assert fact_key(("row_id",), "@dataset", columns) == ("row_id", "upload")
@@ -0,0 +1,90 @@
+import threading
+
+import duckdb
+import pytest
+
+from read_pool import ReadConnectionPool
+from transform_engine import KeyedLocks
+
+
+def make_db(path, rows=10):
+    with duckdb.connect(str(path)) as con:
+        con.execute(f"CREATE TABLE t AS SELECT range AS n FROM range({rows})")
+    return str(path)
+
+
+@pytest.fixture
+def pool():
+    pool = ReadConnectionPool(KeyedLocks(), max_open=2, drain_timeout=0.2)
+    yield pool
+    pool.close_all()
+
+
+def test_cursor_reuses_pooled_connection(pool, tmp_path):
+    db = make_db(tmp_path / "a.duckdb")
+    for _ in range(3):
+        cursor = pool.acquire(db)
+        assert cursor.execute("SELECT COUNT(*) FROM t").fetchone() == (10,)
+        pool.release(db, cursor)
+    assert pool.stats["opens"] == 1
+    assert pool.stats["hits"] == 2
+
+
+def test_invalidate_never_closes_a_leased_connection(pool, tmp_path):
+    db = make_db(tmp_path / "a.duckdb", rows=100_000)
+    cursor = pool.acquire(db)
+    reader = cursor.execute("SELECT n FROM t").fetch_record_batch(1000)
+    next(iter(reader))
+
+    # Writer datang selagi stream masih jalan: nunggu drain_timeout lalu lanjut,
+    # koneksinya tetap hidup sampai cursor terakhir balik
+    pool.invalidate(db)
+    assert pool.open_connections() == 0
+    assert sum(batch.num_rows for batch in reader) == 100_000 - 1000
+    pool.release(db, cursor)
+
+    # Koneksi sudah ditutup: file bisa dibuka writer
+    with duckdb.connect(db) as writer:
+        writer.execute("INSERT INTO t VALUES (-1)")
+
+
+def test_invalidate_waits_for_running_cursor(tmp_path):
+    pool = ReadConnectionPool(KeyedLocks(), drain_timeout=5.0)
+    db = make_db(tmp_path / "a.duckdb")
+    cursor = pool.acquire(db)
+    releaser = threading.Timer(0.2, pool.release, args=(db, cursor))
+    releaser.start()
+    pool.invalidate(db)  # Balik setelah cursor dilepas, bukan setelah timeout
+    releaser.join()
+    with duckdb.connect(db) as writer:
+        writer.execute("INSERT INTO t VALUES (-1)")
+
+
+def test_changed_file_reopens_connection(pool, tmp_path):
+    db = make_db(tmp_path / "a.duckdb")
+    pool.release(db, pool.acquire(db))
+    pool.invalidate(db)
+    with duckdb.connect(db) as writer:
+        writer.execute("INSERT INTO t VALUES (99)")
+
+    cursor = pool.acquire(db)
+    assert cursor.execute("SELECT COUNT(*) FROM t").fetchone() == (11,)
+    pool.release(db, cursor)
+    assert pool.stats["opens"] == 2
+
+
+def test_lru_eviction_skips_leased_connections(pool, tmp_path):
+    dbs = [make_db(tmp_path / f"{name}.duckdb") for name in "abc"]
+    leased = pool.acquire(dbs[0])
+    for db in dbs[1:]:
+        pool.release(db, pool.acquire(db))
+    # Kuota 2: yang dibuang "b" (nganggur paling lama), bukan "a" yang masih dipakai
+    assert pool.open_connections() == 2
+    assert pool.stats["evictions"] == 1
+    assert leased.execute("SELECT COUNT(*) FROM t").fetchone() == (10,)
+    pool.release(dbs[0], leased)
+
+
+def test_missing_file_raises(pool, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        pool.acquire(str(tmp_path / "missing.duckdb"))
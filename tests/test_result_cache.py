@@ -0,0 +1,83 @@
+import pyarrow as pa
+
+from result_cache import ResultCache
+
+
+def table(rows):
+    # int64: ukuran = rows * 8 byte
+    return pa.table({"n": pa.array(range(rows), pa.int64())})
+
+
+def test_lru_eviction_by_total_bytes():
+    cache = ResultCache(max_bytes=800, max_entry_bytes=800)
+    keys = [cache.key("tenant", "a.duckdb", "report", {"page": i}) for i in range(3)]
+    for key in keys:
+        assert cache.put(key, table(40))  # 320 byte per entry
+
+    # Entry ketiga bikin total 960 > 800: yang paling lama gak dipakai dibuang
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[1]) is not None
+    assert cache.summary()["evictions"] == 1
+    assert cache.summary()["bytes"] == 640
+
+
+def test_get_refreshes_lru_position():
+    cache = ResultCache(max_bytes=800, max_entry_bytes=800)
+    first, second, third = (cache.key("tenant", "a.duckdb", "report", {"page": i}) for i in range(3))
+    cache.put(first, table(40))
+    cache.put(second, table(40))
+    cache.get(first)  # first jadi yang paling baru dipakai
+    cache.put(third, table(40))
+    assert cache.get(first) is not None
+    assert cache.get(second) is None
+
+
+def test_oversized_entry_not_cached():
+    cache = ResultCache(max_bytes=1000)  # max_entry_bytes = 250
+    key = cache.key("tenant", "a.duckdb", "get_full_clean")
+    assert not cache.put(key, table(40))
+    assert cache.get(key) is None
+    assert cache.summary()["bytes"] == 0
+
+
+def test_replacing_key_keeps_size_accounting():
+    cache = ResultCache(max_bytes=1000, max_entry_bytes=1000)
+    key = cache.key("tenant", "a.duckdb", "report")
+    cache.put(key, table(40))
+    cache.put(key, table(10))
+    assert cache.summary()["bytes"] == 80
+    assert cache.summary()["entries"] == 1
+
+
+def test_invalidate_drops_entries_of_that_db_only():
+    cache = ResultCache(max_bytes=1000, max_entry_bytes=1000)
+    key_a = cache.key("tenant", "a.duckdb", "report")
+    key_b = cache.key("tenant", "b.duckdb", "report")
+    cache.put(key_a, table(10))
+    cache.put(key_b, table(10))
+
+    cache.invalidate("a.duckdb")
+    assert cache.get(key_a) is None
+    assert cache.get(key_b) is not None
+    assert cache.summary()["bytes"] == 80
+    # Key baru buat DB itu pakai versi baru
+    assert cache.key("tenant", "a.duckdb", "report") != key_a
+
+
+def test_result_started_before_invalidate_not_stored():
+    cache = ResultCache(max_bytes=1000, max_entry_bytes=1000)
+    key = cache.key("tenant", "a.duckdb", "report")
+    cache.invalidate("a.duckdb")  # DB ditulis ulang selagi query lama masih jalan
+    assert not cache.put(key, table(10))
+    assert cache.get(key) is None
+
+
+def test_params_order_does_not_change_key():
+    cache = ResultCache()
+    assert cache.key("t", "a.duckdb", "q", {"x": 1, "y": 2}) == cache.key("t", "a.duckdb", "q", {"y": 2, "x": 1})
+
+
+def test_disabled_cache_stores_nothing():
+    cache = ResultCache(max_bytes=0)
+    assert not cache.enabled
+    assert not cache.put(cache.key("t", "a.duckdb", "q"), table(1))
@@ -0,0 +1,95 @@
+import duckdb
+import pytest
+
+import csv_ingest
+from result_cache import ResultCache
+from serve_flight import BusinessSolutionServer
+
+
+class Calls:
+    def __init__(self):
+        self.released = 0
+        self.ended = 0
+
+    def release(self):
+        self.released += 1
+
+    def end_request(self):
+        self.ended += 1
+
+
+@pytest.fixture
+def calls():
+    return Calls()
+
+
+@pytest.fixture
+def server(calls):
+    # Cuma atribut yang dipakai _stream_query (tanpa Flight server / SQLMesh)
+    server = BusinessSolutionServer.__new__(BusinessSolutionServer)
+    server.result_cache = ResultCache(max_bytes=1 << 20, max_entry_bytes=64 << 10)
+    server.maintenance = calls
+    return server
+
+
+def reader(rows, batch_rows=1000):
+    con = duckdb.connect()
+    return con.execute(f"SELECT range AS n FROM range({rows})").fetch_record_batch(batch_rows)
+
+
+def test_streams_every_batch_and_releases_once(server, calls):
+    batches = list(server._stream_query(calls.release, reader(5000)))
+    assert sum(batch.num_rows for batch in batches) == 5000
+    assert len(batches) == 5
+    assert (calls.released, calls.ended) == (1, 1)
+
+
+def test_client_disconnect_still_releases(server, calls):
+    stream = server._stream_query(calls.release, reader(5000))
+    next(stream)
+    stream.close()  # GeneratorStream berhenti di tengah jalan
+    assert (calls.released, calls.ended) == (1, 1)
+
+
+def test_small_result_cached_after_full_stream(server, calls):
+    key = server.result_cache.key("tenant", "a.duckdb", "get_kpis")
+    list(server._stream_query(calls.release, reader(100), key))
+    cached = server.result_cache.get(key)
+    assert cached is not None and cached.num_rows == 100
+
+
+def test_large_or_partial_result_not_cached(server, calls):
+    big = server.result_cache.key("tenant", "a.duckdb", "get_full_clean")
+    list(server._stream_query(calls.release, reader(100_000), big))  # ~800 KB > 64 KB
+    assert server.result_cache.get(big) is None
+
+    partial = server.result_cache.key("tenant", "a.duckdb", "get_budget_report")
+    stream = server._stream_query(calls.release, reader(5000), partial)
+    next(stream)
+    stream.close()
+    assert server.result_cache.get(partial) is None
+
+
+def test_stream_dropped_before_first_batch_still_releases(server, calls):
+    # Client putus sebelum batch pertama: generator gak pernah jalan, stream cuma dibuang
+    stream = server._stream_query(calls.release, reader(5000))
+    del stream
+    assert (calls.released, calls.ended) == (1, 1)
+
+
+def test_export_file_removed_when_stream_dropped_unread(server, calls, tmp_path):
+    export_path = tmp_path / "payroll_export_x.parquet"
+    export_path.write_bytes(b"data")
+    stream = server._stream_file_chunks(str(export_path), csv_ingest.RAW_CHUNK_SCHEMA)
+    del stream
+    assert not export_path.exists()
+    assert calls.ended == 1
+
+
+def test_export_file_streamed_then_removed(server, calls, tmp_path):
+    export_path = tmp_path / "payroll_export_y.csv"
+    export_path.write_bytes(b"a,b\n1,2\n")
+    chunks = list(server._stream_file_chunks(str(export_path), csv_ingest.RAW_CHUNK_SCHEMA))
+    assert b"".join(batch.column(0)[0].as_py() for batch in chunks) == b"a,b\n1,2\n"
+    assert not export_path.exists()
+    assert calls.ended == 1
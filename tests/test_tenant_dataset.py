@@ -0,0 +1,107 @@
+import json
+import os
+
+import duckdb
+import pytest
+
+import tenant_dataset
+
+FACT = "education.fct_education"
+
+
+def make_db(path, rows, with_upload=False):
+    with duckdb.connect(str(path)) as con:
+        con.execute("CREATE SCHEMA education")
+        upload = ", upload VARCHAR" if with_upload else ""
+        con.execute(f"CREATE TABLE {FACT} (id INTEGER, name VARCHAR{upload})")
+        for row in rows:
+            con.execute(f"INSERT INTO {FACT} VALUES ({', '.join('?' for _ in row)})", list(row))
+    return str(path)
+
+
+def read_all(directory, uploads=None):
+    con = tenant_dataset.connect(directory, "education", uploads)
+    try:
+        return con.execute(f"SELECT id, name, upload FROM {FACT} ORDER BY id").fetchall()
+    finally:
+        con.close()
+
+
+def test_upload_name_is_safe_partition_value():
+    assert tenant_dataset.upload_name("/x/Raw/education jan (1).csv") == "education_jan__1_"
+    assert tenant_dataset.upload_name("tenant_education.duckdb") == "tenant_education"
+
+
+def test_per_upload_db_published_as_one_partition(tmp_path):
+    directory = str(tmp_path / "Dataset")
+    os.makedirs(directory)
+    jan = make_db(tmp_path / "jan.duckdb", [(1, "a"), (2, "b")])
+    feb = make_db(tmp_path / "feb.duckdb", [(3, "c")])
+    assert tenant_dataset.publish(jan, FACT, directory, "jan.csv") == ["jan"]
+    assert tenant_dataset.publish(feb, FACT, directory, "feb.csv") == ["feb"]
+
+    assert read_all(directory) == [(1, "a", "jan"), (2, "b", "jan"), (3, "c", "feb")]
+    # Pilih upload = cuma partisi itu yang dibaca
+    assert read_all(directory, ["feb"]) == [(3, "c", "feb")]
+    manifest = tenant_dataset.read_manifest(directory)
+    assert manifest["uploads"]["jan"]["rows"] == 2
+    assert manifest["uploads"]["jan"]["source_file"] == "jan.csv"
+
+
+def test_history_db_publishes_only_named_partitions(tmp_path):
+    directory = str(tmp_path / "Dataset")
+    os.makedirs(directory)
+    history = make_db(tmp_path / "history.duckdb", [(1, "a", "jan"), (2, "b", "feb")], with_upload=True)
+    tenant_dataset.publish(history, FACT, directory, "jan.csv", uploads=["jan"])
+    assert read_all(directory) == [(1, "a", "jan")]
+
+    tenant_dataset.publish(history, FACT, directory, "feb.csv", uploads=["feb"])
+    assert read_all(directory) == [(1, "a", "jan"), (2, "b", "feb")]
+    # Kolom upload gak disimpan di file (datang dari path hive)
+    assert tenant_dataset.read_manifest(directory)["uploads"]["feb"]["columns"] == ["id", "name"]
+
+
+def test_partition_emptied_by_merge_is_removed(tmp_path):
+    directory = str(tmp_path / "Dataset")
+    os.makedirs(directory)
+    history = make_db(tmp_path / "history.duckdb", [(1, "a", "jan")], with_upload=True)
+    tenant_dataset.publish(history, FACT, directory, "jan.csv", uploads=["jan"])
+
+    # Upload "feb" menggeser semua baris "jan"
+    with duckdb.connect(history) as con:
+        con.execute(f"UPDATE {FACT} SET upload = 'feb', name = 'a2'")
+    assert tenant_dataset.publish(history, FACT, directory, "feb.csv", uploads=["feb", "jan"]) == ["feb"]
+
+    manifest = tenant_dataset.read_manifest(directory)
+    assert sorted(manifest["uploads"]) == ["feb"]
+    assert not os.path.exists(os.path.join(directory, "upload=jan"))
+    assert read_all(directory) == [(1, "a2", "feb")]
+
+
+def test_connect_rejects_unknown_upload_and_empty_dataset(tmp_path):
+    directory = str(tmp_path / "Dataset")
+    os.makedirs(directory)
+    with pytest.raises(FileNotFoundError):
+        tenant_dataset.connect(directory, "education")
+    tenant_dataset.publish(make_db(tmp_path / "jan.duckdb", [(1, "a")]), FACT, directory)
+    with pytest.raises(ValueError):
+        tenant_dataset.connect(directory, "education", ["mar"])
+
+
+@pytest.mark.parametrize("content", ['{"uploads": {"jan": {"ro', "", "[]"])
+def test_corrupt_manifest_rebuilt_from_partitions(tmp_path, content):
+    directory = str(tmp_path / "Dataset")
+    os.makedirs(directory)
+    tenant_dataset.publish(make_db(tmp_path / "jan.duckdb", [(1, "a"), (2, "b")]), FACT, directory, "jan.csv")
+    with open(os.path.join(directory, tenant_dataset.MANIFEST_FILE), "w") as f:
+        f.write(content)  # Kepotong di tengah tulis / rusak
+
+    manifest = tenant_dataset.read_manifest(directory)
+    assert manifest["uploads"]["jan"]["rows"] == 2
+    assert manifest["uploads"]["jan"]["columns"] == ["id", "name"]
+    assert read_all(directory) == [(1, "a", "jan"), (2, "b", "jan")]
+
+    # Publish berikutnya nulis manifest utuh lagi, partisi lama tetap tercatat
+    tenant_dataset.publish(make_db(tmp_path / "feb.duckdb", [(3, "c")]), FACT, directory, "feb.csv")
+    with open(os.path.join(directory, tenant_dataset.MANIFEST_FILE)) as f:
+        assert sorted(json.load(f)["uploads"]) == ["feb", "jan"]
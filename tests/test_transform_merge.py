@@ -0,0 +1,137 @@
+import time
+
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import transform_engine
+from transform_engine import DuplicateKeyError, _merge_by_unique_key
+
+TARGET = '"corporate"."fct_corporate"'
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    con.execute("CREATE SCHEMA corporate")
+    con.execute(f"CREATE TABLE {TARGET} (row_id BIGINT, amount DOUBLE, upload VARCHAR)")
+    con.execute(f"INSERT INTO {TARGET} VALUES (1, 10, 'jan'), (2, 20, 'jan'), (3, 30, 'feb')")
+    yield con
+    con.close()
+
+
+def rows(con):
+    return con.execute(f"SELECT row_id, amount, upload FROM {TARGET} ORDER BY row_id, upload").fetchall()
+
+
+def delta(values, upload="mar"):
+    return " UNION ALL ".join(f"SELECT {key} AS row_id, {amount}::DOUBLE AS amount, '{upload}' AS upload"
+                              for key, amount in values)
+
+
+def test_merge_replaces_matching_keys_and_inserts_new(con):
+    inserted, replaced, touched = _merge_by_unique_key(con, TARGET, delta([(2, 21), (4, 40)]), ("row_id",))
+    assert (inserted, replaced) == (2, 1)
+    assert touched == ["jan"]
+    assert rows(con) == [(1, 10, "jan"), (2, 21, "mar"), (3, 30, "feb"), (4, 40, "mar")]
+
+
+def test_duplicate_keys_in_delta_fail_the_load(con):
+    with pytest.raises(DuplicateKeyError, match="row_id"):
+        _merge_by_unique_key(con, TARGET, delta([(2, 21), (2, 22), (5, 50)]), ("row_id",))
+    # Target gak berubah, tabel delta sementara sudah dibuang
+    assert rows(con) == [(1, 10, "jan"), (2, 20, "jan"), (3, 30, "feb")]
+    assert con.execute("SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = '__delta'").fetchone()[0] == 0
+
+
+def test_duplicates_allowed_when_key_is_not_unique(con):
+    # Model tanpa grain: key = kolom upload, upload ulang menimpa seluruh isi upload itu
+    inserted, replaced, touched = _merge_by_unique_key(
+        con, TARGET, delta([(7, 1), (7, 1)], upload="jan"), ("upload",), require_unique=False
+    )
+    assert (inserted, replaced) == (2, 2)
+    assert touched == []
+    assert rows(con) == [(3, 30, "feb"), (7, 1, "jan"), (7, 1, "jan")]
+
+
+def test_reupload_without_grain_replaces_upload_in_linear_time(con):
+    # Upload ulang file besar: lewat JOIN per kolom upload ini dulu N x M (20k baris ~6 detik)
+    big = "SELECT range AS row_id, range::DOUBLE AS amount, 'jan' AS upload FROM range(20000)"
+    _merge_by_unique_key(con, TARGET, big, ("upload",), require_unique=False)
+    started = time.monotonic()
+    inserted, replaced, touched = _merge_by_unique_key(
+        con, TARGET, big.replace("range::DOUBLE", "range * 2.0"), ("upload",), require_unique=False
+    )
+    assert time.monotonic() - started < 2.0
+    assert (inserted, replaced, touched) == (20000, 20000, [])
+    assert con.execute(
+        f"SELECT COUNT(*), SUM(amount) FROM {TARGET} WHERE upload = 'jan'"
+    ).fetchone() == (20000, 2.0 * sum(range(20000)))
+    assert con.execute(f"SELECT row_id, amount FROM {TARGET} WHERE upload = 'feb'").fetchall() == [(3, 30)]
+
+
+def test_null_keys_match_each_other(con):
+    con.execute(f"INSERT INTO {TARGET} VALUES (NULL, 99, 'jan')")
+    _merge_by_unique_key(con, TARGET, "SELECT NULL::BIGINT AS row_id, 100::DOUBLE AS amount, 'mar' AS upload",
+                         ("row_id",))
+    assert con.execute(f"SELECT amount, upload FROM {TARGET} WHERE row_id IS NULL").fetchall() == [(100, "mar")]
+
+
+def test_merge_key_falls_back_to_upload_column():
+    with_grain = transform_engine.CompiledModel("corporate.fct_corporate", "SELECT 1", ("row_id",))
+    without_grain = transform_engine.CompiledModel("education.fct_education", "SELECT 1", ())
+    assert transform_engine.merge_key(with_grain) == ("row_id",)
+    assert transform_engine.merge_key(without_grain) == (transform_engine.UPLOAD_COLUMN,)
+
+
+def _compiled():
+    return [
+        transform_engine.CompiledModel(
+            "corporate.stg_corporate",
+            "SELECT CAST(row_id AS BIGINT) AS row_id, CAST(amount AS DOUBLE) AS amount FROM raw_upload",
+            (),
+        ),
+        transform_engine.CompiledModel(
+            "corporate.fct_corporate", 'SELECT * FROM "corporate"."stg_corporate"', ("row_id",)
+        ),
+    ]
+
+
+def _raw(tmp_path, name, values):
+    path = tmp_path / f"{name}.parquet"
+    pq.write_table(pa.table({"row_id": [str(k) for k, _ in values], "amount": [str(a) for _, a in values]}), path)
+    return str(path)
+
+
+def test_incremental_run_rejects_duplicate_grain_and_rolls_back(tmp_path):
+    db = str(tmp_path / "history.duckdb")
+    summary = transform_engine.run_compiled_models(
+        db, _compiled(), _raw(tmp_path, "jan", [(1, 10), (2, 20)]), incremental=True, upload="jan"
+    )
+    assert summary["uploads"] == ["jan"]
+
+    with pytest.raises(DuplicateKeyError):
+        transform_engine.run_compiled_models(
+            db, _compiled(), _raw(tmp_path, "feb", [(2, 21), (2, 22)]), incremental=True, upload="feb"
+        )
+
+    summary = transform_engine.run_compiled_models(
+        db, _compiled(), _raw(tmp_path, "mar", [(2, 23), (3, 30)]), incremental=True, upload="mar"
+    )
+    assert (summary["inserted"], summary["replaced"]) == (2, 1)
+    assert summary["uploads"] == ["mar", "jan"]
+    with duckdb.connect(db) as con:
+        assert rows(con) == [(1, 10, "jan"), (2, 23, "mar"), (3, 30, "mar")]
+
+
+def test_first_incremental_load_with_duplicate_grain_leaves_no_table(tmp_path):
+    db = str(tmp_path / "history.duckdb")
+    with pytest.raises(DuplicateKeyError):
+        transform_engine.run_compiled_models(
+            db, _compiled(), _raw(tmp_path, "jan", [(1, 10), (1, 11)]), incremental=True, upload="jan"
+        )
+    with duckdb.connect(db) as con:
+        assert con.execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'fct_corporate'"
+        ).fetchone()[0] == 0
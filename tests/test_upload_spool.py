@@ -0,0 +1,96 @@
+import os
+
+import pyarrow as pa
+import pytest
+
+from upload_spool import UploadSpool
+
+UPLOAD_ID = "0123abcd"
+
+
+@pytest.fixture
+def spool(tmp_path):
+    return UploadSpool(storage_root=str(tmp_path))
+
+
+def batch(value):
+    return pa.record_batch([pa.array([value, value + 1])], names=["n"])
+
+
+def stream(seqs):
+    return [(seq, batch(seq * 10)) for seq in seqs]
+
+
+def test_fresh_upload_has_nothing_committed(spool):
+    status = spool.status("tenant", UPLOAD_ID)
+    assert status["next_seq"] == 0
+    assert status["committed_seq"] == -1
+
+
+def test_resume_skips_batches_already_stored(spool):
+    assert spool.receive("tenant", UPLOAD_ID, "payroll.csv", stream([0, 1])) == 2
+    # Koneksi putus lalu client kirim ulang dari batch 1: batch 1 dilewati, 2 disimpan
+    assert spool.receive("tenant", UPLOAD_ID, "payroll.csv", stream([1, 2])) == 3
+    status = spool.status("tenant", UPLOAD_ID)
+    assert status == {"upload_id": UPLOAD_ID, "filename": "payroll.csv", "next_seq": 3, "committed_seq": 2}
+
+    session, schema, batches = spool.load("tenant", UPLOAD_ID, 3)
+    assert session["filename"] == "payroll.csv"
+    assert schema == batch(0).schema
+    assert [b.column(0).to_pylist() for b in batches] == [[0, 1], [10, 11], [20, 21]]
+
+
+def test_gap_in_seq_rejected_and_earlier_batches_kept(spool):
+    with pytest.raises(ValueError, match="loncat"):
+        spool.receive("tenant", UPLOAD_ID, "payroll.csv", stream([0, 2]))
+    assert spool.status("tenant", UPLOAD_ID)["next_seq"] == 1
+
+
+def test_failed_stream_only_commits_written_batches(spool):
+    def broken():
+        yield 0, batch(0)
+        raise ConnectionError("putus")
+
+    with pytest.raises(ConnectionError):
+        spool.receive("tenant", UPLOAD_ID, "payroll.csv", broken())
+    assert spool.status("tenant", UPLOAD_ID)["committed_seq"] == 0
+    session_dir = spool.session_dir("tenant", UPLOAD_ID)
+    assert not [name for name in os.listdir(session_dir) if name.endswith(".tmp")]
+
+
+def test_commit_requires_all_batches(spool):
+    spool.receive("tenant", UPLOAD_ID, "payroll.csv", stream([0, 1]))
+    with pytest.raises(ValueError, match="belum lengkap"):
+        spool.load("tenant", UPLOAD_ID, 3)
+    with pytest.raises(ValueError, match="belum lengkap"):
+        spool.load("tenant", UPLOAD_ID, None)
+
+
+def test_empty_upload_cannot_commit(spool):
+    spool.receive("tenant", UPLOAD_ID, "payroll.csv", [])
+    with pytest.raises(ValueError):
+        spool.load("tenant", UPLOAD_ID, 0)
+
+
+def test_upload_id_reused_for_other_file_rejected(spool):
+    spool.receive("tenant", UPLOAD_ID, "payroll.csv", stream([0]))
+    with pytest.raises(ValueError, match="file lain"):
+        spool.receive("tenant", UPLOAD_ID, "other.csv", stream([1]))
+
+
+@pytest.mark.parametrize("upload_id", ["../../etc", "ABCDEF12", "abc", "", None])
+def test_invalid_upload_id_rejected(spool, upload_id):
+    with pytest.raises(ValueError):
+        spool.session_dir("tenant", upload_id)
+
+
+def test_discard_and_purge(spool, tmp_path):
+    spool.receive("tenant", UPLOAD_ID, "payroll.csv", stream([0]))
+    spool.discard("tenant", UPLOAD_ID)
+    assert not os.path.exists(spool.session_dir("tenant", UPLOAD_ID))
+
+    spool.receive("tenant", UPLOAD_ID, "payroll.csv", stream([0]))
+    assert spool.purge_stale() == 0
+    old = 1_000_000_000
+    os.utime(spool.session_dir("tenant", UPLOAD_ID), (old, old))
+    assert spool.purge_stale() == 1
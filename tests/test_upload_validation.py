@@ -0,0 +1,67 @@
+import pytest
+
+import upload_validation
+from macros import RAW_RELATION, RAW_RELATION_NORMALIZED
+from transform_engine import CompiledModel
+
+# SQL staging hasil render (bentuknya sama dengan cache model compiled)
+STAGING = CompiledModel(
+    "corporate.stg_corporate",
+    f'SELECT "job_title" AS job_title, CAST("salary" AS DOUBLE) AS salary, '
+    f'CAST("year" AS INTEGER) AS year FROM {RAW_RELATION}',
+    (),
+)
+NORMALIZED_STAGING = CompiledModel(
+    "hospital.stg_hospital",
+    f'SELECT "provider_id" AS provider_id, CAST("total_discharges" AS BIGINT) AS discharges '
+    f"FROM {RAW_RELATION_NORMALIZED}",
+    (),
+)
+
+
+def test_expected_columns_follow_staging_sql():
+    assert upload_validation.expected_columns([STAGING]) == ["job_title", "salary", "year"]
+
+
+def test_valid_sample():
+    report = upload_validation.validate_sample([STAGING], b"job_title,salary,year,extra\nClerk,1000.5,2013,x\n")
+    assert report["valid"]
+    assert report["errors"] == []
+    assert report["rows_checked"] == 1
+
+
+def test_missing_column_reported():
+    report = upload_validation.validate_sample([STAGING], b"job_title,year\nClerk,2013\n")
+    assert not report["valid"]
+    assert report["missing_columns"] == ["salary"]
+    assert "salary" in report["errors"][0]
+
+
+def test_value_that_fails_cast_reported():
+    report = upload_validation.validate_sample([STAGING], b"job_title,salary,year\nClerk,seribu,2013\n")
+    assert not report["valid"]
+    assert report["missing_columns"] == []
+    assert "staging" in report["errors"][0]
+
+
+def test_empty_values_pass_cast_as_null():
+    report = upload_validation.validate_sample([STAGING], b"job_title,salary,year\nClerk,,\n")
+    assert report["valid"]
+
+
+def test_header_normalized_for_normalize_names_models():
+    report = upload_validation.validate_sample(
+        [NORMALIZED_STAGING], b"Provider ID, Total Discharges \nA1,42\n"
+    )
+    assert report["valid"], report["errors"]
+
+
+def test_unreadable_csv_reported():
+    report = upload_validation.validate_sample([STAGING], b"\n")
+    assert not report["valid"]
+    assert report["errors"][0].startswith("CSV tidak bisa dibaca")
+
+
+def test_oversized_sample_rejected():
+    with pytest.raises(ValueError):
+        upload_validation.validate_sample([STAGING], b"x" * (upload_validation.SAMPLE_MAX_BYTES + 1))
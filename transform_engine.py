@@ -0,0 +1,447 @@
+import hashlib
+import logging
+import os
+import queue
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from pathlib import Path
+
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlglot import exp
+
+from macros import RAW_RELATION, RAW_RELATION_NORMALIZED, normalize_column_name
+from tenant_dataset import PARTITION_COLUMN
+
+# Mesin transformasi server. Isinya dua jalur:
+# 1. SQLMesh plan per upload (dijalankan di worker process, config dikirim per run).
+# 2. Eksekusi "langsung" (compiled): model SQLMesh di-render sekali jadi SQL biasa,
+#    di-cache, lalu dieksekusi sendiri ke file DuckDB tenant (tanpa plan & state
+#    SQLMesh). Dipakai mode compiled dan mode Arrow handoff (stream Arrow cuma
+#    bisa dibaca lewat koneksi DuckDB milik server sendiri).
+
+
+def init_worker():
+    # Dipanggil sekali di tiap worker process (spawn), biar log-nya tetap kelihatan
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - [WORKER %(process)d] - %(message)s',
+        force=True,
+    )
+
+
+def build_run_config(raw_file_path, clean_db_path, project_path="."):
+    """
+    Bikin config SQLMesh khusus untuk satu run.
+    Path Raw & DB output dikirim lewat config, BUKAN lewat os.environ,
+    jadi beberapa tenant bisa jalan barengan tanpa saling timpa.
+    """
+    from sqlmesh.core.config import Config
+    from sqlmesh.core.config.loader import load_config_from_paths
+
+    # Selalu load ulang dari config.yaml: update_with() ikut mengubah objek gateway lama
+    config = load_config_from_paths(
+        Config,
+        project_paths=[Path(project_path, "config.yaml").absolute()],
+        load_from_env=False,
+    )
+    return config.update_with({
+        "gateways": {"local": {"connection": {"type": "duckdb", "database": clean_db_path}}},
+        "variables": {"client_raw_path": raw_file_path},
+    })
+
+
+def run_plan_transform(industry_type, raw_file_path, clean_db_path, project_path="."):
+    """
+    Jalankan SQLMesh plan untuk stg/fct/agg/kpi satu industri ke satu file DuckDB tenant.
+    Didesain buat dijalankan di worker process (ProcessPoolExecutor).
+    """
+    from sqlmesh.core.context import Context
+
+    target_models = industry_model_names(industry_type)
+    logging.info(f"🎯 SQLMesh Planning for: {target_models} -> {os.path.basename(clean_db_path)}")
+
+    context = Context(paths=project_path, config=build_run_config(raw_file_path, clean_db_path, project_path))
+    try:
+        context.plan(
+            select_models=target_models,
+            auto_apply=True,       # Langsung eksekusi tanpa tanya
+            no_prompts=True,       # Jangan munculin prompt di terminal
+            include_unmodified=True # Proses ulang walaupun model gak berubah
+        )
+    finally:
+        # Tutup koneksi engine adapter + state sync. Wajib: kalau gak, worker ini terus
+        # megang lock file .duckdb-nya (proses lain gak bisa buka). Adapter yang di-reuse
+        # SQLMesh buat file yang sama bikin koneksi baru sendiri pas dipakai lagi.
+        context.close()
+    return clean_db_path
+
+
+class KeyedLocks:
+    """
+    Kumpulan lock per key (di sini: per file DuckDB output).
+    Upload ke DB yang sama antri, upload ke DB berbeda jalan paralel.
+    """
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks = {}
+        self._users = {}
+
+    @contextmanager
+    def hold(self, key):
+        with self._guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+            self._users[key] = self._users.get(key, 0) + 1
+        try:
+            with lock:
+                yield
+        finally:
+            with self._guard:
+                self._users[key] -= 1
+                if self._users[key] == 0:
+                    # Gak ada yang pakai lagi, buang biar dict-nya gak numpuk
+                    del self._users[key]
+                    del self._locks[key]
+
+
+def industry_model_names(industry_type):
+    # Urutan penting: Staging dulu, baru Fact Table, lalu layer agregat (agg -> kpi)
+    return [
+        f"{industry_type}.stg_{industry_type}",
+        f"{industry_type}.fct_{industry_type}",
+        f"{industry_type}.agg_{industry_type}",
+        f"{industry_type}.kpi_{industry_type}",
+    ]
+
+
+def _strip_catalog(node):
+    # Buang nama catalog (contoh: "main_system") biar query jalan di file DuckDB mana pun
+    if isinstance(node, exp.Table) and node.args.get("catalog"):
+        node.set("catalog", None)
+    return node
+
+
+# Satu model hasil render. unique_key = grain model (kosong = gak ada key alami yang unik).
+CompiledModel = namedtuple("CompiledModel", ["name", "sql", "unique_key"])
+
+# Kolom nama upload di fact table DB histori (mode incremental). Sama dengan kolom
+# partisi dataset tenant, jadi satu upload = satu partisi.
+UPLOAD_COLUMN = PARTITION_COLUMN
+
+
+class DuplicateKeyError(ValueError):
+    """Delta punya key (grain) dobel: load ditolak, bukan di-dedupe diam-diam."""
+
+
+def render_industry_sql(context, industry_type):
+    """
+    Render model stg/fct/agg/kpi satu industri jadi SQL DuckDB siap eksekusi.
+    client_raw_path dikosongkan, jadi sumber staging = relasi Arrow (raw_upload).
+    unique_key diambil dari `grain` di file model (semua model tetap kind FULL).
+    """
+    compiled = []
+    for model_name in industry_model_names(industry_type):
+        model = context.get_model(model_name, raise_if_missing=True)
+        query = model.render_query_or_raise(client_raw_path="").transform(_strip_catalog)
+        unique_key = tuple(key.sql(dialect="duckdb") for key in model.grains)
+        compiled.append(CompiledModel(model_name, query.sql(dialect="duckdb"), unique_key))
+    return compiled
+
+
+def is_fact_model(model):
+    # Model fact (fct_<industri>) = satu-satunya yang di-merge di mode incremental
+    return model.name.split(".")[-1].startswith("fct_")
+
+
+def merge_key(model):
+    """
+    Key merge fact table di DB histori:
+    - model punya grain (contoh corporate: row_id) -> baris dengan id sama ditimpa versi terbaru;
+    - gak punya grain (education, hospital) -> per upload: upload ulang file yang sama
+      menggantikan baris upload itu, upload lain ditambahkan (gak ada baris yang dibuang).
+    """
+    return model.unique_key or (UPLOAD_COLUMN,)
+
+
+class CompiledModelCache:
+    """
+    Cache SQL hasil render model stg/fct/agg/kpi per industri.
+    Render cuma sekali; cache baru dibuang kalau file model, macro, atau
+    config.yaml berubah (dicek dari mtime & ukuran file, murah).
+    """
+
+    def __init__(self, context, project_path="."):
+        self.context = context
+        self.project_path = project_path
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._versions = {}
+
+    def _project_signature(self, industry_type):
+        paths = [Path(self.project_path, "config.yaml")]
+        paths += sorted(Path(self.project_path, "macros").glob("*.py"))
+        paths += sorted(Path(self.project_path, "models", industry_type).glob("*.sql"))
+        signature = []
+        for path in paths:
+            try:
+                stat = path.stat()
+                signature.append((str(path), stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append((str(path), None, None))
+        return tuple(signature)
+
+    def model_version(self, industry_type):
+        """
+        Versi model = hash isi config.yaml, macro, dan file model satu industri.
+        Dihitung ulang cuma kalau mtime/ukuran salah satu file berubah.
+        """
+        with self._lock:
+            signature = self._project_signature(industry_type)
+            cached = self._versions.get(industry_type)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+
+            digest = hashlib.sha256()
+            for path, _, size in signature:
+                digest.update(path.encode("utf-8"))
+                if size is not None:
+                    digest.update(Path(path).read_bytes())
+            version = digest.hexdigest()[:16]
+            self._versions[industry_type] = (signature, version)
+            return version
+
+    def get(self, industry_type):
+        with self._lock:
+            signature = self._project_signature(industry_type)
+            entry = self._entries.get(industry_type)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+
+            if entry is not None:
+                # Ada file yang berubah: load ulang project SQLMesh dulu
+                logging.info(f"♻️ Model files changed, reloading SQLMesh project ({industry_type})")
+                self.context.load()
+                self._entries.clear()
+
+            compiled = render_industry_sql(self.context, industry_type)
+            self._entries[industry_type] = (signature, compiled)
+            logging.info(f"📦 Compiled model cache filled: {industry_type}")
+            return compiled
+
+
+def raw_relation_for(compiled):
+    # Cek model staging butuh relasi yang kolomnya dinormalisasi atau tidak
+    staging_sql = compiled[0].sql
+    if RAW_RELATION_NORMALIZED in staging_sql:
+        return RAW_RELATION_NORMALIZED
+    return RAW_RELATION
+
+
+def arrow_source_reader(schema, batches, relation):
+    """
+    Bungkus iterator batch jadi RecordBatchReader yang bisa di-scan DuckDB tanpa copy.
+    Kalau relasinya versi normalized, nama kolom diganti (zero-copy, cuma metadata).
+    """
+    if relation == RAW_RELATION_NORMALIZED:
+        seen = set()
+        names = [normalize_column_name(name, seen) for name in schema.names]
+        schema = pa.schema([field.with_name(name) for field, name in zip(schema, names)])
+        batches = (batch.rename_columns(names) for batch in batches)
+    return pa.RecordBatchReader.from_batches(schema, batches)
+
+
+def _register_raw_source(con, relation, source):
+    # Sumber bisa stream Arrow (mode arrow) atau path file Raw Parquet (mode compiled)
+    if not isinstance(source, str):
+        con.register(relation, source)
+        return
+
+    literal = exp.Literal.string(source).sql()
+    if relation == RAW_RELATION_NORMALIZED:
+        seen = set()
+        projections = ", ".join(
+            f"{exp.column(name, quoted=True).sql()} AS "
+            f"{exp.to_identifier(normalize_column_name(name, seen), quoted=True).sql()}"
+            for name in pq.read_schema(source).names
+        )
+    else:
+        projections = "*"
+    con.execute(f"CREATE OR REPLACE TEMP VIEW {relation} AS SELECT {projections} FROM read_parquet({literal})")
+
+
+def _duplicate_keys(con, relation, unique_key):
+    # Jumlah key yang muncul lebih dari sekali di relasi
+    keys = ", ".join(unique_key)
+    return con.execute(
+        f"SELECT COUNT(*) FROM (SELECT {keys} FROM {relation} GROUP BY ALL HAVING COUNT(*) > 1)"
+    ).fetchone()[0]
+
+
+def _merge_by_unique_key(con, target, sql, unique_key, require_unique=True):
+    """
+    Upsert hasil model ke tabel yang sudah ada (mode incremental).
+    Baris lama dengan key yang sama dihapus, lalu SEMUA baris delta dimasukkan.
+    Kalau `require_unique` dan di dalam delta ada key dobel, merge ditolak (DuplicateKeyError).
+    Balikin (inserted, replaced, upload lain yang barisnya ikut terganti).
+    """
+    con.execute(f"CREATE OR REPLACE TEMP TABLE __delta AS SELECT * FROM ({sql})")
+    try:
+        if require_unique:
+            duplicates = _duplicate_keys(con, "__delta", unique_key)
+            if duplicates:
+                raise DuplicateKeyError(
+                    f"{duplicates:,} key ({', '.join(unique_key)}) muncul lebih dari sekali di upload ini"
+                )
+        if tuple(unique_key) == (UPLOAD_COLUMN,):
+            # Merge per upload: cukup hapus partisi upload itu. Kalau lewat JOIN/USING,
+            # tiap baris lama cocok ke SEMUA baris delta (N x M, kuadratik).
+            replaced, touched = 0, []
+            for (name,) in con.execute(f"SELECT DISTINCT {UPLOAD_COLUMN} FROM __delta").fetchall():
+                replaced += con.execute(f"DELETE FROM {target} WHERE {UPLOAD_COLUMN} = ?", [name]).fetchone()[0]
+        else:
+            match = " AND ".join(f"{target}.{key} IS NOT DISTINCT FROM __delta.{key}" for key in unique_key)
+            touched = [
+                row[0] for row in con.execute(
+                    f"SELECT DISTINCT {target}.{UPLOAD_COLUMN} FROM {target} JOIN __delta ON {match} "
+                    f"WHERE {target}.{UPLOAD_COLUMN} IS DISTINCT FROM __delta.{UPLOAD_COLUMN}"
+                ).fetchall()
+            ]
+            replaced = con.execute(f"DELETE FROM {target} USING __delta WHERE {match}").fetchone()[0]
+        inserted = con.execute(f"INSERT INTO {target} BY NAME SELECT * FROM __delta").fetchone()[0]
+    finally:
+        con.execute("DROP TABLE IF EXISTS __delta;")
+    return inserted, replaced, touched
+
+
+def _with_upload_column(sql, upload):
+    return f"SELECT *, {exp.Literal.string(upload).sql()} AS {UPLOAD_COLUMN} FROM ({sql})"
+
+
+def run_compiled_models(clean_db_path, compiled, source, relation=None, incremental=False, upload=None):
+    """
+    Eksekusi SQL hasil render ke file DuckDB tenant dalam satu transaksi.
+    `source` = RecordBatchReader atau path Raw Parquet.
+    Kalau `incremental=True`, fact table dikasih kolom `upload` lalu di-merge ke tabel
+    yang sudah ada (lihat merge_key), jadi biayanya sebanding dengan delta, bukan
+    seluruh histori. Kalau ada yang gagal, semua di-rollback (gak ada tabel setengah jadi).
+    Balikin ringkasan: uploads = partisi upload yang isinya berubah.
+    """
+    if incremental and not upload:
+        raise ValueError("Mode incremental butuh nama upload")
+    relation = relation or raw_relation_for(compiled)
+    summary = {"clean_db_path": clean_db_path, "inserted": 0, "replaced": 0, "uploads": [upload] if upload else []}
+    with duckdb.connect(clean_db_path) as con:
+        _register_raw_source(con, relation, source)
+        con.execute("BEGIN TRANSACTION;")
+        try:
+            for model in compiled:
+                schema_name, table_name = model.name.split(".")
+                target = f'"{schema_name}"."{table_name}"'
+                con.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema_name}";')
+                # DB hasil SQLMesh plan nyimpen model sebagai VIEW, jadi di-drop dulu
+                existing = con.execute(
+                    "SELECT table_type FROM information_schema.tables WHERE table_schema = ? AND table_name = ?",
+                    [schema_name, table_name],
+                ).fetchone()
+                if existing and existing[0] == "VIEW":
+                    con.execute(f"DROP VIEW {target};")
+                    existing = None
+
+                sql = model.sql
+                if incremental and is_fact_model(model):
+                    sql = _with_upload_column(sql, upload)
+                    if existing:
+                        # DB histori lama (sebelum ada kolom upload): tambahin kolomnya dulu
+                        con.execute(f"ALTER TABLE {target} ADD COLUMN IF NOT EXISTS {UPLOAD_COLUMN} VARCHAR")
+                        inserted, replaced, touched = _merge_by_unique_key(
+                            con, target, sql, merge_key(model), require_unique=bool(model.unique_key)
+                        )
+                        summary.update(inserted=inserted, replaced=replaced)
+                        summary["uploads"] += [name for name in touched if name and name not in summary["uploads"]]
+                        logging.info(f"🔁 Model merged (incremental): {model.name} ({inserted:,} rows, {replaced:,} replaced)")
+                        continue
+                con.execute(f"CREATE OR REPLACE TABLE {target} AS {sql}")
+                if incremental and is_fact_model(model) and model.unique_key:
+                    # Upload pertama ke tabel histori: key dobel ditolak (di-rollback), bukan di-dedupe
+                    duplicates = _duplicate_keys(con, target, model.unique_key)
+                    if duplicates:
+                        raise DuplicateKeyError(
+                            f"{duplicates:,} key ({', '.join(model.unique_key)}) muncul lebih dari sekali di upload ini"
+                        )
+                logging.info(f"⚡ Model built (direct): {model.name}")
+            con.execute("COMMIT;")
+        except Exception:
+            con.execute("ROLLBACK;")
+            raise
+    return summary
+
+
+class RawZoneWriter:
+    """
+    Penulis Raw Zone di background thread.
+    Batch dikirim lewat antrian terbatas (bounded), jadi request upload gak
+    nunggu disk, tapi RAM juga gak bengkak kalau disk-nya lagi lambat.
+    """
+
+    _DONE = object()
+
+    def __init__(self, raw_file_path, schema, compression="snappy", max_pending_batches=8):
+        self.raw_file_path = raw_file_path
+        self.schema = schema
+        self.compression = compression
+        self.error = None
+        self._queue = queue.Queue(maxsize=max_pending_batches)
+        self._aborted = False
+        self._thread = threading.Thread(target=self._run, name="raw-zone-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, batch):
+        # Kalau penulis sudah error, batch gak usah diantrikan lagi
+        if self.error is None:
+            self._queue.put(batch)
+
+    def close(self):
+        # Stream selesai: file .part di-rename setelah semua batch tertulis
+        self._queue.put(self._DONE)
+
+    def abort(self):
+        # Upload gagal: buang file .part
+        self._aborted = True
+        self._queue.put(self._DONE)
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _run(self):
+        part_path = self.raw_file_path + ".part"
+        raw_writer = None
+        finished = False
+        try:
+            raw_writer = pq.ParquetWriter(part_path, self.schema, compression=self.compression)
+            while True:
+                batch = self._queue.get()
+                if batch is self._DONE:
+                    finished = True
+                    break
+                if not self._aborted:
+                    raw_writer.write_batch(batch)
+            raw_writer.close()
+            raw_writer = None
+            if self._aborted:
+                os.remove(part_path)
+            else:
+                os.replace(part_path, self.raw_file_path)
+                logging.info(f"💾 File Raw Tersimpan (background): {os.path.basename(self.raw_file_path)}")
+        except Exception as e:
+            self.error = e
+            logging.error(f"⚠️ Gagal menulis Raw Zone {self.raw_file_path}: {e}")
+            # Kuras antrian sampai sinyal selesai biar producer gak nyangkut nunggu slot kosong
+            while not finished and self._queue.get() is not self._DONE:
+                pass
+            if raw_writer is not None:
+                raw_writer.close()
+            if os.path.exists(part_path):
+                os.remove(part_path)
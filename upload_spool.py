@@ -0,0 +1,166 @@
+import json
+import logging
+import os
+import re
+import shutil
+import time
+
+import pyarrow as pa
+
+from transform_engine import KeyedLocks
+
+# Spool untuk upload resumable (per batch).
+# Client ngirim batch dengan upload_id + nomor urut (seq). Tiap batch langsung
+# disimpan jadi satu file Arrow IPC di storage/<client>/Uploads/<upload_id>/,
+# jadi kalau koneksi putus, client cukup kirim ulang batch yang belum masuk.
+# Transform baru jalan setelah client kirim action 'commit_upload'.
+
+UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{8,64}$")
+SESSION_FILENAME = "session.json"
+
+
+def _fsync(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_dir(path):
+    # Biar rename-nya sendiri ikut tahan crash. Windows gak bisa buka folder, dilewati.
+    if os.name != "nt":
+        _fsync(path)
+
+
+class UploadSpool:
+
+    def __init__(self, storage_root="storage", max_age_hours=48):
+        self.storage_root = storage_root
+        self.max_age_seconds = max_age_hours * 3600
+        self.locks = KeyedLocks()
+
+    def session_dir(self, client_id, upload_id):
+        # upload_id dipakai jadi nama folder, jadi formatnya dibatasi (anti path traversal)
+        if not upload_id or not UPLOAD_ID_PATTERN.match(upload_id):
+            raise ValueError("upload_id tidak valid (harus hex 8-64 karakter)")
+        return os.path.join(self.storage_root, client_id, "Uploads", upload_id)
+
+    def _batch_path(self, session_dir, seq):
+        return os.path.join(session_dir, f"{seq:08d}.arrow")
+
+    def _next_seq(self, session_dir):
+        # Batch dianggap committed kalau urutannya nyambung dari 0 tanpa bolong
+        seq = 0
+        while os.path.exists(self._batch_path(session_dir, seq)):
+            seq += 1
+        return seq
+
+    def _read_session(self, session_dir):
+        try:
+            with open(os.path.join(session_dir, SESSION_FILENAME), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def status(self, client_id, upload_id):
+        session_dir = self.session_dir(client_id, upload_id)
+        with self.locks.hold(session_dir):
+            session = self._read_session(session_dir) or {}
+            next_seq = self._next_seq(session_dir)
+        return {
+            "upload_id": upload_id,
+            "filename": session.get("filename"),
+            "next_seq": next_seq,
+            "committed_seq": next_seq - 1,  # -1 = belum ada batch yang masuk
+        }
+
+    def receive(self, client_id, upload_id, filename, chunks, upload_format="arrow"):
+        """
+        Simpan batch (seq, RecordBatch) satu per satu.
+        Batch yang sudah pernah masuk dilewati (aman buat retry), seq yang loncat ditolak.
+        Balikin next_seq setelah stream selesai.
+        """
+        session_dir = self.session_dir(client_id, upload_id)
+        with self.locks.hold(session_dir):
+            os.makedirs(session_dir, exist_ok=True)
+            session = self._read_session(session_dir)
+            if session is None:
+                session = {"filename": filename, "format": upload_format, "created_at": time.time()}
+                session_path = os.path.join(session_dir, SESSION_FILENAME)
+                with open(session_path + ".tmp", "w") as f:
+                    json.dump(session, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(session_path + ".tmp", session_path)
+                _fsync_dir(session_dir)
+            elif session["filename"] != filename:
+                raise ValueError(f"upload_id {upload_id} dipakai untuk file lain ({session['filename']})")
+
+            next_seq = self._next_seq(session_dir)
+            for seq, batch in chunks:
+                if seq < next_seq:
+                    continue  # Sudah tersimpan dari percobaan sebelumnya
+                if seq > next_seq:
+                    raise ValueError(f"Batch loncat: diharapkan seq {next_seq}, diterima {seq}")
+                # Tulis ke .tmp, fsync, lalu rename (+ fsync folder): seq baru dianggap
+                # masuk setelah file batch-nya utuh di disk, jadi status yang dikasih ke
+                # client gak pernah lebih maju dari yang beneran selamat kalau server crash
+                batch_path = self._batch_path(session_dir, seq)
+                with pa.OSFile(batch_path + ".tmp", "wb") as sink:
+                    with pa.ipc.new_file(sink, batch.schema) as ipc_writer:
+                        ipc_writer.write_batch(batch)
+                _fsync(batch_path + ".tmp")
+                os.replace(batch_path + ".tmp", batch_path)
+                _fsync_dir(session_dir)
+                next_seq += 1
+        return next_seq
+
+    def load(self, client_id, upload_id, total_batches):
+        """
+        Cek semua batch 0..total_batches-1 sudah lengkap, lalu balikin
+        (session, schema, generator batch). Batch dibaca lewat memory map (tanpa copy).
+        """
+        session_dir = self.session_dir(client_id, upload_id)
+        session = self._read_session(session_dir)
+        if session is None:
+            raise ValueError(f"Upload {upload_id} tidak ditemukan")
+        next_seq = self._next_seq(session_dir)
+        if total_batches is None or next_seq != int(total_batches) or next_seq == 0:
+            raise ValueError(
+                f"Upload belum lengkap: {next_seq} batch tersimpan, client bilang {total_batches}"
+            )
+
+        def open_batch_file(seq):
+            # Map-nya ikut ditutup otomatis begitu batch-nya gak dipakai lagi
+            return pa.ipc.open_file(pa.memory_map(self._batch_path(session_dir, seq)))
+
+        def iter_batches():
+            for seq in range(next_seq):
+                ipc_reader = open_batch_file(seq)
+                for i in range(ipc_reader.num_record_batches):
+                    yield ipc_reader.get_batch(i)
+
+        return session, open_batch_file(0).schema, iter_batches()
+
+    def discard(self, client_id, upload_id):
+        shutil.rmtree(self.session_dir(client_id, upload_id), ignore_errors=True)
+
+    def purge_stale(self):
+        # Buang sesi upload yang ditinggal (gak pernah di-commit) lebih dari max_age
+        now = time.time()
+        purged = 0
+        if not os.path.isdir(self.storage_root):
+            return purged
+        for client_id in os.listdir(self.storage_root):
+            uploads_dir = os.path.join(self.storage_root, client_id, "Uploads")
+            if not os.path.isdir(uploads_dir):
+                continue
+            for upload_id in os.listdir(uploads_dir):
+                session_dir = os.path.join(uploads_dir, upload_id)
+                if now - os.path.getmtime(session_dir) > self.max_age_seconds:
+                    shutil.rmtree(session_dir, ignore_errors=True)
+                    purged += 1
+        if purged:
+            logging.info(f"🧹 {purged} sesi upload kadaluarsa dihapus")
+        return purged
@@ -0,0 +1,78 @@
+import duckdb
+import pyarrow as pa
+from sqlglot import exp, parse_one
+
+import csv_ingest
+import transform_engine
+from macros import RAW_RELATION_NORMALIZED, normalize_column_name
+
+# Validasi sebelum upload (action validate_upload): client cuma ngirim header +
+# beberapa baris pertama CSV, server ngecek pakai SQL model staging yang sudah
+# di-render (cache model compiled). Jadi daftar kolom & aturan CAST-nya selalu
+# sama persis dengan yang nanti dijalankan transform, gak ada daftar kedua yang bisa basi.
+
+# Batas ukuran sampel yang diterima server (header + baris contoh)
+SAMPLE_MAX_BYTES = 1 << 20
+
+
+def expected_columns(compiled):
+    """
+    Kolom mentah yang dibaca model staging (urutan sesuai SQL).
+    Untuk model normalize_names, namanya versi normalisasi (contoh: 'total_discharges').
+    """
+    staging = parse_one(compiled[0].sql, read="duckdb")
+    columns = []
+    for column in staging.find_all(exp.Column):
+        if column.name not in columns:
+            columns.append(column.name)
+    return columns
+
+
+def _sample_source(sample):
+    # Sampel diparsing persis kayak upload format "csv" (Arrow CSV reader, semua kolom string)
+    batch = pa.record_batch([pa.array([sample], pa.binary())], schema=csv_ingest.RAW_CHUNK_SCHEMA)
+    schema, batches = csv_ingest.parse_csv_chunks([batch])
+    return pa.Table.from_batches(list(batches), schema=schema)
+
+
+def validate_sample(compiled, sample):
+    """
+    Cek header + baris contoh (bytes CSV) terhadap model staging satu industri.
+    Balikin dict: valid, errors, expected_columns, missing_columns, rows_checked.
+    """
+    if len(sample) > SAMPLE_MAX_BYTES:
+        raise ValueError(f"Sampel kegedean (maks {SAMPLE_MAX_BYTES:,} bytes)")
+
+    report = {"valid": False, "errors": [], "expected_columns": expected_columns(compiled),
+              "missing_columns": [], "rows_checked": 0}
+    try:
+        table = _sample_source(sample)
+    except (ValueError, pa.ArrowInvalid) as parse_err:
+        report["errors"].append(f"CSV tidak bisa dibaca: {parse_err}")
+        return report
+
+    # Nama header dibandingkan dalam bentuk yang dibaca model (normalisasi kalau perlu)
+    relation = transform_engine.raw_relation_for(compiled)
+    header = table.column_names
+    if relation == RAW_RELATION_NORMALIZED:
+        seen = set()
+        header = [normalize_column_name(name, seen) for name in header]
+    report["missing_columns"] = [name for name in report["expected_columns"] if name not in header]
+    if report["missing_columns"]:
+        report["errors"].append(f"Kolom tidak ditemukan: {', '.join(report['missing_columns'])}")
+        return report
+
+    # Cast check: SQL staging dijalankan beneran ke sampel (DuckDB in-memory).
+    # Pakai CREATE TABLE biar semua CAST dievaluasi, gak dipangkas optimizer.
+    report["rows_checked"] = table.num_rows
+    source = transform_engine.arrow_source_reader(table.schema, table.to_batches(), relation)
+    with duckdb.connect() as con:
+        con.register(relation, source)
+        try:
+            con.execute(f"CREATE TEMP TABLE staging_sample AS {compiled[0].sql}")
+        except duckdb.Error as cast_err:
+            report["errors"].append(f"Data tidak cocok dengan model staging: {cast_err}")
+            return report
+
+    report["valid"] = True
+    return report
@@ -1,7 +1,12 @@
 import streamlit as st
+import io
+import os
+import tempfile
 import time
 import pandas as pd
-from backend_client import PayrollClient 
+import pyarrow.csv as pa_csv
+import pyarrow.flight as flight
+from backend_client import PayrollClient, ResponseCache
 import altair as alt
 
 # --- Konfigurasi Halaman Dasar ---
@@ -43,10 +48,35 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+SERVER_LOCATION = "grpc://localhost:9999"
+
+# st.download_button nyimpen seluruh isi file di memory proses Streamlit (gak bisa di-stream),
+# jadi file export yang boleh diunduh lewat dashboard dibatasi ukurannya
+EXPORT_DOWNLOAD_MAX_BYTES = int(os.environ.get("PAYROLL_EXPORT_DOWNLOAD_MAX_MB", "200")) << 20
+
+# Koneksi Flight & cache respons dibikin sekali per proses Streamlit,
+# dipakai bareng semua rerun & sesi (gak connect ulang tiap klik)
+@st.cache_resource
+def get_flight_connection(location):
+    return flight.FlightClient(location)
+
+@st.cache_resource
+def get_response_cache():
+    # File list & laporan dicek ulang ke server paling sering tiap 30 detik (via ETag)
+    return ResponseCache(ttl_seconds=30)
+
 # --- Inisialisasi Koneksi ke Server ---
 # Coba connect ke backend gRPC, kalau gagal langsung stop aplikasi
 try:
-    grpc_client = PayrollClient("grpc://localhost:9999")
+    # Session token disimpan di session_state, jadi login ke server cukup sekali per sesi browser
+    if 'auth_sessions' not in st.session_state:
+        st.session_state['auth_sessions'] = {}
+    grpc_client = PayrollClient(
+        SERVER_LOCATION,
+        session_store=st.session_state['auth_sessions'],
+        connection=get_flight_connection(SERVER_LOCATION),
+        response_cache=get_response_cache()
+    )
 except Exception as e:
     st.error(f"❌ Gagal connect ke Server gRPC: {e}")
     st.info("💡 Pastikan server.py sudah running di port 9999")
@@ -69,6 +99,25 @@ if 'summary_data' not in st.session_state:
 if 'show_summary' not in st.session_state:
     st.session_state['show_summary'] = False
 
+# Insights tenant yang sudah dihitung server (KPI + top-N posisi, action get_insights)
+if 'summary_insights' not in st.session_state:
+    st.session_state['summary_insights'] = None
+
+if 'last_job' not in st.session_state:
+    st.session_state['last_job'] = None
+
+# Info antrian server terakhir (diisi pas klik "Cek Status")
+if 'job_queue' not in st.session_state:
+    st.session_state['job_queue'] = None
+
+# Upload yang putus di tengah jalan: (nama file, ukuran) -> upload_id buat resume
+if 'pending_uploads' not in st.session_state:
+    st.session_state['pending_uploads'] = {}
+
+# Hasil validate_upload per file (nama:ukuran) -> (success, report)
+if 'upload_checks' not in st.session_state:
+    st.session_state['upload_checks'] = {}
+
 # --- Halaman Login ---
 # Kalau user belum login, tampilkan form login
 if not st.session_state['logged_in']:
@@ -89,8 +138,8 @@ if not st.session_state['logged_in']:
                 st.warning("⚠️ Harap isi Client ID dan Password!")
             else:
                 with st.spinner("Memverifikasi Kredensial..."):
-                    # Cek password ke server
-                    success, response = grpc_client.get_file_list(client_id, password)
+                    # Cek password ke server (bukan dari response cache)
+                    success = grpc_client.authenticate(client_id, password)
                 
                 if success:
                     # Simpan kredensial di session dan set status login
@@ -124,10 +173,10 @@ else:
             **Bagaimana Sistem Bekerja:**
             
             Ketika Anda upload file:
-            1. 📤 File dikirim ke server
-            2. ⏳ Jika ada client lain sedang proses, Anda akan antri
-            3. 🔄 Server memproses satu request per waktu
-            4. ✅ Anda mendapat notifikasi saat selesai
+            1. 📤 File dikirim ke server & disimpan di Raw Zone
+            2. 🎫 (Mode async) Anda langsung dapat Job ID, tidak perlu menunggu
+            3. 🔄 Server memproses antrian job di background
+            4. ✅ Cek status job di tab Ingest Data sampai "done"
             
             **Estimasi Waktu:**
             - File < 10MB: ~30-60 detik
@@ -148,12 +197,20 @@ else:
         # Dropdown buat milih database DuckDB
         if has_files:
             clean_files = file_data.get('clean', [])
+            # Layout dataset: ada pilihan gabungan semua upload di paling atas
+            dataset = file_data.get('dataset')
+            if dataset:
+                clean_files = [dataset['target_file']] + clean_files
             
             if clean_files:
                 selected = st.selectbox(
                     "Pilih Database:", 
                     clean_files, 
                     index=0,
+                    format_func=lambda name: (
+                        f"🗂️ Semua Upload ({len(dataset['uploads'])} file)"
+                        if dataset and name == dataset['target_file'] else name
+                    ),
                     help="Pilih file DuckDB yang sudah diproses"
                 )
                 st.session_state['selected_db_file'] = selected
@@ -162,6 +219,19 @@ else:
                 st.info("Upload file CSV di tab 'Ingest Data'")
                 st.session_state['selected_db_file'] = None
 
+            # Isi dataset gabungan (manifest): kontribusi tiap upload
+            if dataset:
+                with st.expander("🗂️ Manifest Dataset"):
+                    st.dataframe(
+                        pd.DataFrame([
+                            {"upload": name, "rows": entry["rows"], "source": entry.get("source_file"),
+                             "published_at": entry["published_at"]}
+                            for name, entry in dataset['uploads'].items()
+                        ]),
+                        hide_index=True,
+                        use_container_width=True
+                    )
+
             # List file mentah (raw) buat audit
             with st.expander("🔍 Audit Raw Files"):
                 raw_files = file_data.get('raw', [])
@@ -174,12 +244,14 @@ else:
             st.error("❌ Gagal memuat daftar file")
         
         if st.button("🔄 Refresh Data", use_container_width=True):
+            grpc_client.refresh(st.session_state['creds']['id'])
             st.rerun()
             
         st.markdown("---")
         
         # Tombol Logout
         if st.button("🚪 Logout", use_container_width=True, type="secondary"):
+            grpc_client.logout(st.session_state['creds']['id'])
             st.session_state['logged_in'] = False
             st.session_state['selected_db_file'] = None
             st.rerun()
@@ -196,8 +268,8 @@ else:
         st.info("""
         📋 **Upload file CSV mentah (Raw) untuk diproses pipeline.**
         
-        ℹ️ *Sistem menggunakan queue mechanism: Jika ada client lain yang sedang memproses, 
-        request Anda akan menunggu hingga proses sebelumnya selesai. Ini memastikan data integrity.*
+        ℹ️ *Sistem menggunakan queue mechanism: Upload ke file yang sama diproses bergantian. 
+        Di mode async, upload langsung dapat Job ID dan transformasi berjalan di background.*
         """)
         
         # Widget Upload File
@@ -227,7 +299,7 @@ else:
                 st.info("""
                 💡 **Tips untuk File Besar:**
                 - Proses akan memakan waktu lebih lama (~{:.0f} menit)
-                - Pastikan koneksi stabil
+                - Kalau koneksi putus, upload bisa dilanjutkan (gak mulai dari nol)
                 - Pertimbangkan split per periode jika data historical
                 """.format(file_size_mb / 100))
             elif file_size_mb > 100:
@@ -242,33 +314,120 @@ else:
                 except Exception as e:
                     st.error(f"Gagal preview: {e}")
             
-            st.success(f"✅ File siap dikirim ke Raw Zone")
+            # Validasi ke server (header + sampel baris) sebelum file dikirim penuh.
+            # Hasilnya disimpan per file, jadi rerun Streamlit gak ngecek ulang.
+            check_key = f"{uploaded_file.name}:{uploaded_file.size}"
+            if check_key not in st.session_state['upload_checks']:
+                with st.spinner("🧪 Mengecek header & sampel data ke server..."):
+                    st.session_state['upload_checks'][check_key] = grpc_client.validate_upload(
+                        uploaded_file,
+                        st.session_state['creds']['id'],
+                        st.session_state['creds']['pass']
+                    )
+            check_ok, check = st.session_state['upload_checks'][check_key]
+            
+            upload_blocked = False
+            if not check_ok:
+                # Gagal ngecek (mis. koneksi): upload tetap boleh, server tetap validasi sendiri
+                st.warning(f"⚠️ Validasi awal tidak bisa dijalankan: {check}")
+            elif not check['valid']:
+                upload_blocked = True
+                st.error("❌ File ditolak sebelum upload:\n\n" + "\n\n".join(check['errors']))
+                if check.get('expected_columns'):
+                    with st.expander("📋 Kolom yang dibutuhkan model staging"):
+                        st.write(check['expected_columns'])
+            else:
+                st.success(f"✅ File siap dikirim ke Raw Zone")
             
             # Tombol Eksekusi Upload
-            if st.button("🚀 Proses & Bersihkan Data", type="primary", use_container_width=True):
+            if st.button("🚀 Proses & Bersihkan Data", type="primary", use_container_width=True, disabled=upload_blocked):
                 uploaded_file.seek(0)
                 
                 spinner_msg = "🔄 Streaming data ke gRPC Server..."
                 if file_size_mb > 100:
                     spinner_msg = f"⏳ Uploading {file_size_mb:.0f}MB... Mohon tunggu, jangan refresh browser!"
                 
+                # Kalau upload file ini sebelumnya putus, lanjutkan pakai upload_id yang sama
+                upload_key = f"{uploaded_file.name}:{uploaded_file.size}"
+                resume_id = st.session_state['pending_uploads'].get(upload_key)
+                if resume_id:
+                    spinner_msg = "🔁 Melanjutkan upload sebelumnya (batch yang sudah terkirim dilewati)..."
+                
                 with st.spinner(spinner_msg):
                     # Kirim file ke backend
                     success, msg = grpc_client.upload_csv(
                         uploaded_file, 
                         st.session_state['creds']['id'],
-                        st.session_state['creds']['pass']
+                        st.session_state['creds']['pass'],
+                        upload_id=resume_id
                     )
                 
+                if grpc_client.last_upload_id:
+                    st.session_state['pending_uploads'][upload_key] = grpc_client.last_upload_id
+                else:
+                    st.session_state['pending_uploads'].pop(upload_key, None)
+                
                 if success:
                     st.balloons()
                     st.success(msg)
+                    # Simpan job id (mode async) biar bisa dicek statusnya
+                    st.session_state['last_job'] = grpc_client.last_job
+                    st.session_state['job_queue'] = None
                     time.sleep(2)
                     st.rerun()
                 else:
                     st.error(msg)
+                    if upload_key in st.session_state['pending_uploads']:
+                        st.info("🔁 Klik tombol proses lagi untuk melanjutkan upload dari batch terakhir yang tersimpan.")
                     st.info("💡 Periksa log server untuk detail error")
 
+        # Panel status job ingestion (cuma muncul kalau server mode async)
+        last_job = st.session_state.get('last_job')
+        if last_job:
+            st.markdown("---")
+            st.markdown(f"### 🎫 Job Terakhir: `{last_job['job_id']}`")
+            if st.button("🔄 Cek Status", key="refresh_job"):
+                ok, job = grpc_client.get_job_status(
+                    st.session_state['creds']['id'],
+                    st.session_state['creds']['pass'],
+                    last_job['job_id']
+                )
+                if ok:
+                    st.session_state['last_job'] = job
+                    last_job = job
+                else:
+                    st.error(job)
+                # Info antrian server ikut diambil di sini saja (bukan tiap rerun halaman)
+                ok, jobs_info = grpc_client.list_jobs(
+                    st.session_state['creds']['id'],
+                    st.session_state['creds']['pass']
+                )
+                if ok:
+                    st.session_state['job_queue'] = jobs_info.get('scheduler', {})
+
+            stage = last_job.get('stage')
+            job_col1, job_col2, job_col3 = st.columns(3)
+            with job_col1:
+                st.metric("Stage", stage)
+            with job_col2:
+                st.metric("Posisi Antrian", last_job.get('queue_position') or "-")
+            with job_col3:
+                st.metric("Waktu Transform", f"{last_job['transform_seconds']:.1f}s" if last_job.get('transform_seconds') else "-")
+
+            if stage == "done":
+                st.success(f"✅ Data siap dianalisis: {last_job.get('clean_file')}")
+                if last_job.get('warning'):
+                    st.warning(f"⚠️ {last_job['warning']}")
+            elif stage == "failed":
+                st.error(f"❌ Job gagal: {last_job.get('error')}")
+
+            scheduler = st.session_state.get('job_queue')
+            if scheduler:
+                st.caption(
+                    f"📬 Antrian server: {scheduler.get('queue_depth', 0)} job menunggu, "
+                    f"{scheduler.get('running', 0)} sedang diproses"
+                )
+
     # --- TAB 2: Laporan & Visualisasi ---
     with tab2:
         target_file = st.session_state.get('selected_db_file')
@@ -300,45 +459,46 @@ else:
             # Proses Tarik Data (Aggregasi)
             if refresh_btn:
                 with st.spinner('🔍 Querying DuckDB & Aggregating Data...'):
-                    # Request data summary ke backend
-                    success, data = grpc_client.get_summary_report(
+                    # KPI, top-10 posisi & statistik dihitung server dalam satu response Arrow
+                    success, insights = grpc_client.get_insights(
                         st.session_state['creds']['id'],
                         st.session_state['creds']['pass'],
                         target_file
                     )
                 
                 if success:
-                    st.session_state['summary_data'] = data
+                    st.session_state['summary_insights'] = insights
+                    # Rincian per posisi tetap Arrow Table (langsung ke st.dataframe)
+                    detail_ok, detail = grpc_client.get_summary_report(
+                        st.session_state['creds']['id'],
+                        st.session_state['creds']['pass'],
+                        target_file,
+                        as_arrow=True
+                    )
+                    st.session_state['summary_data'] = detail if detail_ok else insights['top']
                     st.session_state['show_summary'] = True
                 else:
                     st.session_state['show_summary'] = False
-                    st.error(f"❌ Gagal mengambil data: {data}")
+                    st.error(f"❌ Gagal mengambil data: {insights}")
                     st.info("💡 Periksa koneksi server atau coba refresh")
             
             # Tampilkan Hasil Laporan
-            if st.session_state['show_summary'] and st.session_state['summary_data'] is not None:
+            if st.session_state['show_summary'] and st.session_state['summary_insights'] is not None:
                 data = st.session_state['summary_data']
+                insights = st.session_state['summary_insights']
                 
-                if data.empty:
+                if data.num_rows == 0:
                     st.warning("⚠️ Data kosong atau belum ada transaksi")
                 else:
-                    # Normalisasi nama kolom (biar aman kalau ada spasi/huruf besar)
-                    data.columns = data.columns.str.lower().str.strip().str.replace(' ', '_')
-                    
-                    # Pastikan tipe data angka benar
-                    numeric_cols = ['total_budget', 'total_employee']
-                    for col in numeric_cols:
-                        if col in data.columns:
-                            data[col] = pd.to_numeric(data[col], errors='coerce')
+                    top_data = insights['top']
+                    kpis = insights['kpis']
                     
-                    data = data.dropna(subset=['job_title', 'total_budget'])
-                    
-                    if data.empty:
-                        st.error("❌ Data tidak valid setelah preprocessing")
+                    if top_data.num_rows == 0:
+                        st.error("❌ Data tidak valid (job_title / total_budget kosong semua)")
                     else:
                         # --- KPI Cards (Angka Penting) ---
-                        total_budget = data['total_budget'].sum() if 'total_budget' in data.columns else 0
-                        total_emp = data['total_employee'].sum() if 'total_employee' in data.columns else 0
+                        total_budget = kpis['total_budget'] or 0
+                        total_emp = int(kpis['total_employee'] or 0)
                         avg_salary = total_budget / total_emp if total_emp > 0 else 0
 
                         m1, m2, m3 = st.columns(3)
@@ -376,80 +536,65 @@ else:
                             st.subheader("📊 Top 10 Posisi Termahal")
                             
                             with st.expander("🔍 Debug Info - Kolom Data"):
-                                st.write("Kolom yang tersedia:", list(data.columns))
+                                st.write("Kolom yang tersedia:", data.column_names)
                                 st.write("Sample data (3 baris pertama):")
-                                st.dataframe(data.head(3))
+                                st.dataframe(data.slice(0, 3))
                             
-                            required_cols = ['job_title', 'total_budget']
-                            missing_cols = [col for col in required_cols if col not in data.columns]
+                            st.caption(f"Menampilkan {top_data.num_rows} posisi dari total {int(kpis['total_positions']):,} posisi")
                             
-                            if missing_cols:
-                                st.error(f"❌ Kolom tidak ditemukan: {missing_cols}")
-                                st.info("💡 Pastikan server query menghasilkan kolom: job_title, total_budget, total_employee")
-                            else:
-                                top_data = data.sort_values(
-                                    by='total_budget', 
-                                    ascending=False
-                                ).head(10)
-                                
-                                if top_data.empty:
-                                    st.warning("⚠️ Tidak ada data untuk ditampilkan")
-                                else:
-                                    st.caption(f"Menampilkan {len(top_data)} posisi dari total {len(data)} posisi")
-                                    
-                                    # Bikin Chart pakai Altair
-                                    chart = alt.Chart(top_data).mark_bar(
-                                        cornerRadius=5,
-                                        size=30
-                                    ).encode(
-                                        x=alt.X(
-                                            'total_budget:Q',
-                                            title='Total Budget',
-                                            axis=alt.Axis(
-                                                format='$,.0f',
-                                                labelColor='white',
-                                                titleColor='white'
-                                            )
-                                        ),
-                                        y=alt.Y(
-                                            'job_title:N',
-                                            sort='-x',
-                                            title='Posisi',
-                                            axis=alt.Axis(
-                                                labelColor='white',
-                                                titleColor='white',
-                                                labelLimit=200
-                                            )
-                                        ),
-                                        color=alt.Color(
-                                            'total_budget:Q',
-                                            scale=alt.Scale(
-                                                scheme='turbo',
-                                                domain=[
-                                                    top_data['total_budget'].min(),
-                                                    top_data['total_budget'].max()
-                                                ]
-                                            ),
-                                            legend=None
-                                        ),
-                                        tooltip=[
-                                            alt.Tooltip('job_title:N', title='Posisi'),
-                                            alt.Tooltip('total_budget:Q', title='Budget', format='$,.0f'),
-                                            alt.Tooltip('total_employee:Q', title='Karyawan', format=',d')
-                                        ]
-                                    ).properties(
-                                        height=450,
-                                        background='#0E1117'
-                                    ).configure_axis(
-                                        labelFontSize=12,
-                                        titleFontSize=14,
-                                        gridColor='#262730',
-                                        domainColor='white'
-                                    ).configure_view(
-                                        strokeWidth=0
+                            # Bikin Chart pakai Altair (top-N sudah diurutkan & dipotong server)
+                            chart = alt.Chart(top_data).mark_bar(
+                                cornerRadius=5,
+                                size=30
+                            ).encode(
+                                x=alt.X(
+                                    'total_budget:Q',
+                                    title='Total Budget',
+                                    axis=alt.Axis(
+                                        format='$,.0f',
+                                        labelColor='white',
+                                        titleColor='white'
                                     )
-                                    
-                                    st.altair_chart(chart, use_container_width=True)
+                                ),
+                                y=alt.Y(
+                                    'job_title:N',
+                                    sort='-x',
+                                    title='Posisi',
+                                    axis=alt.Axis(
+                                        labelColor='white',
+                                        titleColor='white',
+                                        labelLimit=200
+                                    )
+                                ),
+                                color=alt.Color(
+                                    'total_budget:Q',
+                                    scale=alt.Scale(
+                                        scheme='turbo',
+                                        domain=[
+                                            top_data['total_budget'][-1].as_py(),
+                                            top_data['total_budget'][0].as_py()
+                                        ]
+                                    ),
+                                    legend=None
+                                ),
+                                tooltip=[
+                                    alt.Tooltip('job_title:N', title='Posisi'),
+                                    alt.Tooltip('total_budget:Q', title='Budget', format='$,.0f'),
+                                    alt.Tooltip('total_employee:Q', title='Karyawan', format=',d')
+                                ]
+                            ).properties(
+                                height=450,
+                                background='#0E1117'
+                            ).configure_axis(
+                                labelFontSize=12,
+                                titleFontSize=14,
+                                gridColor='#262730',
+                                domainColor='white'
+                            ).configure_view(
+                                strokeWidth=0
+                            )
+                            
+                            st.altair_chart(chart, use_container_width=True)
                         
                         with col_table:
                             st.subheader("📋 Rincian Data")
@@ -463,7 +608,7 @@ else:
                                         "Budget Consumption",
                                         format="$%f",
                                         min_value=0,
-                                        max_value=int(data['total_budget'].max()) if not data.empty else 100,
+                                        max_value=int(kpis['max_job_budget'] or 100),
                                     ),
                                     "total_employee": st.column_config.NumberColumn(
                                         "Staff",
@@ -472,11 +617,12 @@ else:
                                 }
                             )
                             
-                            # Tombol Download Summary CSV
-                            csv_export = data.to_csv(index=False).encode('utf-8')
+                            # Tombol Download Summary CSV (ditulis pyarrow langsung dari Arrow Table)
+                            csv_buffer = io.BytesIO()
+                            pa_csv.write_csv(data, csv_buffer)
                             st.download_button(
                                 label="📥 Download CSV",
-                                data=csv_export,
+                                data=csv_buffer.getvalue(),
                                 file_name=f"report_{target_file.replace('.duckdb', '')}.csv",
                                 mime="text/csv",
                                 use_container_width=True
@@ -487,80 +633,121 @@ else:
                             stats_col1, stats_col2 = st.columns(2)
                             
                             with stats_col1:
-                                st.metric("Total Posisi", len(data))
-                                st.metric("Budget Tertinggi", f"${data['total_budget'].max():,.0f}")
+                                st.metric("Total Posisi", int(kpis['total_positions']))
+                                st.metric("Budget Tertinggi", f"${kpis['max_job_budget']:,.0f}")
                             
                             with stats_col2:
-                                st.metric("Budget Terendah", f"${data['total_budget'].min():,.0f}")
-                                st.metric("Median Budget", f"${data['total_budget'].median():,.0f}")
+                                st.metric("Budget Terendah", f"${kpis['min_job_budget']:,.0f}")
+                                st.metric("Median Budget", f"${kpis['median_job_budget']:,.0f}")
 
                         # --- Fitur Download Full Data ---
                         st.markdown("---")
                         st.subheader("📥 Full Data Export")
-                        st.caption("Download seluruh dataset dari .duckdb file (converted to CSV)")
+                        st.caption(
+                            "File export dibikin server (Parquet terkompresi / CSV). "
+                            f"Download lewat dashboard maksimal {EXPORT_DOWNLOAD_MAX_BYTES >> 20} MB"
+                        )
                         
                         col_download, col_info = st.columns([2, 1])
                         
                         with col_download:
+                            export_format = st.radio(
+                                "Format File",
+                                ["parquet", "csv"],
+                                format_func=lambda fmt: "Parquet (zstd, kecil)" if fmt == "parquet" else "CSV",
+                                horizontal=True,
+                                key="export_format"
+                            )
                             export_btn = st.button(
-                                "⬇️ Download Full Dataset (CSV)", 
+                                "⬇️ Siapkan Full Dataset", 
                                 type="primary", 
                                 use_container_width=True,
                                 key="btn_export_full_data"
                             )
                         
                         with col_info:
-                            st.metric("File Format", "CSV", help="Converted dari .duckdb")
+                            st.metric("File Format", export_format.upper(), help="Ditulis server langsung dari .duckdb")
                         
                         # Logic Download Full Data
                         if export_btn:
-                            with st.spinner('⬇️ Mengunduh data lengkap dari .duckdb...'):
-                                success_full, full_data = grpc_client.get_full_data(
-                                    st.session_state['creds']['id'],
-                                    st.session_state['creds']['pass'],
-                                    target_file
-                                )
+                            # File export sebelumnya (kalau ada) dibuang dulu biar disk gak numpuk
+                            old_export = st.session_state.pop('export_file', None)
+                            if old_export and os.path.exists(old_export['path']):
+                                os.remove(old_export['path'])
+                            
+                            export_file = tempfile.NamedTemporaryFile(
+                                prefix="payroll_export_", suffix=f".{export_format}", delete=False
+                            )
+                            with st.spinner('⬇️ Server lagi nyiapin file export...'):
+                                with export_file:
+                                    success_full, export_info = grpc_client.export_full_data(
+                                        st.session_state['creds']['id'],
+                                        st.session_state['creds']['pass'],
+                                        target_file,
+                                        export_file,
+                                        export_format=export_format,
+                                        max_bytes=EXPORT_DOWNLOAD_MAX_BYTES
+                                    )
                             
                             if success_full:
-                                if full_data.empty:
-                                    st.warning("⚠️ Data kosong - tidak ada baris untuk didownload")
+                                file_timestamp = pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")
+                                export_info['path'] = export_file.name
+                                export_info['filename'] = f"full_export_{target_file.replace('.duckdb', '')}_{file_timestamp}.{export_format}"
+                                st.session_state['export_file'] = export_info
+                            else:
+                                os.remove(export_file.name)
+                                if "lewat batas download" in export_info:
+                                    st.warning(export_info)
+                                    st.info(
+                                        "💡 Coba format Parquet (lebih kecil), atau ambil data sebesar ini "
+                                        "langsung lewat client Flight (action export_full) tanpa dashboard"
+                                    )
                                 else:
-                                    full_data.columns = full_data.columns.str.lower().str.strip().str.replace(' ', '_')
-                                    
-                                    csv_full = full_data.to_csv(index=False).encode('utf-8')
-                                    
-                                    file_timestamp = pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")
-                                    export_filename = f"full_export_{target_file.replace('.duckdb', '')}_{file_timestamp}.csv"
-                                    
+                                    st.error(f"❌ Gagal mengunduh data: {export_info}")
+                                    st.info("💡 Periksa koneksi server atau coba refresh")
+                        
+                        export_info = st.session_state.get('export_file')
+                        if export_info and os.path.exists(export_info['path']):
+                            if export_info['rows'] == 0:
+                                st.warning("⚠️ Data kosong - tidak ada baris untuk didownload")
+                            else:
+                                # Streamlit tetap baca seluruh file ke memory buat download_button,
+                                # ukurannya sudah dibatasi EXPORT_DOWNLOAD_MAX_BYTES
+                                with open(export_info['path'], "rb") as export_handle:
                                     st.download_button(
-                                        label=f"💾 {export_filename}",
-                                        data=csv_full,
-                                        file_name=export_filename,
-                                        mime="text/csv",
+                                        label=f"💾 {export_info['filename']}",
+                                        data=export_handle,
+                                        file_name=export_info['filename'],
+                                        mime="application/vnd.apache.parquet" if export_info['format'] == "parquet" else "text/csv",
                                         use_container_width=True,
-                                        key="btn_download_full_csv"
+                                        key="btn_download_full_file"
                                     )
-                                    
-                                    # Info ukuran file
-                                    info_col1, info_col2, info_col3 = st.columns(3)
-                                    with info_col1:
-                                        st.metric("Total Baris", f"{len(full_data):,}", help="Jumlah record dalam dataset")
-                                    with info_col2:
-                                        st.metric("Total Kolom", len(full_data.columns), help="Jumlah field/atribut")
-                                    with info_col3:
-                                        csv_size_kb = len(csv_full) / 1024
-                                        if csv_size_kb > 1024:
-                                            st.metric("Estimasi Ukuran", f"{csv_size_kb/1024:.2f} MB")
-                                        else:
-                                            st.metric("Estimasi Ukuran", f"{csv_size_kb:.2f} KB")
-                                    
-                                    st.success("✅ Siap untuk didownload!")
-                                    
-                                    with st.expander("👁️ Preview Data (10 baris pertama)"):
-                                        st.dataframe(full_data.head(10), use_container_width=True)
-                            else:
-                                st.error(f"❌ Gagal mengunduh data: {full_data}")
-                                st.info("💡 Periksa koneksi server atau coba refresh")
+                                
+                                # Info ukuran file
+                                info_col1, info_col2, info_col3 = st.columns(3)
+                                with info_col1:
+                                    st.metric("Total Baris", f"{export_info['rows']:,}", help="Jumlah record dalam dataset")
+                                with info_col2:
+                                    st.metric("Total Kolom", export_info['columns'], help="Jumlah field/atribut")
+                                with info_col3:
+                                    file_size_kb = export_info['bytes'] / 1024
+                                    if file_size_kb > 1024:
+                                        st.metric("Ukuran File", f"{file_size_kb/1024:.2f} MB")
+                                    else:
+                                        st.metric("Ukuran File", f"{file_size_kb:.2f} KB")
+                                
+                                st.success("✅ Siap untuk didownload!")
+                                
+                                with st.expander("👁️ Preview Data (10 baris pertama)"):
+                                    # Preview cukup minta 10 baris ke server (query spec), bukan baca file export
+                                    preview_ok, preview = grpc_client.get_full_data(
+                                        st.session_state['creds']['id'],
+                                        st.session_state['creds']['pass'],
+                                        target_file,
+                                        query={"limit": 10}
+                                    )
+                                    if preview_ok:
+                                        st.dataframe(preview, use_container_width=True)
 
 # --- Footer ---
 st.markdown("---")
@@ -1,29 +1,369 @@
 import pyarrow.flight as flight
 import pyarrow as pa
+import pyarrow.csv as pa_csv
+import functools
+import hashlib
 import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 
+# csv_ingest ada di root repo (dipakai bareng server); dashboard dijalanin dari web_dashboard/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from csv_ingest import raw_convert_options, raw_header_names
+
+# Codec kompresi IPC yang bisa dipakai client ini (urutan = prioritas)
+SUPPORTED_CODECS = tuple(codec for codec in ("zstd", "lz4") if pa.Codec.is_available(codec))
+
+# Format upload "csv": byte CSV mentah dikirim per blok (satu kolom binary),
+# server yang parsing. Client gak perlu pandas/parsing sama sekali.
+RAW_CHUNK_SCHEMA = pa.schema([("chunk", pa.binary())])
+
+# Ukuran blok upload (byte): blok mentah di format "csv", blok parser CSV di format "arrow".
+# Cuma segini data yang ada di memory client dalam satu waktu.
+UPLOAD_BLOCK_BYTES = 4 << 20
+
+# Validasi sebelum upload: header + sekian baris pertama, dibaca maksimal segini byte
+VALIDATION_SAMPLE_ROWS = 50
+VALIDATION_SAMPLE_BYTES = 256 << 10
+
+# Error jaringan yang boleh di-retry (upload dilanjutkan dari batch terakhir yang masuk)
+RETRYABLE_ERRORS = (
+    flight.FlightUnavailableError,
+    flight.FlightTimedOutError,
+    flight.FlightCancelledError,
+)
+
+# Umur info server (codec, fitur) yang di-cache di ResponseCache (detik)
+CAPABILITIES_TTL = 300
+
+
+class ExportTooLargeError(Exception):
+    # File export lebih besar dari batas yang diminta pemanggil (download dibatalkan)
+    def __init__(self, file_size, max_bytes):
+        super().__init__(
+            f"⚠️ File export {file_size / (1 << 20):,.1f} MB, lewat batas download dashboard "
+            f"({max_bytes / (1 << 20):,.0f} MB)"
+        )
+        self.file_size = file_size
+        self.max_bytes = max_bytes
+
+
+class ResponseCache:
+    """
+    Cache respons server di sisi client (file list & laporan), bisa dipakai bareng
+    antar rerun/sesi Streamlit (st.cache_resource).
+    - Entry dicatat bareng ETag storage tenant waktu diambil; valid selama ETag-nya sama.
+    - ETag tenant sendiri cuma dicek ulang ke server tiap `ttl_seconds`, jadi interaksi
+      dashboard yang nganggur gak bikin round trip sama sekali.
+    - Dibatasi jumlah entry & total ukuran (LRU).
+    """
+
+    def __init__(self, ttl_seconds=30, max_entries=128, max_bytes=64 << 20):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (etag, value, size)
+        self._etags = {}               # (client_id, password_hash) -> (etag, dicek_kapan)
+        self._capabilities = None      # (info server, diambil kapan)
+        self._size = 0
+        self.stats = {"hits": 0, "misses": 0, "etag_checks": 0}
+
+    def etag(self, client_id, password_hash):
+        with self._lock:
+            known = self._etags.get((client_id, password_hash))
+            if known is not None and time.monotonic() - known[1] < self.ttl_seconds:
+                return known[0]
+            return None
+
+    def set_etag(self, client_id, password_hash, etag):
+        with self._lock:
+            self._etags[(client_id, password_hash)] = (etag, time.monotonic())
+            self.stats["etag_checks"] += 1
+
+    def forget_etag(self, client_id):
+        # Dipanggil habis upload / logout: cek ulang ke server di request berikutnya
+        with self._lock:
+            for key in [k for k in self._etags if k[0] == client_id]:
+                del self._etags[key]
+
+    def capabilities(self):
+        with self._lock:
+            if self._capabilities is not None and time.monotonic() - self._capabilities[1] < CAPABILITIES_TTL:
+                return self._capabilities[0]
+            return None
+
+    def set_capabilities(self, capabilities):
+        with self._lock:
+            self._capabilities = (capabilities, time.monotonic())
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    @property
+    def max_entry_bytes(self):
+        # Satu respons maksimal seperempat kuota (misal export full gak ikut di-cache)
+        return self.max_bytes // 4
+
+    def get(self, key, etag):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def put(self, key, etag, value, size):
+        # `size` dihitung pemanggil (lihat _response_size) sebelum value disalin
+        if size > self.max_entry_bytes:
+            return  # Kegedean, gak di-cache
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[2]
+            self._entries[key] = (etag, value, size)
+            self._size += size
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted[2]
+
+
+def _response_size(value, limit):
+    """
+    Ukuran respons buat kuota cache. DataFrame dicek ukuran dangkalnya dulu:
+    kalau itu saja sudah lewat `limit`, gak perlu scan deep (O(n) kolom string).
+    """
+    if isinstance(value, pd.DataFrame):
+        shallow = int(value.memory_usage(deep=False).sum())
+        if shallow > limit:
+            return shallow
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pa.Table):
+        return value.nbytes
+    if isinstance(value, dict) and any(isinstance(item, pa.Table) for item in value.values()):
+        return sum(_response_size(item, limit) for item in value.values())
+    return len(json.dumps(value, default=str))
+
+
+def _copy_response(value):
+    # Arrow Table immutable: aman dibagi tanpa disalin
+    return value if isinstance(value, pa.Table) else value.copy()
+
+
+def _password_hash(password):
+    return hashlib.sha256(str(password).encode()).hexdigest()
+
+
+def cached_response(method):
+    """
+    Dekorator buat method (client_id, password, ...) -> (success, data).
+    Hasil sukses disimpan di response cache; kunci ikut hash password biar
+    cache yang dipakai bareng antar sesi gak bocor ke kredensial lain.
+    """
+    @functools.wraps(method)
+    def wrapper(self, client_id, password, *args, **kwargs):
+        if self.response_cache is None or not self.response_cache.enabled:
+            # Gak ada yang bakal disimpan: jangan buang round trip buat cek ETag
+            return method(self, client_id, password, *args, **kwargs)
+        etag = self._storage_etag(client_id, password)
+        if etag is None:
+            return method(self, client_id, password, *args, **kwargs)
+        key = (method.__name__, client_id, _password_hash(password), json.dumps([args, kwargs], sort_keys=True, default=str))
+        cached = self.response_cache.get(key, etag)
+        if cached is not None:
+            # Kasih salinan: DataFrame/dict yang diubah pemanggil gak ngerusak isi cache
+            return True, _copy_response(cached)
+        success, data = method(self, client_id, password, *args, **kwargs)
+        if success:
+            # Ukuran dicek dulu; cuma respons yang memang muat yang disalin ke cache
+            size = _response_size(data, self.response_cache.max_entry_bytes)
+            if size <= self.response_cache.max_entry_bytes:
+                self.response_cache.put(key, etag, _copy_response(data), size)
+        return success, data
+    return wrapper
+
+
 # Client Payroll gRPC
 # Kelas ini tugasnya jadi perantara (wrapper) antara Streamlit dan Server.
 
 class PayrollClient:
     
     # --- 1. Inisialisasi Koneksi ---
-    def __init__(self, location="grpc://localhost:9999"):
+    def __init__(self, location="grpc://localhost:9999", compression="auto", session_store=None,
+                 connection=None, response_cache=None):
         """
         Buka jalur komunikasi ke server pas object dibuat.
+        compression: "auto" (nego sama server), "zstd", "lz4", atau "none".
+        session_store: dict tempat nyimpen session token (misal st.session_state),
+        biar token tetap kepakai walaupun object client dibikin ulang.
+        connection: FlightClient yang sudah ada (dipakai bareng, gak ditutup di close()).
+        response_cache: ResponseCache buat file list & laporan (None = tanpa cache).
         """
-        self.client = flight.FlightClient(location)
+        self._owns_connection = connection is None
+        self.client = connection if connection is not None else flight.FlightClient(location)
+        self.response_cache = response_cache
         self.location = location
+        self.compression = compression
+        self._capabilities = None  # Info server (codec & format upload), di-cache per client
+        # Session token per client_id (login sekali, password gak dikirim di tiap request)
+        self._sessions = session_store if session_store is not None else {}
+        # Info job terakhir kalau server jalan di mode async ingestion
+        self.last_job = None
+        # Id upload yang belum selesai (buat resume kalau koneksi putus)
+        self.last_upload_id = None
+
+    # --- 1b. Nego Kompresi Arrow IPC ---
+    def _accepted_codecs(self):
+        # Daftar codec yang client mau terima (dikirim ke server di tiap request)
+        if self.compression == "none":
+            return []
+        if self.compression == "auto":
+            return list(SUPPORTED_CODECS)
+        return [self.compression]
+
+    def _server_capabilities(self):
+        # Server lama (tanpa action get_capabilities) dianggap gak dukung fitur tambahan
+        if self._capabilities is None and self.response_cache is not None:
+            self._capabilities = self.response_cache.capabilities()
+        if self._capabilities is None:
+            self._capabilities = {}
+            try:
+                action = flight.Action("get_capabilities", b"{}")
+                for result in self.client.do_action(action):
+                    self._capabilities = json.loads(result.body.to_pybytes().decode('utf-8'))
+                if self.response_cache is not None:
+                    self.response_cache.set_capabilities(self._capabilities)
+            except flight.FlightError as e:
+                print(f"⚠️ Gagal ambil info server, pakai mode standar: {e}")
+        return self._capabilities
+
+    def _forget_storage_etag(self, client_id):
+        if self.response_cache is not None:
+            self.response_cache.forget_etag(client_id)
+
+    def refresh(self, client_id):
+        # Paksa request berikutnya cek ETag ke server (misal tombol "Refresh Data")
+        self._forget_storage_etag(client_id)
+
+    def _storage_etag(self, client_id, password):
+        """
+        ETag storage tenant dari server (di-cache `ttl_seconds` di ResponseCache).
+        None = server lama / gagal cek -> respons gak di-cache.
+        """
+        if not self._server_capabilities().get("storage_etag"):
+            return None
+        password_hash = _password_hash(password)
+        etag = self.response_cache.etag(client_id, password_hash)
+        if etag is None:
+            success, data = self._json_action("storage_etag", client_id, password)
+            if not success:
+                return None
+            etag = data["etag"]
+            self.response_cache.set_etag(client_id, password_hash, etag)
+        return etag
+
+    def _upload_codec(self):
+        # Codec pertama (prioritas server) yang juga didukung client
+        accepted = self._accepted_codecs()
+        server_codecs = self._server_capabilities().get("compression", [])
+        return next((codec for codec in server_codecs if codec in accepted), None)
+
+    def _upload_call_options(self, headers=None):
+        """
+        Opsi call buat do_put: buffer batch dikompres pakai codec yang
+        didukung dua-duanya. Kalau gak ada yang cocok = tanpa kompresi.
+        """
+        codec = self._upload_codec()
+        if not codec:
+            return flight.FlightCallOptions(headers=headers)
+        return flight.FlightCallOptions(headers=headers, write_options=pa.ipc.IpcWriteOptions(compression=codec))
+
+    # --- 1c. Session Token ---
+    def _session_headers(self, client_id, password):
+        """
+        Header authorization buat request ini. Login ke server cuma kalau
+        belum punya token (atau token-nya hampir kadaluarsa).
+        Server lama (tanpa session token) -> None, password dikirim di tiket kayak dulu.
+        """
+        if not self._server_capabilities().get("session_auth"):
+            return None
+        password_hash = _password_hash(password)
+        session = self._sessions.get(client_id)
+        if (
+            session is None
+            or session["password_hash"] != password_hash
+            or session["expires_at"] - 30 <= time.time()
+        ):
+            action_info = {"client_id": client_id, "password": password}
+            action = flight.Action("login", json.dumps(action_info).encode('utf-8'))
+            data = {}
+            for result in self.client.do_action(action):
+                data = json.loads(result.body.to_pybytes().decode('utf-8'))
+            if not data.get("success"):
+                raise flight.FlightUnauthenticatedError(data.get("error", "Login gagal"))
+            session = {
+                "token": data["token"],
+                "expires_at": time.time() + data["expires_in"],
+                "password_hash": password_hash,
+            }
+            self._sessions[client_id] = session
+        return [(b"authorization", f"Bearer {session['token']}".encode('utf-8'))]
+
+    def _auth_fields(self, client_id, password):
+        # Isi kredensial di tiket/action: pakai token -> cukup client_id
+        if self._server_capabilities().get("session_auth"):
+            return {"client_id": client_id}
+        return {"client_id": client_id, "password": password}
+
+    def _with_session(self, client_id, password, call):
+        """
+        Jalanin call(headers). Kalau server bilang token gak berlaku lagi
+        (kadaluarsa / password diganti), login ulang sekali lalu coba lagi.
+        """
+        for attempt in range(2):
+            headers = self._session_headers(client_id, password)
+            try:
+                return call(headers)
+            except flight.FlightUnauthenticatedError:
+                if attempt or headers is None:
+                    raise
+                self._sessions.pop(client_id, None)
+
+    def logout(self, client_id):
+        # Buang token lokal + minta server cabut token-nya
+        self._forget_storage_etag(client_id)
+        session = self._sessions.pop(client_id, None)
+        if session is None:
+            return
+        try:
+            headers = [(b"authorization", f"Bearer {session['token']}".encode('utf-8'))]
+            list(self.client.do_action(flight.Action("logout", b"{}"), options=flight.FlightCallOptions(headers=headers)))
+        except flight.FlightError as e:
+            print(f"⚠️ Gagal logout di server: {e}")
 
     # --- 2. Cek Login/Autentikasi ---
     def authenticate(self, client_id, password):
         """
-        Ngetes password bener apa nggak dengan cara coba minta list file.
-        Kalau server ngebolehin, berarti login sukses.
+        Ngetes password bener apa nggak, selalu langsung ke server (gak lewat response
+        cache): login harus langsung gagal begitu password diganti / user dicabut.
+        Server dengan session token -> action login (token lokal lama dibuang dulu).
+        Server lama -> minta list file tanpa cache.
         """
         try:
-            success, _ = self.get_file_list(client_id, password)
+            if self._server_capabilities().get("session_auth"):
+                self._sessions.pop(client_id, None)
+                self._session_headers(client_id, password)
+                return True
+            success, _ = PayrollClient.get_file_list.__wrapped__(self, client_id, password)
             return success
         except Exception as e:
             # Kalau error, diem aja (silent fail) demi keamanan
@@ -31,6 +371,7 @@ class PayrollClient:
             return False
 
     # --- 3. Minta Daftar File ---
+    @cached_response
     def get_file_list(self, client_id, password):
         """
         Minta server ngirim daftar file (Raw & Clean) punya user tersebut.
@@ -38,10 +379,7 @@ class PayrollClient:
         """
         try:
             # Bungkus kredensial jadi JSON
-            action_info = {
-                "client_id": client_id,
-                "password": password
-            }
+            action_info = self._auth_fields(client_id, password)
             
             # Bikin request action tipe 'list_files'
             action = flight.Action(
@@ -49,8 +387,11 @@ class PayrollClient:
                 json.dumps(action_info).encode('utf-8')
             )
             
-            # Kirim ke server
-            results = self.client.do_action(action)
+            # Kirim ke server (login dulu kalau belum punya session token)
+            results = self._with_session(
+                client_id, password,
+                lambda headers: list(self.client.do_action(action, options=flight.FlightCallOptions(headers=headers)))
+            )
             
             # Baca balasan dari server
             response_received = False
@@ -86,83 +427,261 @@ class PayrollClient:
             print(f"❌ Client Error: {e}")
             return False, {}
 
+    # --- 3b. Validasi File Sebelum Upload ---
+    def validate_upload(self, file_buffer, client_id, password, sample_rows=VALIDATION_SAMPLE_ROWS):
+        """
+        Kirim header + `sample_rows` baris pertama ke server buat dicek (nama file,
+        kolom yang dibutuhin model staging, dan CAST-nya) sebelum upload penuh.
+        Balikin (True, report) kalau server sempat ngecek; report["valid"] = hasilnya.
+        Posisi baca file_buffer dikembalikan ke awal.
+        """
+        if not self._server_capabilities().get("validate_upload"):
+            # Server lama: gak ada gate, upload jalan seperti biasa
+            return True, {"valid": True, "errors": [], "skipped": True}
+
+        file_buffer.seek(0)
+        head = file_buffer.read(VALIDATION_SAMPLE_BYTES)
+        file_buffer.seek(0)
+        # Buang baris terakhir yang kepotong (kecuali file-nya memang sudah habis)
+        lines = head.split(b"\n")
+        if len(head) == VALIDATION_SAMPLE_BYTES and len(lines) > 1:
+            lines = lines[:-1]
+        sample = b"\n".join(lines[:sample_rows + 1]).decode('utf-8', errors='replace')
+
+        return self._json_action("validate_upload", client_id, password, {
+            "target_file": getattr(file_buffer, 'name', 'raw_payroll.csv'),
+            "sample": sample,
+        })
+
     # --- 4. Upload File CSV (Penting buat DE!) ---
-    def upload_csv(self, file_buffer, client_id, password):
+    def upload_csv(self, file_buffer, client_id, password, upload_id=None, max_retries=3,
+                   upload_format="auto", block_size=UPLOAD_BLOCK_BYTES):
         """
-        Upload CSV ke server.
-        Alur: CSV -> Arrow Table (Super Cepat) -> Stream ke Server.
+        Upload CSV ke server (resumable, streaming).
+        - Format "csv" (default kalau server dukung): byte CSV mentah dikirim per blok,
+          parsing dilakukan server (multithread). Client gak bikin salinan data sama sekali.
+        - Format "arrow": CSV di-parse di sini per blok (`block_size` byte) jadi RecordBatch,
+          tiap batch langsung dikirim begitu selesai di-parse. Memory client tetap rata
+          segede apapun file-nya.
+        Kalau koneksi putus, upload dilanjutkan dari batch terakhir yang sudah
+        tersimpan di server (cukup panggil lagi dengan upload_id yang sama).
         """
         try:
-            # Baca CSV jadi text semua dulu (biar server yang mikir tipe datanya)
-            df = pd.read_csv(file_buffer, dtype=str)
-            
-            if df.empty:
-                return False, "❌ File CSV kosong atau tidak valid"
-            
-            # KONVERSI KE ARROW TABLE
-            # Ini kuncinya: Arrow mindahin data jauh lebih cepat daripada kirim JSON biasa
-            table = pa.Table.from_pandas(df)
+            if upload_format == "auto":
+                server_formats = self._server_capabilities().get("upload_formats", ["arrow"])
+                upload_format = "csv" if "csv" in server_formats else "arrow"
+
+            if upload_format == "csv":
+                # Cukup tau ukuran file; isinya dibaca per blok pas dikirim
+                file_size = file_buffer.seek(0, 2)
+                file_buffer.seek(0)
+                if file_size == 0:
+                    return False, "❌ File CSV kosong atau tidak valid"
+                schema = RAW_CHUNK_SCHEMA
 
-            # Siapin metadata (nama file, user, pass) buat dikirim duluan
+                def iter_batches(start_seq):
+                    # Blok mentah ukurannya tetap, jadi bisa langsung loncat ke start_seq
+                    file_buffer.seek(start_seq * block_size)
+                    seq = start_seq
+                    while block := file_buffer.read(block_size):
+                        yield seq, pa.record_batch([pa.array([block], pa.binary())], schema=schema)
+                        seq += 1
+            else:
+                # Skema diambil dari blok pertama (header), semua kolom string
+                # (biar server yang mikir tipe datanya)
+                schema = self._open_csv_stream(file_buffer, block_size).schema
+
+                def iter_batches(start_seq):
+                    # Batas blok parser deterministik (block_size sama), jadi batch yang
+                    # sudah masuk server cukup di-parse ulang lalu dilewati, gak dikirim
+                    reader = self._open_csv_stream(file_buffer, block_size)
+                    seq = 0
+                    for batch in reader:
+                        if batch.num_rows == 0:
+                            continue
+                        if seq >= start_seq:
+                            yield seq, batch
+                        seq += 1
+
+            # Siapin metadata (nama file, user, pass, id sesi upload) buat dikirim duluan
             filename = getattr(file_buffer, 'name', 'raw_payroll.csv')
-            descriptor_info = {
-                "client_id": client_id,
-                "password": password,
-                "filename": filename
-            }
+            self.last_upload_id = upload_id or uuid.uuid4().hex
+            descriptor_info = dict(
+                self._auth_fields(client_id, password),
+                filename=filename,
+                upload_id=self.last_upload_id,
+                format=upload_format,
+            )
             
             # Bikin amplop (Descriptor) buat data
             descriptor = flight.FlightDescriptor.for_path(
                 json.dumps(descriptor_info).encode('utf-8')
             )
 
-            # Mulai streaming upload (do_put)
-            writer, _ = self.client.do_put(descriptor, table.schema)
+            for attempt in range(max_retries + 1):
+                try:
+                    # Tanya server: batch ke berapa yang sudah aman tersimpan?
+                    success, status = self._json_action("upload_status", client_id, password, {
+                        "upload_id": self.last_upload_id
+                    }, raise_network=True)
+                    if not success:
+                        return False, f"❌ Gagal Upload: {status}"
+                    # Total batch baru ketahuan setelah file habis dibaca (streaming)
+                    next_seq = status["next_seq"]
+                    total_batches = self._with_session(
+                        client_id, password,
+                        lambda headers: self._send_batches(
+                            descriptor, schema, iter_batches(next_seq), next_seq, headers
+                        )
+                    )
+                    break
+                except RETRYABLE_ERRORS as net_err:
+                    if attempt == max_retries:
+                        raise
+                    print(f"⚠️ Koneksi putus ({net_err}), lanjut upload lagi...")
+                    time.sleep(2 ** attempt)
+
+            # Semua batch sudah di server: minta server mulai proses
+            success, reply_info = self._json_action("commit_upload", client_id, password, {
+                "upload_id": self.last_upload_id,
+                "total_batches": total_batches
+            })
+            if not success:
+                return False, f"❌ Gagal Upload: {reply_info}"
+            self.last_upload_id = None
+            self._forget_storage_etag(client_id)  # Isi storage berubah: cache dicek ulang
             
-            # Tulis datanya
-            writer.write_table(table)
+            # File identik sudah pernah diproses: server skip transform
+            if reply_info.get("deduplicated"):
+                self.last_job = None
+                return True, f"♻️ File identik sudah pernah diproses ({reply_info['clean_file']}). Data tidak diproses ulang."
             
-            # Tutup koneksi tulis (biar server tau upload udah kelar)
-            writer.close()
+            # Mode async: server cuma balikin job id, transform jalan di background
+            self.last_job = reply_info if reply_info.get("job_id") else None
+            if self.last_job:
+                return True, (
+                    f"⏳ Upload diterima! Job ID: {self.last_job['job_id']} "
+                    f"(antrian ke-{self.last_job.get('queue_position') or 1}). Cek status di panel Job."
+                )
             
+            if reply_info.get("warning"):
+                return True, f"✅ Upload & SQLMesh Pipeline Berhasil Dijalankan! ⚠️ {reply_info['warning']}"
             return True, "✅ Upload & SQLMesh Pipeline Berhasil Dijalankan!"
             
         except flight.FlightUnauthenticatedError:
             return False, "❌ Kredensial tidak valid untuk upload"
             
-        except pd.errors.EmptyDataError:
-            return False, "❌ File CSV kosong atau format tidak valid"
-            
         except pa.ArrowInvalid as arrow_err:
             return False, f"❌ Error konversi data: {str(arrow_err)}"
             
         except Exception as e:
             return False, f"❌ Gagal Upload: {str(e)}"
 
+    def _open_csv_stream(self, file_buffer, block_size):
+        # Aturan header & tipe kolom diambil dari csv_ingest (yang dipakai server buat
+        # format "csv"), jadi dua jalur upload gak bisa beda skema Raw Zone.
+        file_buffer.seek(0)
+        header = file_buffer.readline()
+        file_buffer.seek(0)
+        if not header.strip():
+            raise pa.ArrowInvalid("File CSV kosong atau format tidak valid")
+        return pa_csv.open_csv(
+            file_buffer,
+            read_options=pa_csv.ReadOptions(block_size=block_size, use_threads=True),
+            convert_options=raw_convert_options(raw_header_names(header)),
+        )
+
+    def _send_batches(self, descriptor, schema, seq_batches, start_seq, headers=None):
+        # Kirim batch (seq, RecordBatch) satu-satu begitu tersedia, tiap batch ditempeli
+        # nomor urutnya. Balikin total batch (seq terakhir + 1).
+        writer, metadata_reader = self.client.do_put(descriptor, schema, options=self._upload_call_options(headers))
+        total_batches = start_seq
+        for seq, batch in seq_batches:
+            seq_info = pa.py_buffer(json.dumps({"seq": seq}).encode('utf-8'))
+            writer.write_with_metadata(batch, seq_info)
+            total_batches = seq + 1
+        
+        # Kasih tau server upload udah kelar, lalu tunggu balasannya (next_seq)
+        writer.done_writing()
+        metadata_reader.read()
+        writer.close()
+        return total_batches
+
+    # --- 4b. Cek Status Job Ingestion (Mode Async) ---
+    def _json_action(self, action_type, client_id, password, action_info=None, raise_network=False):
+        # Helper kecil buat action yang balasannya satu JSON (upload & job)
+        try:
+            body = dict(self._auth_fields(client_id, password), **(action_info or {}))
+            action = flight.Action(action_type, json.dumps(body).encode('utf-8'))
+            results = self._with_session(
+                client_id, password,
+                lambda headers: list(self.client.do_action(action, options=flight.FlightCallOptions(headers=headers)))
+            )
+            for result in results:
+                data = json.loads(result.body.to_pybytes().decode('utf-8'))
+                if data.get("success", False):
+                    return True, data
+                return False, data.get("error", "Unknown error")
+            return False, "⚠️ Server tidak mengirim response"
+        except RETRYABLE_ERRORS:
+            # Upload butuh tau kalau ini error jaringan (biar bisa di-retry)
+            if raise_network:
+                raise
+            return False, "❌ Server tidak bisa dihubungi"
+        except flight.FlightUnauthenticatedError as auth_err:
+            return False, f"❌ Autentikasi Ditolak: {auth_err}"
+        except flight.FlightServerError as server_err:
+            return False, f"❌ Server Error: {server_err}"
+        except Exception as e:
+            return False, f"❌ Client Error: {e}"
+
+    def get_job_status(self, client_id, password, job_id):
+        """
+        Tanya progres satu job: queued -> transforming -> done / failed.
+        """
+        success, data = self._json_action("job_status", client_id, password, {
+            "job_id": job_id
+        })
+        if success and data["job"].get("stage") == "done":
+            self._forget_storage_etag(client_id)
+        return (True, data["job"]) if success else (False, data)
+
+    def list_jobs(self, client_id, password):
+        """
+        Daftar job milik user + info antrian server (queue_depth, running).
+        """
+        return self._json_action("list_jobs", client_id, password)
+
     # --- 5. Ambil Data Summary (Report) ---
-    def get_summary_report(self, client_id, password, target_file):
+    @cached_response
+    def get_summary_report(self, client_id, password, target_file, as_arrow=False):
         """
         Minta server jalanin query agregasi (SUM, COUNT) dan balikin hasilnya.
+        `as_arrow=True` -> balikin pa.Table apa adanya (tanpa konversi ke pandas).
         """
         try:
             # Siapin tiket request
-            request_info = {
-                "action": "get_budget_report",
-                "client_id": client_id,
-                "password": password,
-                "target_file": target_file,
-                "save_copy": False  # Gak usah simpen file di server, cukup kirim data aja
-            }
+            request_info = dict(
+                self._auth_fields(client_id, password),
+                action="get_budget_report",
+                target_file=target_file,
+                save_copy=False,  # Gak usah simpen file di server, cukup kirim data aja
+                accept_compression=self._accepted_codecs()  # Server pilih codec dari daftar ini
+            )
             
             ticket = flight.Ticket(
                 json.dumps(request_info).encode('utf-8')
             )
 
-            # Minta data (do_get) -> Server bakal streaming balik Arrow Table
-            reader = self.client.do_get(ticket)
+            # Minta data (do_get) -> Server bakal streaming balik Arrow Table,
+            # lalu baca semua data dari stream
+            result_table = self._with_session(
+                client_id, password,
+                lambda headers: self.client.do_get(ticket, options=flight.FlightCallOptions(headers=headers)).read_all()
+            )
             
-            # Baca semua data dari stream
-            result_table = reader.read_all()
+            if as_arrow:
+                return True, result_table
             
             # Convert balik dari Arrow ke Pandas buat dipakai di Streamlit
             df = result_table.to_pandas()
@@ -185,24 +704,121 @@ class PayrollClient:
         except Exception as e:
             return False, f"❌ Gagal Ambil Data: {str(e)}"
 
+    # --- 5b. Ambil KPI Tenant (Sudah Dihitung Server) ---
+    @cached_response
+    def get_kpi_summary(self, client_id, password, target_file):
+        """
+        Minta angka KPI (total budget, karyawan, rata-rata, max/min/median
+        budget per posisi) yang sudah dihitung waktu transform. Balikin dict satu baris.
+        """
+        try:
+            request_info = dict(
+                self._auth_fields(client_id, password),
+                action="get_kpis",
+                target_file=target_file,
+                save_copy=False,
+                accept_compression=self._accepted_codecs()
+            )
+            
+            ticket = flight.Ticket(json.dumps(request_info).encode('utf-8'))
+            result_table = self._with_session(
+                client_id, password,
+                lambda headers: self.client.do_get(ticket, options=flight.FlightCallOptions(headers=headers)).read_all()
+            )
+            rows = result_table.to_pylist()
+            if not rows:
+                return False, "⚠️ KPI kosong"
+            return True, rows[0]
+            
+        except flight.FlightUnauthenticatedError:
+            return False, "❌ Kredensial tidak valid untuk mengakses laporan"
+        
+        except flight.FlightServerError as server_err:
+            return False, f"❌ Server Error: {server_err}"
+            
+        except Exception as e:
+            return False, f"❌ Gagal Ambil KPI: {str(e)}"
+
+    # --- 5c. Ambil Insights (KPI + Top-N + Statistik, Dihitung Server) ---
+    @cached_response
+    def get_insights(self, client_id, password, target_file, top_n=10, uploads=None):
+        """
+        Satu request buat tab Financial Insights: server balikin top-N posisi
+        (pa.Table: job_title, total_employee, total_budget) plus KPI & statistik.
+        Balikin (True, {"kpis": dict, "top": pa.Table}), tanpa konversi pandas.
+        """
+        try:
+            request_info = dict(
+                self._auth_fields(client_id, password),
+                action="get_insights",
+                target_file=target_file,
+                top_n=top_n,
+                save_copy=False,
+                accept_compression=self._accepted_codecs()
+            )
+            if uploads:
+                request_info["uploads"] = uploads
+            
+            ticket = flight.Ticket(json.dumps(request_info).encode('utf-8'))
+            result_table = self._with_session(
+                client_id, password,
+                lambda headers: self.client.do_get(ticket, options=flight.FlightCallOptions(headers=headers)).read_all()
+            )
+            metadata = result_table.schema.metadata or {}
+            kpis = json.loads(metadata.get(b"kpis", b"{}"))
+            if not kpis:
+                return False, "⚠️ KPI kosong"
+            return True, {"kpis": kpis, "top": result_table.replace_schema_metadata(None)}
+            
+        except flight.FlightUnauthenticatedError:
+            return False, "❌ Kredensial tidak valid untuk mengakses laporan"
+        
+        except flight.FlightServerError as server_err:
+            error_msg = str(server_err)
+            if "Catalog Error" in error_msg or "Binder Error" in error_msg:
+                return False, "❌ Tabel tidak ditemukan. Pastikan file sudah diproses."
+            return False, f"❌ Server Error: {error_msg}"
+            
+        except Exception as e:
+            return False, f"❌ Gagal Ambil Insights: {str(e)}"
+
     # --- 6. Ambil Data Lengkap (Tanpa Agregasi) ---
-    def get_full_data(self, client_id, password, target_file):
+    def get_full_data(self, client_id, password, target_file, query=None, parallel=1, uploads=None):
         """
         Sama kayak di atas, tapi ini minta seluruh data mentah (Select *)
         buat fitur download CSV full.
+        `query` (opsional) = spec yang dikerjakan di server, contoh:
+        {"columns": [...], "filters": [{"column": "department", "op": "=", "value": "Police"}],
+         "order_by": [{"column": "total_amount", "desc": True}], "limit": 500, "offset": 0}
+        `parallel` > 1: data dipecah server jadi beberapa partisi (get_flight_info)
+        dan diambil bareng-bareng, lalu diurutkan ulang di client.
+        `uploads`: khusus target "@dataset", cuma baca partisi upload yang disebut.
         """
         try:
-            request_info = {
-                "action": "get_full_clean",
-                "client_id": client_id,
-                "password": password,
-                "target_file": target_file,
-                "save_copy": False
-            }
+            if parallel > 1 and self._server_capabilities().get("partitioned_reads"):
+                result_table = self._with_session(
+                    client_id, password,
+                    lambda headers: self._read_partitions(client_id, password, target_file, query, parallel, headers, uploads)
+                )
+                return True, result_table.to_pandas()
+
+            request_info = dict(
+                self._auth_fields(client_id, password),
+                action="get_full_clean",
+                target_file=target_file,
+                save_copy=False,
+                accept_compression=self._accepted_codecs()
+            )
+            if query:
+                request_info["query"] = query
+            if uploads:
+                request_info["uploads"] = uploads
             
             ticket = flight.Ticket(json.dumps(request_info).encode('utf-8'))
-            reader = self.client.do_get(ticket)
-            result_table = reader.read_all()
+            result_table = self._with_session(
+                client_id, password,
+                lambda headers: self.client.do_get(ticket, options=flight.FlightCallOptions(headers=headers)).read_all()
+            )
             
             df = result_table.to_pandas()
             return True, df
@@ -220,8 +836,155 @@ class PayrollClient:
         except Exception as e:
             return False, f"❌ Gagal Ambil Data: {str(e)}"
     
+    # --- 6a. Export File (Parquet / CSV dibikin server) ---
+    def export_full_data(self, client_id, password, target_file, destination, export_format="parquet",
+                         query=None, uploads=None, max_bytes=None):
+        """
+        Download export full sebagai file jadi ("parquet" zstd atau "csv").
+        Server yang nulis file-nya, client cuma nerusin potongan byte ke `destination`
+        (path atau file object biner), jadi memory client tetap kecil berapapun ukuran datanya.
+        Kalau `max_bytes` diisi dan file dari server lebih besar, stream dibatalkan
+        sebelum ada byte yang ditulis.
+        Balikin (True, {"format", "rows", "columns", "bytes"}).
+        """
+        try:
+            request_info = dict(
+                self._auth_fields(client_id, password),
+                action="export_full",
+                target_file=target_file,
+                export_format=export_format,
+                save_copy=False,
+                accept_compression=self._accepted_codecs()
+            )
+            if query:
+                request_info["query"] = query
+            if uploads:
+                request_info["uploads"] = uploads
+            ticket = flight.Ticket(json.dumps(request_info).encode('utf-8'))
+
+            def download(headers):
+                reader = self.client.do_get(ticket, options=flight.FlightCallOptions(headers=headers))
+                # Ukuran file sudah ada di metadata skema (sebelum potongan pertama)
+                file_size = int((reader.schema.metadata or {}).get(b"bytes", 0))
+                if max_bytes is not None and file_size > max_bytes:
+                    reader.cancel()
+                    raise ExportTooLargeError(file_size, max_bytes)
+                output = open(destination, "wb") if isinstance(destination, str) else destination
+                try:
+                    for chunk in reader:
+                        for value in chunk.data.column(0):
+                            output.write(value.as_buffer())
+                finally:
+                    if output is not destination:
+                        output.close()
+                metadata = reader.schema.metadata or {}
+                return {key.decode('utf-8'): value.decode('utf-8') for key, value in metadata.items()}
+
+            info = self._with_session(client_id, password, download)
+            return True, {
+                "format": info.get("format", export_format),
+                "rows": int(info.get("rows", 0)),
+                "columns": int(info.get("columns", 0)),
+                "bytes": int(info.get("bytes", 0)),
+            }
+
+        except ExportTooLargeError as too_large:
+            return False, str(too_large)
+
+        except flight.FlightUnauthenticatedError:
+            return False, "❌ Kredensial tidak valid untuk mengakses data"
+
+        except flight.FlightServerError as server_err:
+            return False, f"❌ Server Error: {server_err}"
+
+        except Exception as e:
+            return False, f"❌ Gagal Export Data: {str(e)}"
+
+    # --- 6b. Discovery Dataset & Read Paralel (FlightInfo) ---
+    def _flight_descriptor(self, client_id, password, target_file, query=None, partitions=None, uploads=None):
+        command = dict(
+            self._auth_fields(client_id, password),
+            target_file=target_file,
+            accept_compression=self._accepted_codecs()
+        )
+        if query:
+            command["query"] = query
+        if partitions:
+            command["partitions"] = partitions
+        if uploads:
+            command["uploads"] = uploads
+        return flight.FlightDescriptor.for_command(json.dumps(command).encode('utf-8'))
+
+    def _read_partitions(self, client_id, password, target_file, query, parallel, headers, uploads=None):
+        # Tiap endpoint = satu partisi hash, dibaca di thread sendiri (stream gRPC terpisah)
+        options = flight.FlightCallOptions(headers=headers)
+        descriptor = self._flight_descriptor(client_id, password, target_file, query, parallel, uploads)
+        info = self.client.get_flight_info(descriptor, options=options)
+        with ThreadPoolExecutor(max_workers=len(info.endpoints)) as executor:
+            tables = list(executor.map(
+                lambda endpoint: self.client.do_get(endpoint.ticket, options=options).read_all(),
+                info.endpoints
+            ))
+        table = pa.concat_tables(tables) if tables else info.schema.empty_table()
+
+        # Urutan antar partisi gak dijamin: urutkan ulang sesuai order_by (default job_title)
+        order_by = (query or {}).get("order_by", ["job_title"])
+        sort_keys = []
+        for item in order_by:
+            name = item if isinstance(item, str) else item.get("column")
+            desc = isinstance(item, dict) and item.get("desc")
+            if name in table.column_names:
+                sort_keys.append((name, "descending" if desc else "ascending"))
+        return table.sort_by(sort_keys) if sort_keys else table
+
+    def get_flight_info(self, client_id, password, target_file, partitions=None, query=None, uploads=None):
+        """
+        Info dataset tanpa narik datanya: skema, total baris, perkiraan ukuran (byte),
+        dan daftar endpoint (satu tiket per partisi).
+        """
+        try:
+            descriptor = self._flight_descriptor(client_id, password, target_file, query, partitions, uploads)
+            info = self._with_session(
+                client_id, password,
+                lambda headers: self.client.get_flight_info(descriptor, options=flight.FlightCallOptions(headers=headers))
+            )
+            return True, info
+        except flight.FlightUnauthenticatedError:
+            return False, "❌ Kredensial tidak valid untuk mengakses data"
+        except Exception as e:
+            return False, f"❌ Gagal Ambil Info Dataset: {str(e)}"
+
+    @cached_response
+    def list_datasets(self, client_id, password):
+        """
+        Daftar dataset tenant (list_flights): nama file, jumlah baris, ukuran, kolom.
+        """
+        try:
+            criteria = json.dumps(self._auth_fields(client_id, password)).encode('utf-8')
+            infos = self._with_session(
+                client_id, password,
+                lambda headers: list(self.client.list_flights(criteria, options=flight.FlightCallOptions(headers=headers)))
+            )
+            datasets = [
+                {
+                    "target_file": json.loads(info.descriptor.command.decode('utf-8'))["target_file"],
+                    "rows": info.total_records,
+                    "bytes": info.total_bytes,
+                    "columns": info.schema.names,
+                }
+                for info in infos
+            ]
+            return True, datasets
+        except flight.FlightUnauthenticatedError:
+            return False, "❌ Kredensial tidak valid untuk mengakses data"
+        except Exception as e:
+            return False, f"❌ Gagal Ambil Daftar Dataset: {str(e)}"
+
     # --- 7. Tutup Koneksi ---
     def close(self):
+        # Koneksi titipan (dipakai bareng) gak ditutup di sini
+        if not self._owns_connection:
+            return
         try:
             self.client.close()
         except: